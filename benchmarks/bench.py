@@ -0,0 +1,408 @@
+# Benchmarks for waifuVault clients against the local stand-in server
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+import waifuvault
+
+from .standin import StandInServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class BenchContext:
+    def __init__(self, base_url: str, directory: str, count: int, small_size: int, large_size: int,
+                 large_count: int, concurrency: int):
+        self.base_url = base_url
+        self.directory = directory
+        self.count = count
+        self.small_size = small_size
+        self.large_size = large_size
+        self.large_count = large_count
+        self.concurrency = concurrency
+        self.small = os.urandom(small_size)
+        self.large_path = os.path.join(directory, "large.bin")
+        with open(self.large_path, "wb") as fh:
+            for _ in range(0, large_size, 1024 * 1024):
+                fh.write(os.urandom(min(1024 * 1024, large_size)))
+            fh.truncate(large_size)
+        self.small_file = None
+        self.large_file = None
+        self.album = None
+
+    def client(self, **kwargs):
+        return waifuvault.WaifuVaultClient(self.base_url, pool_maxsize=self.concurrency, **kwargs)
+
+    def async_client(self, **kwargs):
+        return waifuvault.AsyncWaifuVaultClient(self.base_url, limit=self.concurrency, **kwargs)
+
+    def small_uploads(self):
+        return [waifuvault.FileUpload(self.small, f"small-{index}.bin") for index in range(self.count)]
+
+    # Upload the files and album the download benchmarks read from
+    def seed(self):
+        with self.client() as client:
+            self.small_file = client.upload_file(waifuvault.FileUpload(self.small, "small.bin"))
+            self.large_file = client.upload_file(waifuvault.FileUpload(self.large_path))
+            bucket = client.create_bucket()
+            uploads = [waifuvault.FileUpload(self.small, f"album-{index}.bin", bucket_token=bucket.token)
+                       for index in range(min(self.count, 50))]
+            uploads.append(waifuvault.FileUpload(self.large_path, bucket_token=bucket.token))
+            tokens = [result.token for _, result in client.upload_many(uploads, self.concurrency)]
+            self.album = client.create_album(bucket.token, "benchmark")
+            client.associate_files(self.album.token, tokens)
+
+
+# Time each call of fn, returning the latencies
+def timed_calls(fn, items):
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def timed_calls_async(fn, items):
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        await fn(item)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+# Collect the request latencies of one operation from client hooks, for bulk calls that overlap
+class LatencyHook:
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.latencies = []
+
+    def __call__(self, event):
+        if event.operation == self.operation and event.error is None:
+            self.latencies.append(event.total)
+
+
+def upload_small_sync_single(ctx: BenchContext):
+    with ctx.client() as client:
+        return timed_calls(lambda upload: client.upload_file(upload, True), ctx.small_uploads())
+
+
+def upload_small_sync_bulk(ctx: BenchContext):
+    hook = LatencyHook("upload_file")
+    with ctx.client(hooks=[hook]) as client:
+        for _, result in client.upload_many(ctx.small_uploads(), ctx.concurrency, ignore_client_restrictions=True):
+            if isinstance(result, Exception):
+                raise result
+    return hook.latencies
+
+
+def upload_small_async_single(ctx: BenchContext):
+    async def run():
+        async with ctx.async_client() as client:
+            return await timed_calls_async(lambda upload: client.upload_file(upload, True), ctx.small_uploads())
+    return asyncio.run(run())
+
+
+def upload_small_async_bulk(ctx: BenchContext):
+    hook = LatencyHook("upload_file")
+
+    async def run():
+        async with ctx.async_client(hooks=[hook]) as client:
+            async for _, result in client.upload_many(ctx.small_uploads(), ctx.concurrency,
+                                                      ignore_client_restrictions=True):
+                if isinstance(result, Exception):
+                    raise result
+    asyncio.run(run())
+    return hook.latencies
+
+
+def upload_large_sync_single(ctx: BenchContext):
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.upload_file(waifuvault.FileUpload(ctx.large_path), True),
+                           range(ctx.large_count))
+
+
+def upload_large_async_single(ctx: BenchContext):
+    async def run():
+        async with ctx.async_client() as client:
+            return await timed_calls_async(
+                lambda _: client.upload_file(waifuvault.FileUpload(ctx.large_path), True), range(ctx.large_count))
+    return asyncio.run(run())
+
+
+def file_info_sync_single(ctx: BenchContext):
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.file_info(ctx.small_file.token, False), range(ctx.count))
+
+
+def file_info_async_bulk(ctx: BenchContext):
+    hook = LatencyHook("file_info")
+
+    async def run():
+        async with ctx.async_client(hooks=[hook]) as client:
+            semaphore = asyncio.Semaphore(ctx.concurrency)
+
+            async def info(_):
+                async with semaphore:
+                    await client.file_info(ctx.small_file.token, False)
+            await asyncio.gather(*[info(index) for index in range(ctx.count)])
+    asyncio.run(run())
+    return hook.latencies
+
+
+def download_small_sync_single(ctx: BenchContext):
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.get_file(ctx.small_file), range(ctx.count))
+
+
+def download_small_async_single(ctx: BenchContext):
+    async def run():
+        async with ctx.async_client() as client:
+            return await timed_calls_async(lambda _: client.get_file(ctx.small_file), range(ctx.count))
+    return asyncio.run(run())
+
+
+def download_large_sync_single(ctx: BenchContext):
+    path = os.path.join(ctx.directory, "download.bin")
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.get_file_to(ctx.large_file, path), range(ctx.large_count))
+
+
+def download_large_sync_parallel(ctx: BenchContext):
+    path = os.path.join(ctx.directory, "download.bin")
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.get_file_parallel(ctx.large_file, path, connections=ctx.concurrency),
+                           range(ctx.large_count))
+
+
+def download_large_async_single(ctx: BenchContext):
+    path = os.path.join(ctx.directory, "download.bin")
+
+    async def run():
+        async with ctx.async_client() as client:
+            return await timed_calls_async(lambda _: client.get_file_to(ctx.large_file, path),
+                                           range(ctx.large_count))
+    return asyncio.run(run())
+
+
+def album_zip_sync_single(ctx: BenchContext):
+    path = os.path.join(ctx.directory, "album.zip")
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.download_album_to(ctx.album.token, path), range(ctx.large_count))
+
+
+def album_extract_sync_single(ctx: BenchContext):
+    directory = os.path.join(ctx.directory, "album")
+    with ctx.client() as client:
+        return timed_calls(lambda _: client.extract_album(ctx.album.token, directory), range(ctx.large_count))
+
+
+def album_zip_async_single(ctx: BenchContext):
+    path = os.path.join(ctx.directory, "album.zip")
+
+    async def run():
+        async with ctx.async_client() as client:
+            return await timed_calls_async(lambda _: client.download_album_to(ctx.album.token, path),
+                                           range(ctx.large_count))
+    return asyncio.run(run())
+
+
+# Time a cold `import waifuvault` in fresh interpreters, so short-lived scripts stay fast to start
+STARTUP_SCRIPT = "import time; started = time.perf_counter(); import waifuvault; print(time.perf_counter() - started)"
+
+
+def startup_import_cold(ctx: BenchContext):
+    env = dict(os.environ)
+    source = os.path.dirname(os.path.dirname(os.path.abspath(waifuvault.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [source, env.get("PYTHONPATH")]))
+    latencies = []
+    for _ in range(min(ctx.count, 20)):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=env, check=True, capture_output=True,
+                                text=True).stdout
+        latencies.append(float(output))
+    return latencies
+
+
+SCENARIOS = {
+    "startup.import.cold": startup_import_cold,
+    "upload.small.sync.single": upload_small_sync_single,
+    "upload.small.sync.bulk": upload_small_sync_bulk,
+    "upload.small.async.single": upload_small_async_single,
+    "upload.small.async.bulk": upload_small_async_bulk,
+    "upload.large.sync.single": upload_large_sync_single,
+    "upload.large.async.single": upload_large_async_single,
+    "file_info.sync.single": file_info_sync_single,
+    "file_info.async.bulk": file_info_async_bulk,
+    "download.small.sync.single": download_small_sync_single,
+    "download.small.async.single": download_small_async_single,
+    "download.large.sync.single": download_large_sync_single,
+    "download.large.sync.parallel": download_large_sync_parallel,
+    "download.large.async.single": download_large_async_single,
+    "album.zip.sync.single": album_zip_sync_single,
+    "album.extract.sync.single": album_extract_sync_single,
+    "album.zip.async.single": album_zip_async_single,
+}
+
+
+# Current resident set size in bytes
+def current_rss():
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if platform.system() == "Darwin" else usage * 1024
+
+
+# Sample the RSS in the background to find the peak while a scenario runs
+class RssSampler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def percentile(values: list, q: float):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(name: str, ctx: BenchContext):
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        latencies = SCENARIOS[name](ctx)
+        elapsed = time.perf_counter() - started
+    return {
+        "ops": len(latencies),
+        "seconds": elapsed,
+        "ops_per_sec": len(latencies) / elapsed if elapsed > 0 else None,
+        "p50_ms": percentile(latencies, 0.5) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "peak_rss_mb": sampler.peak / (1024 * 1024),
+    }
+
+
+def package_version():
+    try:
+        return metadata.version("waifuvault")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+# Run the selected scenarios against a fresh stand-in server
+def run_benchmarks(patterns: list[str] = None, count: int = 200, small_size: int = 4 * 1024,
+                   large_size: int = 32 * 1024 * 1024, large_count: int = 3, concurrency: int = 8, log=print):
+    names = [name for name in SCENARIOS if not patterns or any(fnmatch.fnmatch(name, p) for p in patterns)]
+    results = {
+        "version": package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {"count": count, "small_size": small_size, "large_size": large_size,
+                       "large_count": large_count, "concurrency": concurrency},
+        "scenarios": {},
+    }
+    with StandInServer() as server, tempfile.TemporaryDirectory(prefix="waifuvault-bench-") as directory:
+        ctx = BenchContext(server.base_url, directory, count, small_size, large_size, large_count, concurrency)
+        ctx.seed()
+        for name in names:
+            results["scenarios"][name] = run_scenario(name, ctx)
+            log(format_result(name, results["scenarios"][name]))
+    return results
+
+
+def format_result(name: str, result: dict):
+    return (f"{name:32} {result['ops']:6d} ops {result['ops_per_sec']:10.1f} ops/s "
+            f"p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  rss {result['peak_rss_mb']:8.1f} MB")
+
+
+# Compare two result files, returning the relative change of every metric per scenario
+# Positive changes are regressions: fewer ops/sec, or higher latency and memory
+def compare_results(baseline: dict, current: dict):
+    changes = {}
+    for name, result in current["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        changes[name] = {}
+        for metric, sign in (("ops_per_sec", -1), ("p50_ms", 1), ("p99_ms", 1), ("peak_rss_mb", 1)):
+            if previous.get(metric) and result.get(metric) is not None:
+                changes[name][metric] = sign * (result[metric] - previous[metric]) / previous[metric]
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the waifuVault clients against a local stand-in server")
+    parser.add_argument("scenarios", nargs="*", help="Glob patterns of scenarios to run, such as 'upload.*'")
+    parser.add_argument("--count", type=int, default=200, help="Operations per small file scenario")
+    parser.add_argument("--small-size", type=int, default=4 * 1024, help="Size of small files in bytes")
+    parser.add_argument("--large-size", type=int, default=32 * 1024 * 1024, help="Size of large files in bytes")
+    parser.add_argument("--large-count", type=int, default=3, help="Operations per large file scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrency of bulk scenarios")
+    parser.add_argument("--output", help="Where to save the results, defaults to benchmarks/results")
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(SCENARIOS))
+        return 0
+
+    results = run_benchmarks(args.scenarios, args.count, args.small_size, args.large_size, args.large_count,
+                             args.concurrency)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = results["timestamp"].replace(":", "").replace("-", "")
+        output = os.path.join(RESULTS_DIR, f"{results['version']}-{stamp}.json")
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare is None:
+        return 0
+    with open(args.compare, "r") as fh:
+        baseline = json.load(fh)
+    regressions = 0
+    for name, changes in compare_results(baseline, results).items():
+        for metric, change in changes.items():
+            flag = "REGRESSION" if change > args.threshold else ""
+            regressions += bool(flag)
+            print(f"{name:32} {metric:12} {-change if metric == 'ops_per_sec' else change:+8.1%} {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,350 @@
+# Local stand-in for the waifuVault /rest API, used by the benchmarks
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import uuid
+import zipfile
+
+from aiohttp import web
+
+MAX_FILE_SIZE = 1024 * 1024 * 1024
+
+
+class StandInState:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files = {}
+        self.buckets = {}
+        self.albums = {}
+        self.ids = itertools.count(1)
+
+
+def file_json(request: web.Request, record: dict):
+    album = None
+    if record["album"] is not None:
+        album_record = request.app["state"].albums[record["album"]]
+        album = {"token": album_record["token"], "publicToken": album_record["public_token"],
+                 "name": album_record["name"], "bucket": album_record["bucket"], "dateCreated": 0}
+    return {"token": record["token"], "id": record["id"], "bucket": record["bucket"], "views": 0,
+            "url": f"{request.scheme}://{request.host}/f/{record['token']}/{record['name']}",
+            "retentionPeriod": 3600000, "album": album,
+            "options": {"hideFilename": record["hide_filename"], "oneTimeDownload": False,
+                        "protected": record["password"] is not None}}
+
+
+def album_json(request: web.Request, album: dict):
+    files = [file_json(request, request.app["state"].files[token]) for token in album["files"]
+             if token in request.app["state"].files]
+    return {"token": album["token"], "bucketToken": album["bucket"], "publicToken": album["public_token"],
+            "name": album["name"], "files": files}
+
+
+def not_found(message: str):
+    return web.json_response({"name": "NOT_FOUND", "message": message, "status": 404}, status=404)
+
+
+async def upload(request: web.Request):
+    state = request.app["state"]
+    bucket = request.match_info.get("bucket")
+    if bucket is not None and bucket not in state.buckets:
+        return not_found("Bucket not found")
+    token = str(uuid.uuid4())
+    record = {"token": token, "id": next(state.ids), "bucket": bucket, "album": None, "password": None,
+              "hide_filename": request.query.get("hide_filename") == "true", "name": "file",
+              "path": os.path.join(state.directory, token)}
+    reader = await request.multipart()
+    async for part in reader:
+        if part.name == "password":
+            record["password"] = await part.text()
+        elif part.name == "url":
+            await part.text()
+            with open(record["path"], "wb"):
+                pass
+        elif part.name == "file":
+            record["name"] = part.filename or "file"
+            with open(record["path"], "wb") as fh:
+                while chunk := await part.read_chunk(256 * 1024):
+                    fh.write(chunk)
+    state.files[token] = record
+    if bucket is not None:
+        state.buckets[bucket].append(token)
+    return web.json_response(file_json(request, record))
+
+
+async def file_info(request: web.Request):
+    record = request.app["state"].files.get(request.match_info["token"])
+    if record is None:
+        return not_found("File not found")
+    return web.json_response(file_json(request, record))
+
+
+async def file_update(request: web.Request):
+    record = request.app["state"].files.get(request.match_info["token"])
+    if record is None:
+        return not_found("File not found")
+    fields = await request.post()
+    if "password" in fields:
+        record["password"] = fields["password"] or None
+    record["hide_filename"] = fields.get("hideFilename") == "true"
+    return web.json_response(file_json(request, record))
+
+
+async def delete_file(request: web.Request):
+    record = request.app["state"].files.pop(request.match_info["token"], None)
+    if record is None:
+        return not_found("File not found")
+    os.remove(record["path"])
+    return web.Response(text="true")
+
+
+async def download(request: web.Request):
+    record = request.app["state"].files.get(request.match_info["token"])
+    if record is None:
+        return not_found("File not found")
+    if record["password"] is not None and request.headers.get("x-password") != record["password"]:
+        return web.Response(status=403, text="Password is Incorrect")
+    return web.FileResponse(record["path"], headers={"Accept-Ranges": "bytes"})
+
+
+async def create_bucket(request: web.Request):
+    token = str(uuid.uuid4())
+    request.app["state"].buckets[token] = []
+    return web.json_response({"token": token, "files": [], "albums": []})
+
+
+async def get_bucket(request: web.Request):
+    state = request.app["state"]
+    token = (await request.json()).get("bucket_token")
+    if token not in state.buckets:
+        return not_found("Bucket not found")
+    files = [file_json(request, state.files[file]) for file in state.buckets[token] if file in state.files]
+    albums = [album_json(request, album) for album in state.albums.values() if album["bucket"] == token]
+    return web.json_response({"token": token, "files": files, "albums": albums})
+
+
+async def delete_bucket(request: web.Request):
+    state = request.app["state"]
+    files = state.buckets.pop(request.match_info["bucket"], None)
+    if files is None:
+        return not_found("Bucket not found")
+    for token in files:
+        record = state.files.pop(token, None)
+        if record is not None:
+            os.remove(record["path"])
+    return web.Response(text="true")
+
+
+async def create_album(request: web.Request):
+    state = request.app["state"]
+    bucket = request.match_info["bucket"]
+    if bucket not in state.buckets:
+        return not_found("Bucket not found")
+    token = str(uuid.uuid4())
+    album = {"token": token, "bucket": bucket, "public_token": None, "name": (await request.json())["name"],
+             "files": []}
+    state.albums[token] = album
+    return web.json_response(album_json(request, album))
+
+
+def find_album(request: web.Request):
+    state = request.app["state"]
+    token = request.match_info["album"]
+    album = state.albums.get(token)
+    if album is None:
+        album = next((album for album in state.albums.values() if album["public_token"] == token), None)
+    return album
+
+
+async def get_album(request: web.Request):
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    return web.json_response(album_json(request, album))
+
+
+async def delete_album(request: web.Request):
+    state = request.app["state"]
+    album = state.albums.pop(request.match_info["album"], None)
+    if album is None:
+        return not_found("Album not found")
+    for token in album["files"]:
+        record = state.files.get(token)
+        if record is None:
+            continue
+        record["album"] = None
+        if request.query.get("deleteFiles") == "true":
+            os.remove(state.files.pop(token)["path"])
+    return web.json_response({"success": True, "description": "album deleted"})
+
+
+async def associate(request: web.Request):
+    state = request.app["state"]
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    for token in (await request.json())["fileTokens"]:
+        if token in state.files and token not in album["files"]:
+            album["files"].append(token)
+            state.files[token]["album"] = album["token"]
+    return web.json_response(album_json(request, album))
+
+
+async def disassociate(request: web.Request):
+    state = request.app["state"]
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    tokens = set((await request.json())["fileTokens"])
+    album["files"] = [token for token in album["files"] if token not in tokens]
+    for token in tokens:
+        if token in state.files:
+            state.files[token]["album"] = None
+    return web.json_response(album_json(request, album))
+
+
+async def share_album(request: web.Request):
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    album["public_token"] = album["public_token"] or str(uuid.uuid4())
+    return web.json_response({"success": True, "description": f"{request.scheme}://{request.host}/album/"
+                                                              f"{album['public_token']}"})
+
+
+async def revoke_album(request: web.Request):
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    album["public_token"] = None
+    return web.json_response({"success": True, "description": "album unshared"})
+
+
+# Zip the requested files of an album to a temporary file and stream it back
+async def download_album(request: web.Request):
+    state = request.app["state"]
+    album = find_album(request)
+    if album is None:
+        return not_found("Album not found")
+    ids = set(await request.json())
+    records = [state.files[token] for token in album["files"]
+               if token in state.files and (not ids or state.files[token]["id"] in ids)]
+    fd, path = tempfile.mkstemp(dir=state.directory, suffix=".zip")
+    with os.fdopen(fd, "wb") as fh, zipfile.ZipFile(fh, "w", zipfile.ZIP_STORED) as archive:
+        for record in records:
+            archive.write(record["path"], f"{record['id']}_{record['name']}")
+    response = web.StreamResponse(headers={"Content-Type": "application/zip",
+                                           "Content-Length": str(os.path.getsize(path))})
+    await response.prepare(request)
+    with open(path, "rb") as fh:
+        while chunk := fh.read(256 * 1024):
+            await response.write(chunk)
+    os.remove(path)
+    await response.write_eof()
+    return response
+
+
+async def restrictions(request: web.Request):
+    return web.json_response([{"type": "MAX_FILE_SIZE", "value": MAX_FILE_SIZE},
+                              {"type": "BANNED_MIME_TYPE", "value": "application/x-msdownload,application/x-executable"}])
+
+
+async def file_stats(request: web.Request):
+    state = request.app["state"]
+    return web.json_response({"recordCount": len(state.files),
+                              "recordSize": sum(os.path.getsize(record["path"]) for record in state.files.values())})
+
+
+def create_app(directory: str):
+    app = web.Application(client_max_size=MAX_FILE_SIZE)
+    app["state"] = StandInState(directory)
+    app.router.add_get("/rest/resources/restrictions", restrictions)
+    app.router.add_get("/rest/resources/stats/files", file_stats)
+    app.router.add_get("/rest/bucket/create", create_bucket)
+    app.router.add_post("/rest/bucket/get", get_bucket)
+    app.router.add_delete("/rest/bucket/{bucket}", delete_bucket)
+    app.router.add_post("/rest/album/download/{album}", download_album)
+    app.router.add_get("/rest/album/share/{album}", share_album)
+    app.router.add_get("/rest/album/revoke/{album}", revoke_album)
+    app.router.add_post("/rest/album/{album}/associate", associate)
+    app.router.add_post("/rest/album/{album}/disassociate", disassociate)
+    app.router.add_post("/rest/album/{bucket}", create_album)
+    app.router.add_get("/rest/album/{album}", get_album)
+    app.router.add_delete("/rest/album/{album}", delete_album)
+    app.router.add_put("/rest", upload)
+    app.router.add_put("/rest/{bucket}", upload)
+    app.router.add_get("/rest/{token}", file_info)
+    app.router.add_patch("/rest/{token}", file_update)
+    app.router.add_delete("/rest/{token}", delete_file)
+    app.router.add_get("/f/{token}/{name}", download)
+    return app
+
+
+async def _serve(port: int, ready=None):
+    directory = tempfile.mkdtemp(prefix="waifuvault-standin-")
+    runner = web.AppRunner(create_app(directory), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = runner.addresses[0][1]
+    if ready is not None:
+        ready.put(port)
+    else:
+        print(f"Serving on http://127.0.0.1:{port}/rest", flush=True)
+    # Shut down cleanly when the benchmark stops the process
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        await stopped.wait()
+    finally:
+        await runner.cleanup()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run(port: int, ready):
+    asyncio.run(_serve(port, ready))
+
+
+# Run the stand-in in a separate process, so it does not share CPU time or memory with the client being measured
+class StandInServer:
+    def __init__(self, port: int = 0):
+        self.port = port
+        self.base_url = None
+        self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        ready = context.Queue()
+        self._process = context.Process(target=_run, args=(self.port, ready), daemon=True)
+        self._process.start()
+        self.port = ready.get(timeout=30)
+        self.base_url = f"http://127.0.0.1:{self.port}/rest"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the waifuVault API")
+    parser.add_argument("--port", type=int, default=8181)
+    try:
+        asyncio.run(_serve(parser.parse_args().port))
+    except KeyboardInterrupt:
+        pass
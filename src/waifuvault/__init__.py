@@ -1,6 +1,36 @@
+import importlib
+
 from .waifumodels import (FileResponse, FileUpload, BucketResponse, Restriction, RestrictionResponse, FilesInfo,
-                          AlbumResponse)
-from .waifuvault import (upload_file, upload_file_async, file_info, get_file, delete_file, file_update, create_bucket, get_bucket,
-                         delete_bucket, get_restrictions, clear_restrictions, get_file_stats, create_album, delete_album,
-                         get_album, associate_files, disassociate_files, share_album, revoke_album, download_album,
-                         set_alt_baseurl)
+                          AlbumResponse, LazyModelList)
+from .waifucache import RestrictionsCache, FileInfoCache
+from .waifudedup import DedupIndex
+from .waifusync import SyncManifest, SyncResult
+from .waifuretry import RetryPolicy, RetryEvent
+from .waifulimit import RateLimiter, AdaptiveConcurrency
+from .waifumetrics import RequestEvent, Histogram, MetricsAdapter, MetricsCollector
+from .waifujson import set_json_backend, get_json_backend
+from .waifubulk import BulkResult, DeadlineExceeded, OutcomeUnknown
+from .waifuvault import (upload_file, upload_file_async, upload_many, upload_many_async, sync_directory, file_info,
+                         get_file, iter_file, get_file_to, get_file_parallel, download_resumable, delete_file,
+                         delete_many, file_update, update_many, create_bucket, get_bucket, delete_bucket,
+                         get_restrictions, clear_restrictions, get_file_stats, create_album, delete_album, get_album,
+                         associate_files, disassociate_files, associate_files_batched, disassociate_files_batched,
+                         share_album, revoke_album, download_album, iter_album, download_album_to, iter_album_members,
+                         extract_album, download_album_resumable, set_alt_baseurl, get_default_client,
+                         set_default_client)
+
+# The clients pull in requests and aiohttp, so they are only imported when first used
+_LAZY_ATTRIBUTES = {"WaifuVaultClient": ".waifuclient", "AsyncWaifuVaultClient": ".waifuasync"}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
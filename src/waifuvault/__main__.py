@@ -0,0 +1,5 @@
+import sys
+
+from .waifucli import main
+
+sys.exit(main())
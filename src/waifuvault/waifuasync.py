@@ -0,0 +1,632 @@
+# Asyncio client for waifuVault
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import aclosing, contextmanager
+from io import BytesIO
+
+import aiohttp
+import aiohttp.payload
+from aiohttp import ClientResponse
+
+from .waifumodels import FileResponse, FileUpload, BucketResponse, FilesInfo, AlbumResponse
+from .waifucache import RestrictionsCache, FileInfoCache
+from .waifudedup import DedupIndex
+from .waifuretry import RetryPolicy, is_replayable
+from .waifulimit import RateLimiter, AdaptiveConcurrency, CONGESTION_STATUSES
+from .waifumetrics import RequestEvent, describe_request, content_length
+from .waifujson import response_json_async
+from .waifuclient import (DEFAULT_BASE_URL, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, with_bucket_token,
+                          password_headers, file_tokens)
+from .waifustream import (DEFAULT_CHUNK_SIZE, open_destination, spool_chunks_async, split_ranges, range_length,
+                          PositionalWriter, ProgressReader, open_upload)
+from .waifubulk import run_bounded_async, chunked, BulkResult, current_budget
+
+
+# Streams a ProgressReader from a worker thread with a known Content-Length
+class ReaderPayload(aiohttp.payload.IOBasePayload):
+    def __init__(self, value: ProgressReader, *args, **kwargs):
+        super().__init__(value, *args, **kwargs)
+        self._size = value.len
+
+    @property
+    def size(self):
+        return self._size
+
+
+class AsyncWaifuVaultClient:
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, limit: int = 100, limit_per_host: int = 0,
+                 keepalive_timeout: float = 15.0, session: aiohttp.ClientSession = None,
+                 restrictions_cache: RestrictionsCache = None, file_info_cache: FileInfoCache = None,
+                 dedup_index: DedupIndex = None, retry: RetryPolicy = None, rate_limit: RateLimiter = None,
+                 concurrency_limit: AdaptiveConcurrency = None, hooks: list = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._timeout_override = contextvars.ContextVar("waifuvault_timeout", default=None)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.restrictions_cache = restrictions_cache if restrictions_cache is not None else RestrictionsCache()
+        self.file_info_cache = file_info_cache
+        self.dedup_index = dedup_index
+        self.retry = retry
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.hooks = list(hooks) if hooks is not None else []
+        self._session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    # Close the shared session
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # Override the connect and read timeouts, in seconds, of every request sent inside the with block
+    # Tasks started inside the block, such as those of bulk calls, inherit the override
+    @contextmanager
+    def timeout(self, connect: float = None, read: float = None):
+        token = self._timeout_override.set(client_timeout(connect if connect is not None else self.connect_timeout,
+                                                          read if read is not None else self.read_timeout))
+        try:
+            yield self
+        finally:
+            self._timeout_override.reset(token)
+
+    # Get the shared session, creating it inside the running loop on first use
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            trace_configs = [request_trace_config()] if self.hooks else None
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs,
+                                                  timeout=client_timeout(self.connect_timeout, self.read_timeout))
+        return self._session
+
+    # Send a request over the shared session, retrying transient failures when a retry policy is set
+    # replay builds fresh request arguments for every attempt, for bodies that can only be sent once
+    async def _request(self, method: str, url: str, replay=None, replayable: bool = None, **kwargs):
+        if replayable is None:
+            replayable = replay is not None or is_replayable(kwargs.get("data"))
+        override = self._timeout_override.get()
+        if override is not None:
+            kwargs.setdefault("timeout", override)
+        budget = current_budget()
+        attempt = 1
+        while True:
+            if replay is not None:
+                kwargs.update(replay())
+            if self.rate_limit is not None:
+                await self.rate_limit.acquire_async()
+            ticket = await self.concurrency_limit.acquire_async() if self.concurrency_limit is not None else None
+            if budget is not None:
+                # Checked once the slot is held, so a request that waited past the deadline is never sent
+                if budget.deadline.passed():
+                    self._discard_slot(ticket)
+                    raise budget.deadline.exceeded()
+                budget.sent = True
+            started = time.monotonic()
+            timings = {}
+            call_kwargs = {**kwargs, "trace_request_ctx": timings} if self.hooks else kwargs
+            try:
+                response = await getattr(self._get_session(), method)(url, **call_kwargs)
+            except BaseException as e:
+                self._release_slot(ticket, started, kwargs, None)
+                self._emit(method, url, attempt, started, timings, error=e)
+                if (not isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)) or self.retry is None
+                        or not self.retry.allows(method, attempt, replayable)):
+                    raise
+                delay = self.retry.delay(attempt)
+                self.retry.notify(method, url, attempt, delay, exception=e)
+            else:
+                self._release_slot(ticket, started, kwargs, response)
+                self._emit(method, url, attempt, started, timings, response)
+                if (self.retry is None or not self.retry.retries_status(response.status)
+                        or not self.retry.allows(method, attempt, replayable)):
+                    return response
+                delay = self.retry.delay(attempt, response.headers)
+                if delay is None:
+                    return response
+                response.release()
+                self.retry.notify(method, url, attempt, delay, status=response.status)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # Give back a concurrency slot whose request was never sent
+    def _discard_slot(self, ticket: int):
+        if ticket is not None:
+            self.concurrency_limit.discard(ticket)
+
+    # Give a concurrency slot back, reporting congestion and the time to the response headers
+    # Requests with a body are not used as latency samples, as their time depends on the upload size
+    def _release_slot(self, ticket: int, started: float, kwargs: dict, response=None):
+        if ticket is None:
+            return
+        if response is None:
+            self.concurrency_limit.release(ticket, None, True)
+            return
+        latency = time.monotonic() - started if kwargs.get("data") is None else None
+        self.concurrency_limit.release(ticket, latency, response.status in CONGESTION_STATUSES)
+
+    # Send a request event to every hook
+    # Responses are returned once their headers arrive, so the total time matches the time to first byte
+    def _emit(self, method: str, url: str, attempt: int, started: float, timings: dict, response=None, error=None):
+        if not self.hooks:
+            return
+        operation, template = describe_request(self.base_url, method, url)
+        total = time.monotonic() - started
+        dns = timings.get("dns")
+        # Creating a connection includes resolving the host
+        connect = timings.get("connect")
+        if connect is not None and dns is not None:
+            connect = max(0.0, connect - dns)
+        if response is None:
+            event = RequestEvent(operation, method, template, url, attempt, error=error, total=total, dns=dns,
+                                 connect=connect)
+        else:
+            event = RequestEvent(operation, method, template, url, attempt, response.status, total=total, ttfb=total,
+                                 dns=dns, connect=connect,
+                                 bytes_sent=content_length(response.request_info.headers),
+                                 bytes_received=content_length(response.headers))
+        for hook in self.hooks:
+            hook(event)
+
+    # Resources Section
+    # Get Restrictions
+    async def get_restrictions(self):
+        return self.restrictions_cache.set(await self._fetch_restrictions())
+
+    # Clear Restrictions
+    def clear_restrictions(self):
+        self.restrictions_cache.clear()
+
+    async def _fetch_restrictions(self):
+        url = f"{self.base_url}/resources/restrictions"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            return await response_json_async(response)
+
+    # File Stats
+    async def get_file_stats(self):
+        url = f"{self.base_url}/resources/stats/files"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            return FilesInfo(dict_obj=await response_json_async(response))
+
+    # Buckets Section
+    # Create Bucket
+    async def create_bucket(self):
+        url = f"{self.base_url}/bucket/create"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            return BucketResponse(dict_obj=await response_json_async(response))
+
+    # Delete Bucket
+    async def delete_bucket(self, token: str):
+        url = f"{self.base_url}/bucket/{token}"
+        response = await self._request("delete", url)
+        async with response:
+            await check_error_async(response, False)
+            return True if await response.text() == "true" else False
+
+    # Get Bucket
+    async def get_bucket(self, token: str):
+        url = f"{self.base_url}/bucket/get"
+        data = {"bucket_token": token}
+        response = await self._request("post", url, json=data)
+        async with response:
+            await check_error_async(response, False)
+            return BucketResponse(dict_obj=await response_json_async(response))
+
+    # Albums Section
+    # Create Album
+    async def create_album(self, bucket_token: str, name: str):
+        url = f"{self.base_url}/album/{bucket_token}"
+        data = {"name": name}
+        response = await self._request("post", url, json=data)
+        async with response:
+            await check_error_async(response, False)
+            return AlbumResponse(dict_obj=await response_json_async(response))
+
+    # Delete Album
+    async def delete_album(self, album_token: str, delete_files: bool):
+        url = f"{self.base_url}/album/{album_token}?deleteFiles=" + ("true" if delete_files else "false")
+        response = await self._request("delete", url)
+        async with response:
+            await check_error_async(response, False)
+            dict_obj = await response_json_async(response)
+            return dict_obj.get("success")
+
+    # Get Album
+    async def get_album(self, token: str):
+        url = f"{self.base_url}/album/{token}"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            return AlbumResponse(dict_obj=await response_json_async(response))
+
+    # Associate File
+    async def associate_files(self, token: str, file_tokens: list[str]):
+        url = f"{self.base_url}/album/{token}/associate"
+        data = {"fileTokens": file_tokens}
+        response = await self._request("post", url, json=data)
+        async with response:
+            await check_error_async(response, False)
+            return AlbumResponse(dict_obj=await response_json_async(response))
+
+    # Disassociate File
+    async def disassociate_files(self, token: str, file_tokens: list[str]):
+        url = f"{self.base_url}/album/{token}/disassociate"
+        data = {"fileTokens": file_tokens}
+        response = await self._request("post", url, json=data)
+        async with response:
+            await check_error_async(response, False)
+            return AlbumResponse(dict_obj=await response_json_async(response))
+
+    # Associate Files Batched
+    async def associate_files_batched(self, token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                                      deadline: float = None):
+        return await self._album_files_batched(token, "associate", file_tokens, chunk_size, concurrency, deadline)
+
+    # Disassociate Files Batched
+    async def disassociate_files_batched(self, token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                                         deadline: float = None):
+        return await self._album_files_batched(token, "disassociate", file_tokens, chunk_size, concurrency,
+                                               deadline)
+
+    async def _album_files_batched(self, token: str, action: str, file_tokens, chunk_size: int, concurrency: int,
+                                   deadline: float = None):
+        url = f"{self.base_url}/album/{token}/{action}"
+
+        async def send(chunk: list[str]):
+            response = await self._request("post", url, json={"fileTokens": chunk})
+            async with response:
+                await check_error_async(response, False)
+            return True
+
+        result = BulkResult()
+        async for chunk, outcome in run_bounded_async(send, chunked(file_tokens, chunk_size), concurrency, deadline):
+            result.add(chunk, outcome)
+        return result
+
+    # Share Album
+    async def share_album(self, token: str):
+        url = f"{self.base_url}/album/share/{token}"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            dict_obj = await response_json_async(response)
+            return dict_obj.get("description")
+
+    # Revoke Album
+    async def revoke_album(self, token: str):
+        url = f"{self.base_url}/album/revoke/{token}"
+        response = await self._request("get", url)
+        async with response:
+            await check_error_async(response, False)
+            dict_obj = await response_json_async(response)
+            return dict_obj.get("success")
+
+    # Download Album
+    async def download_album(self, token: str, files: list[int] = None, spool_threshold: int = None):
+        if spool_threshold is not None:
+            return await spool_chunks_async(self.iter_album(token, files), spool_threshold)
+        url = f"{self.base_url}/album/download/{token}"
+        if files is None:
+            files = []
+        response = await self._request("post", url, json=files)
+        async with response:
+            await check_error_async(response, True)
+            return BytesIO(await response.read())
+
+    # Iterate Album
+    async def iter_album(self, token: str, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        url = f"{self.base_url}/album/download/{token}"
+        if files is None:
+            files = []
+        response = await self._request("post", url, json=files)
+        async with response:
+            await check_error_async(response, True)
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    # Download Album To
+    async def download_album_to(self, token: str, destination, files: list[int] = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE):
+        written = 0
+        with open_destination(destination) as fh:
+            async for chunk in self.iter_album(token, files, chunk_size):
+                fh.write(chunk)
+                written += len(chunk)
+        return written
+
+    # Files Section
+    # Upload File
+    async def upload_file(self, file_obj: FileUpload, ignore_client_restrictions: bool = False, progress=None):
+        if not ignore_client_restrictions:
+            await self._check_restrictions(file_obj)
+        if self.dedup_index is None:
+            return await self._upload_file(file_obj, progress)
+        # Hash off the event loop
+        key = await asyncio.to_thread(self.dedup_index.key, file_obj)
+        existing = await self._find_duplicate(key)
+        if existing is not None:
+            return existing
+        file_response = await self._upload_file(file_obj, progress)
+        if key is not None:
+            self.dedup_index.record(key, file_response.token)
+        return file_response
+
+    # Get the info of an identical earlier upload that is still alive
+    async def _find_duplicate(self, key: tuple):
+        token = self.dedup_index.lookup(key) if key is not None else None
+        if token is None:
+            return None
+        try:
+            return await self.file_info(token, False)
+        except Exception:
+            self.dedup_index.forget(token)
+            return None
+
+    async def _upload_file(self, file_obj: FileUpload, progress=None):
+        url = self.base_url
+        if file_obj.bucket_token:
+            url += f"/{file_obj.bucket_token}"
+        if file_obj.is_url():
+            # Form data can only be sent once, so it is built for every attempt
+            def form():
+                form_data = aiohttp.FormData()
+                if file_obj.password:
+                    form_data.add_field('password', file_obj.password)
+                form_data.add_field('url', file_obj.target)
+                return {"data": form_data}
+
+            return await self._put_upload(url, file_obj, form, True)
+        with open_upload(file_obj) as (filename, source, size):
+            reader = ProgressReader(source, size, progress)
+
+            # Build the multipart body, rewinding the source when the upload is retried
+            def body():
+                if reader.bytes_read:
+                    reader.seek(0)
+                with aiohttp.MultipartWriter("form-data") as multipart_data:
+                    if file_obj.password:
+                        part = multipart_data.append(file_obj.password)
+                        part.set_content_disposition("form-data", name="password")
+                    part = multipart_data.append_payload(ReaderPayload(reader, filename=filename))
+                    part.set_content_disposition("form-data", name="file", filename=filename)
+                return {"data": multipart_data}
+
+            return await self._put_upload(url, file_obj, body, reader.seekable())
+
+    async def _put_upload(self, url: str, file_obj: FileUpload, replay, replayable: bool):
+        response = await self._request("put", url, replay=replay, replayable=replayable,
+                                       params=file_obj.build_parameters())
+        async with response:
+            await check_error_async(response, False)
+            return FileResponse(dict_obj=await response_json_async(response))
+
+    # Upload Many Files
+    async def upload_many(self, file_objs, concurrency: int = 4, bucket_token: str = None,
+                          ignore_client_restrictions: bool = False, deadline: float = None):
+        restrictions = None if ignore_client_restrictions else await self._current_restrictions()
+
+        async def upload(file_obj: FileUpload):
+            file_obj = with_bucket_token(file_obj, bucket_token)
+            if restrictions is not None:
+                for restriction in restrictions.Restrictions:
+                    restriction.passes(file_obj)
+            return await self.upload_file(file_obj, True)
+
+        async for item, result in run_bounded_async(upload, file_objs, concurrency, deadline):
+            yield item, result
+
+    # Update File
+    async def file_update(self, token: str, password: str = None, previous_password: str = None,
+                          custom_expiry: str = None, hide_filename: bool = False):
+        url = f"{self.base_url}/{token}"
+        fields = {'hideFilename': "true" if hide_filename else "false"}
+        if password is not None:
+            fields['password'] = password
+        if previous_password is not None:
+            fields['previousPassword'] = previous_password
+        if custom_expiry is not None:
+            fields['customExpiry'] = custom_expiry
+
+        response = await self._request("patch", url, data=fields)
+        self._invalidate_file_info(token)
+        async with response:
+            await check_error_async(response, False)
+            return FileResponse(dict_obj=await response_json_async(response))
+
+    # Update Many Files
+    async def update_many(self, tokens, password: str = None, previous_password: str = None,
+                          custom_expiry: str = None, hide_filename: bool = False, concurrency: int = 4,
+                          deadline: float = None):
+        async def update(token: str):
+            return await self.file_update(token, password, previous_password, custom_expiry, hide_filename)
+
+        result = BulkResult()
+        async for token, outcome in run_bounded_async(update, file_tokens(tokens), concurrency, deadline):
+            result.add([token], outcome)
+        return result
+
+    # Get File Info
+    async def file_info(self, token: str, formatted: bool):
+        if self.file_info_cache is not None:
+            cached = self.file_info_cache.get(token, formatted)
+            if cached is not None:
+                return cached
+        url = f"{self.base_url}/{token}"
+        response = await self._request("get", url,
+                                       params={'formatted': 'true' if formatted else 'false'})
+        async with response:
+            await check_error_async(response, False)
+            file_info = FileResponse(dict_obj=await response_json_async(response))
+        if self.file_info_cache is not None:
+            self.file_info_cache.put(token, formatted, file_info)
+        return file_info
+
+    # Delete File
+    async def delete_file(self, token: str):
+        url = f"{self.base_url}/{token}"
+        response = await self._request("delete", url)
+        self._invalidate_file_info(token)
+        if self.dedup_index is not None:
+            self.dedup_index.forget(token)
+        async with response:
+            await check_error_async(response, False)
+            return True if await response.text() == "true" else False
+
+    # Delete Many Files
+    async def delete_many(self, tokens, concurrency: int = 4, deadline: float = None):
+        async def delete(token: str):
+            if not await self.delete_file(token):
+                raise Exception(f"Error: File {token} was not deleted")
+            return True
+
+        result = BulkResult()
+        async for token, outcome in run_bounded_async(delete, file_tokens(tokens), concurrency, deadline):
+            result.add([token], outcome)
+        return result
+
+    # Get File
+    async def get_file(self, file_obj: FileResponse, password: str = None, spool_threshold: int = None):
+        if spool_threshold is not None:
+            return await spool_chunks_async(self.iter_file(file_obj, password), spool_threshold)
+        response = await self._request("get", await self._file_url(file_obj), headers=password_headers(password))
+        async with response:
+            await check_error_async(response, True)
+            return BytesIO(await response.read())
+
+    # Iterate File
+    async def iter_file(self, file_obj: FileResponse, password: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        response = await self._request("get", await self._file_url(file_obj), headers=password_headers(password))
+        async with response:
+            await check_error_async(response, True)
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    # Get File To
+    async def get_file_to(self, file_obj: FileResponse, destination, password: str = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE):
+        written = 0
+        with open_destination(destination) as fh:
+            async for chunk in self.iter_file(file_obj, password, chunk_size):
+                fh.write(chunk)
+                written += len(chunk)
+        return written
+
+    # Get File Parallel
+    async def get_file_parallel(self, file_obj: FileResponse, path: str | os.PathLike, password: str = None,
+                                connections: int = 4, min_part_size: int = 1024 * 1024,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE):
+        url = await self._file_url(file_obj)
+        headers = password_headers(password)
+        response = await self._request("head", url, headers=headers, allow_redirects=True)
+        async with response:
+            await check_error_async(response, True)
+            size = range_length(response.headers)
+        if size is None:
+            return await self.get_file_to(FileResponse(url=url), path, password, chunk_size)
+
+        async def fetch(byte_range: tuple[int, int]):
+            start, end = byte_range
+            part = await self._request("get", url, headers=dict(headers, Range=f"bytes={start}-{end}"))
+            async with part:
+                await check_error_async(part, True)
+                if part.status != 206:
+                    raise Exception(f"Error {part.status}: Range request for bytes {start}-{end} was not honoured")
+                offset = start
+                async for chunk in part.content.iter_chunked(chunk_size):
+                    if offset + len(chunk) > end + 1:
+                        raise Exception(f"Error: Received more data than requested for bytes {start}-{end}")
+                    await asyncio.to_thread(writer.write_at, chunk, offset)
+                    offset += len(chunk)
+            if offset != end + 1:
+                raise Exception(f"Error: Received {offset - start} of {end - start + 1} bytes for bytes {start}-{end}")
+
+        # The ranges are closed before the writer, so no task is still writing when a failed download is removed
+        with PositionalWriter(path, size) as writer:
+            async with aclosing(run_bounded_async(fetch, split_ranges(size, connections, min_part_size),
+                                                  connections)) as ranges:
+                async for byte_range, result in ranges:
+                    if isinstance(result, Exception):
+                        raise result
+        return size
+
+    # Resolve the download URL of a file, looking it up by token when needed
+    async def _file_url(self, file_obj: FileResponse):
+        if not file_obj.url and file_obj.token:
+            return (await self.file_info(file_obj.token, False)).url
+        return file_obj.url
+
+    def _invalidate_file_info(self, token: str):
+        if self.file_info_cache is not None:
+            self.file_info_cache.invalidate(token)
+
+    # Get cached restrictions, refreshing them once expired
+    async def _current_restrictions(self):
+        return await self.restrictions_cache.get_async(self._fetch_restrictions)
+
+    # Check file restrictions
+    async def _check_restrictions(self, file_obj: FileUpload):
+        for restriction in (await self._current_restrictions()).Restrictions:
+            restriction.passes(file_obj)
+
+
+# Record DNS and connection times into the timings dict passed as trace_request_ctx
+def request_trace_config():
+    trace_config = aiohttp.TraceConfig()
+
+    def started(name):
+        async def callback(session, context, params):
+            if isinstance(context.trace_request_ctx, dict):
+                context.trace_request_ctx[name] = time.monotonic()
+        return callback
+
+    def ended(name):
+        async def callback(session, context, params):
+            timings = context.trace_request_ctx
+            if isinstance(timings, dict) and f"{name}_start" in timings:
+                timings[name] = time.monotonic() - timings.pop(f"{name}_start")
+        return callback
+
+    trace_config.on_dns_resolvehost_start.append(started("dns_start"))
+    trace_config.on_dns_resolvehost_end.append(ended("dns"))
+    trace_config.on_connection_create_start.append(started("connect_start"))
+    trace_config.on_connection_create_end.append(ended("connect"))
+    return trace_config
+
+
+# Socket level timeouts with no limit on the whole request, so long transfers that keep making progress are not cut off
+def client_timeout(connect: float = None, read: float = None):
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+# Check Error Async
+async def check_error_async(response: ClientResponse, is_download: bool):
+    if not response.ok:
+        try:
+            err = await response.json()
+            status = err.get("status", response.status)
+            name = err.get("name", "Unknown Error")
+            message = err.get("message", "Unknown Message")
+        except Exception:
+            text = await response.text()
+            status = response.status
+            name = "Password is Incorrect" if status == 403 and is_download else status
+            message = "Password is Incorrect" if status == 403 and is_download else text
+        raise Exception(f"Error {status} ({name}): {message}")
+    return
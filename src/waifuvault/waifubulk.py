@@ -0,0 +1,232 @@
+# Bounded concurrency helpers for waifuVault bulk operations
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+
+# Raised for the items of a bulk operation that did not run before its deadline passed
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+# Raised for the items of a bulk operation that were sending requests when its deadline passed
+# Their requests may or may not have taken effect on the server, so retrying them can repeat the work
+class OutcomeUnknown(TimeoutError):
+    pass
+
+
+# Time budget shared by the items of a bulk operation
+# Once it passes, items still running stop at their next request, chunk or retry
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self.stopped = threading.Event()
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def passed(self):
+        return self.stopped.is_set() or self.remaining() <= 0
+
+    def exceeded(self):
+        return DeadlineExceeded(f"Error: Deadline of {self.seconds}s exceeded before the item finished")
+
+    # Limit a (connect, read) timeout to the time left, so a request blocked on the network ends with the deadline
+    def cap(self, timeout):
+        left = max(self.remaining(), 0.001)
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return tuple(left if value is None else min(value, left) for value in (connect, read))
+
+
+# State of one item of a bulk operation with a deadline, reached by the requests it sends through a context variable
+class ItemBudget:
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+        self.sent = False
+
+
+_budget = contextvars.ContextVar("waifuvault_budget", default=None)
+
+
+# The budget of the bulk item being worked on in this context, or None outside bulk operations with a deadline
+def current_budget():
+    return _budget.get()
+
+
+# Raise DeadlineExceeded once the deadline of the current bulk item has passed
+def check_deadline():
+    budget = _budget.get()
+    if budget is not None and budget.deadline.passed():
+        raise budget.deadline.exceeded()
+
+
+# Sleep before a retry, raising DeadlineExceeded instead when the deadline of the current bulk item passes first
+def sleep_within_deadline(seconds: float):
+    budget = _budget.get()
+    if budget is None:
+        time.sleep(seconds)
+        return
+    if budget.deadline.stopped.wait(max(0.0, min(seconds, budget.deadline.remaining()))) or budget.deadline.passed():
+        raise budget.deadline.exceeded()
+
+
+def _run_item(fn, item, budget: ItemBudget):
+    _budget.set(budget)
+    return fn(item)
+
+
+async def _run_item_async(fn, item, budget: ItemBudget):
+    _budget.set(budget)
+    return await fn(item)
+
+
+# Items that sent a request before the deadline stopped them are reported as OutcomeUnknown, not DeadlineExceeded
+def _outcome(result, error, budget: ItemBudget):
+    if error is None:
+        return result
+    if isinstance(error, DeadlineExceeded) and budget is not None and budget.deadline.passed():
+        if not budget.sent:
+            return budget.deadline.exceeded()
+        unknown = OutcomeUnknown(f"Error: Deadline of {budget.deadline.seconds}s passed while the item was in flight,"
+                                 f" it may or may not have taken effect")
+        unknown.__cause__ = error
+        return unknown
+    return error
+
+
+# Run fn over items on a thread pool, yielding (item, result | exception) in completion order
+# With a deadline in seconds, items are not started once it passes and are yielded with DeadlineExceeded, while the
+# items still running stop at their next request, chunk or retry and are waited for, so their outcome is reported
+# Each item runs in a copy of the caller's context, so per call settings such as timeouts carry over
+def run_bounded(fn, items, concurrency: int, deadline: float = None):
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    limit = Deadline(deadline) if deadline is not None else None
+    iterator = iter(items)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+
+    def submit(item):
+        budget = ItemBudget(limit) if limit is not None else None
+        pending[executor.submit(contextvars.copy_context().run, _run_item, fn, item, budget)] = item, budget
+
+    def finish(future):
+        item, budget = pending.pop(future)
+        error = future.exception()
+        return item, _outcome(None if error is not None else future.result(), error, budget)
+
+    try:
+        for item in itertools.islice(iterator, concurrency):
+            submit(item)
+        while pending:
+            timeout = max(0.0, limit.remaining()) if limit is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                limit.stopped.set()
+                for future in as_completed(list(pending)):
+                    yield finish(future)
+                break
+            for future in done:
+                yield finish(future)
+                if limit is None or not limit.passed():
+                    for next_item in itertools.islice(iterator, 1):
+                        submit(next_item)
+        if limit is not None:
+            for item in iterator:
+                yield item, limit.exceeded()
+    finally:
+        if limit is not None:
+            limit.stopped.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+# Run coroutine function fn over items, yielding (item, result | exception) in completion order
+# With a deadline in seconds, items still running when it passes are cancelled, and reported as OutcomeUnknown when
+# they had sent a request or DeadlineExceeded when they had not
+async def run_bounded_async(fn, items, concurrency: int, deadline: float = None):
+    import asyncio
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    limit = Deadline(deadline) if deadline is not None else None
+    iterator = iter(items)
+    pending = {}
+
+    def submit(item):
+        budget = ItemBudget(limit) if limit is not None else None
+        pending[asyncio.ensure_future(_run_item_async(fn, item, budget))] = item, budget
+
+    def finish(task):
+        item, budget = pending.pop(task)
+        error = limit.exceeded() if task.cancelled() else task.exception()
+        return item, _outcome(None if error is not None else task.result(), error, budget)
+
+    try:
+        for item in itertools.islice(iterator, concurrency):
+            submit(item)
+        while pending:
+            timeout = max(0.0, limit.remaining()) if limit is not None else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                limit.stopped.set()
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for task in list(pending):
+                    yield finish(task)
+                break
+            for task in done:
+                yield finish(task)
+                if limit is None or not limit.passed():
+                    for next_item in itertools.islice(iterator, 1):
+                        submit(next_item)
+        if limit is not None:
+            for item in iterator:
+                yield item, limit.exceeded()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# Split items into lists of at most size items, lazily
+def chunked(items, size: int):
+    if size < 1:
+        raise ValueError("chunk size must be at least 1")
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+# Per token outcome of a bulk operation
+class BulkResult:
+    def __init__(self):
+        self.succeeded = {}
+        self.failed = {}
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    # Tokens that were not started before the deadline ran out, and are safe to retry
+    @property
+    def unfinished(self):
+        return [token for token, error in self.failed.items() if isinstance(error, DeadlineExceeded)]
+
+    # Tokens that were in flight when the deadline ran out, which may or may not have been changed
+    @property
+    def unknown(self):
+        return [token for token, error in self.failed.items() if isinstance(error, OutcomeUnknown)]
+
+    # Record the outcome of a call covering tokens, given its result or the exception it raised
+    def add(self, tokens, outcome):
+        for token in tokens:
+            if isinstance(outcome, Exception):
+                self.failed[token] = outcome
+            else:
+                self.succeeded[token] = outcome
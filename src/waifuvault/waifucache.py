@@ -0,0 +1,195 @@
+# Caches for waifuVault clients
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .waifumodels import RestrictionResponse
+
+DEFAULT_RESTRICTIONS_TTL = 600
+
+
+class RestrictionsCache:
+    def __init__(self, ttl: float = DEFAULT_RESTRICTIONS_TTL, refresh_ahead: float = 60,
+                 path: str | os.PathLike = None):
+        self.ttl = ttl
+        # Refreshing ahead by the whole TTL or more would make every entry due as soon as it is stored
+        self.refresh_ahead = min(refresh_ahead, ttl / 2) if refresh_ahead else refresh_ahead
+        self.path = path
+        self._restrictions = None
+        self._lock = threading.Lock()
+        self._async_lock = None
+        self._async_lock_loop = None
+        self._refreshing = False
+        self._refresh_tasks = set()
+
+    # Get the cached restrictions, calling loader at most once across threads when they are missing or expired
+    # loader returns the raw restrictions JSON
+    def get(self, loader):
+        restrictions = self._fresh()
+        if restrictions is not None:
+            if self._claim_refresh(restrictions):
+                threading.Thread(target=self._refresh, args=(loader,), daemon=True).start()
+            return restrictions
+        with self._lock:
+            restrictions = self._fresh() or self._load()
+            if restrictions is not None:
+                return restrictions
+            return self.set(loader())
+
+    # Get the cached restrictions, awaiting loader at most once across tasks when they are missing or expired
+    async def get_async(self, loader):
+        import asyncio
+        restrictions = self._fresh()
+        if restrictions is not None:
+            if self._claim_refresh(restrictions):
+                task = asyncio.ensure_future(self._refresh_async(loader))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return restrictions
+        async with self._get_async_lock():
+            restrictions = self._fresh() or self._load()
+            if restrictions is not None:
+                return restrictions
+            return self.set(await loader())
+
+    # Store freshly fetched restrictions, persisting them when a path is configured
+    def set(self, rest_obj: list):
+        restrictions = RestrictionResponse(rest_obj=rest_obj, ttl=self.ttl)
+        self._restrictions = restrictions
+        if self.path is not None:
+            self._save(rest_obj, restrictions.Expires)
+        return restrictions
+
+    def clear(self):
+        self._restrictions = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _fresh(self):
+        restrictions = self._restrictions
+        if restrictions is not None and restrictions.Expires > datetime.now():
+            return restrictions
+        return None
+
+    def _should_refresh(self, restrictions: RestrictionResponse):
+        return (self.refresh_ahead and not self._refreshing
+                and restrictions.Expires - datetime.now() < timedelta(seconds=self.refresh_ahead))
+
+    # Take the background refresh when it is due and no other refresh is running, without waiting for the lock
+    # A thread holding the lock is already loading, so there is nothing to refresh
+    def _claim_refresh(self, restrictions: RestrictionResponse):
+        if not self._should_refresh(restrictions) or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if not self._should_refresh(restrictions):
+                return False
+            self._refreshing = True
+            return True
+        finally:
+            self._lock.release()
+
+    def _refresh(self, loader):
+        try:
+            self.set(loader())
+        except Exception:
+            pass
+        finally:
+            self._refreshing = False
+
+    async def _refresh_async(self, loader):
+        try:
+            self.set(await loader())
+        except Exception:
+            pass
+        finally:
+            self._refreshing = False
+
+    # asyncio locks belong to one event loop, so make a new one when the loop changes
+    def _get_async_lock(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock_loop is not loop:
+            self._async_lock = asyncio.Lock()
+            self._async_lock_loop = loop
+        return self._async_lock
+
+    def _load(self):
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, "r") as fh:
+                state = json.load(fh)
+            expires = datetime.fromtimestamp(state["expires"])
+            rest_obj = state["restrictions"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if expires <= datetime.now():
+            return None
+        restrictions = RestrictionResponse(rest_obj=rest_obj, ttl=self.ttl)
+        restrictions.Expires = expires
+        self._restrictions = restrictions
+        return restrictions
+
+    def _save(self, rest_obj: list, expires: datetime):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as fh:
+                json.dump({"expires": expires.timestamp(), "restrictions": rest_obj}, fh)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+class FileInfoCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    # Get the cached file info for a (token, formatted) lookup, or None when missing or expired
+    def get(self, token: str, formatted: bool):
+        key = (token, bool(formatted))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    # Store file info, evicting the least recently used entries once full
+    def put(self, token: str, formatted: bool, file_info):
+        key = (token, bool(formatted))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, file_info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # Drop every cached lookup of a token
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop((token, False), None)
+            self._entries.pop((token, True), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
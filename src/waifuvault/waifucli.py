@@ -0,0 +1,429 @@
+# Command line interface for bulk waifuVault operations
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+from .waifumodels import FileResponse, FileUpload
+from .waifubulk import run_bounded, OutcomeUnknown
+from .waifustream import DEFAULT_CHUNK_SIZE, RateMeter, open_destination
+from .waifuzip import extract_zip_stream
+
+
+# Human readable byte count
+def format_bytes(amount: float):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(amount) < 1024:
+            return f"{amount:.1f} {unit}" if unit != "B" else f"{int(amount)} B"
+        amount /= 1024
+    return f"{amount:.1f} TB"
+
+
+def format_duration(seconds: float):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+# Live progress line for transfers running concurrently, written to stderr
+class TransferProgress:
+    def __init__(self, total_items: int = None, total_bytes: int = None, stream=None, enabled: bool = True,
+                 interval: float = 0.2):
+        self.total_items = total_items
+        self.total_bytes = total_bytes
+        self.stream = stream if stream is not None else sys.stderr
+        self.enabled = enabled
+        self.interval = interval
+        self.items_done = 0
+        self.bytes_done = 0
+        self.rate = 0.0
+        self._transferred = {}
+        self._meter = RateMeter(window=3.0)
+        self._rendered = 0.0
+        self._width = 0
+        self._lock = threading.Lock()
+
+    # Record the bytes transferred so far for one item
+    def update(self, key, transferred: int):
+        with self._lock:
+            delta = transferred - self._transferred.get(key, 0)
+            self._transferred[key] = transferred
+            self.bytes_done += delta
+            self.rate = self._meter.update(max(delta, 0))
+            self._render()
+
+    # Add the size of a transfer to the total once it is known, such as from a response's Content-Length
+    def expect(self, size: int):
+        with self._lock:
+            self.total_bytes = (self.total_bytes or 0) + size
+
+    def finish(self, key):
+        with self._lock:
+            self._transferred.pop(key, None)
+            self.items_done += 1
+            self._render(force=True)
+
+    def eta(self):
+        if self.total_bytes is None or self.rate <= 0:
+            return None
+        return max(0, self.total_bytes - self.bytes_done) / self.rate
+
+    def line(self):
+        parts = []
+        if self.total_items is not None:
+            parts.append(f"{self.items_done}/{self.total_items} files")
+        done = format_bytes(self.bytes_done)
+        parts.append(f"{done} / {format_bytes(self.total_bytes)}" if self.total_bytes is not None else done)
+        parts.append(f"{format_bytes(self.rate)}/s")
+        eta = self.eta()
+        if eta is not None:
+            parts.append(f"ETA {format_duration(eta)}")
+        return "  ".join(parts)
+
+    def close(self):
+        with self._lock:
+            if self.enabled and self._width:
+                self._render(force=True)
+                self.stream.write("\n")
+                self.stream.flush()
+
+    def _render(self, force: bool = False):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if not force and now - self._rendered < self.interval:
+            return
+        self._rendered = now
+        line = self.line()
+        self.stream.write("\r" + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+
+
+# Expand the paths given on the command line, walking directories
+def collect_files(paths: list[str]):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(directory, name) for name in sorted(names))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise ValueError(f"No such file or directory: {path}")
+    return files
+
+
+def file_json(file: FileResponse):
+    return {"token": file.token, "id": file.file_id, "url": file.url, "bucket": file.bucket,
+            "retentionPeriod": file.retentionPeriod, "views": file.views,
+            "album": file.album.token if file.album is not None else None}
+
+
+def album_json(album):
+    return {"token": album.token, "bucketToken": album.bucket_token, "publicToken": album.public_token,
+            "name": album.name, "files": album.files.tokens() if album.files is not None else []}
+
+
+# Describe a failed file, flagging those that were in flight when the deadline passed and may have gone through
+def error_json(error: Exception):
+    document = {"error": str(error)}
+    if isinstance(error, OutcomeUnknown):
+        document["unknown"] = True
+    return document
+
+
+# Name a downloaded file after the last part of its URL
+# The decoded name is reduced to its base name, so an encoded path such as ..%2F..%2Fevil.sh can not climb out
+def file_name(url: str):
+    name = os.path.basename(unquote(urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]))
+    return name if name not in ("", ".", "..") else "download"
+
+
+# Path of a download in the output directory, refusing names that would resolve outside of it
+def download_path(directory: str, name: str):
+    root = os.path.abspath(directory)
+    path = os.path.abspath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"Download {name} would be saved outside of {directory}")
+    return os.path.join(directory, name)
+
+
+# Count the bytes of a chunk stream as it is consumed
+def counted(chunks, progress: TransferProgress, key):
+    transferred = 0
+    for chunk in chunks:
+        transferred += len(chunk)
+        progress.update(key, transferred)
+        yield chunk
+
+
+# Client hook adding the Content-Length of every download response to the progress total, so downloads get an ETA
+def expect_downloads(progress: TransferProgress):
+    def hook(event):
+        if event.operation in ("get_file", "download_album") and event.status == 200 and event.bytes_received:
+            progress.expect(event.bytes_received)
+    return hook
+
+
+class Output:
+    def __init__(self, as_json: bool, stream=None):
+        self.as_json = as_json
+        self.stream = stream if stream is not None else sys.stdout
+
+    # Print a result document as JSON, or the text lines made from it
+    def emit(self, document, lines):
+        if self.as_json:
+            json.dump(document, self.stream, indent=2)
+            self.stream.write("\n")
+        else:
+            for line in lines:
+                self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+def upload(client, args, output: Output):
+    paths = collect_files(args.paths)
+    total = sum(os.path.getsize(path) for path in paths)
+    progress = TransferProgress(len(paths), total, enabled=args.progress)
+
+    def send(path: str):
+        file_obj = FileUpload(path, bucket_token=args.bucket, expires=args.expires, password=args.password,
+                              hidefilename=args.hide_filename, oneTimeDownload=args.one_time_download)
+        try:
+            return client.upload_file(file_obj, progress=lambda sent, size, rate: progress.update(path, sent))
+        finally:
+            progress.finish(path)
+
+    results = []
+    try:
+        for path, result in run_bounded(send, paths, args.jobs, args.deadline):
+            if isinstance(result, Exception):
+                results.append(dict(error_json(result), path=path))
+            else:
+                results.append(dict(file_json(result), path=path))
+    finally:
+        progress.close()
+    order = {path: index for index, path in enumerate(paths)}
+    results.sort(key=lambda result: order[result["path"]])
+    document = {"files": results}
+    uploaded = [result["token"] for result in results if "token" in result]
+    if args.album and uploaded:
+        document["album"] = album_json(client.associate_files(args.album, uploaded))
+    output.emit(document, [f"{result['path']}\t{result.get('url') or 'ERROR ' + result['error']}"
+                           for result in results])
+    return 1 if len(uploaded) != len(results) else 0
+
+
+def download(client, args, output: Output):
+    os.makedirs(args.output, exist_ok=True)
+    if args.album:
+        return download_album(client, args, output)
+    progress = TransferProgress(len(args.tokens), enabled=args.progress)
+    hook = expect_downloads(progress)
+    claimed = set()
+    claim_lock = threading.Lock()
+
+    # Give every download of this run its own path, numbering names that clash so concurrent downloads never share one
+    def claim(name: str):
+        stem, extension = os.path.splitext(name)
+        with claim_lock:
+            path = download_path(args.output, name)
+            count = 1
+            while path in claimed:
+                count += 1
+                path = download_path(args.output, f"{stem} ({count}){extension}")
+            claimed.add(path)
+        return path
+
+    def fetch(token: str):
+        try:
+            if token.lower().startswith(("http://", "https://")):
+                file = FileResponse(url=token)
+            else:
+                file = client.file_info(token, False)
+            path = claim(file_name(file.url))
+            with open_destination(path) as fh:
+                for chunk in counted(client.iter_file(file, args.password, args.chunk_size), progress, token):
+                    fh.write(chunk)
+            return path
+        finally:
+            progress.finish(token)
+
+    results = []
+    client.hooks.append(hook)
+    try:
+        for token, result in run_bounded(fetch, args.tokens, args.jobs, args.deadline):
+            if isinstance(result, Exception):
+                results.append(dict(error_json(result), token=token))
+            else:
+                results.append({"token": token, "path": result, "size": os.path.getsize(result)})
+    finally:
+        client.hooks.remove(hook)
+        progress.close()
+    order = {token: index for index, token in enumerate(args.tokens)}
+    results.sort(key=lambda result: order[result["token"]])
+    output.emit({"files": results}, [f"{result['token']}\t{result.get('path') or 'ERROR ' + result['error']}"
+                                     for result in results])
+    return 1 if any("error" in result for result in results) else 0
+
+
+# Stream an album zip to disk, or extract it on the fly
+def download_album(client, args, output: Output):
+    progress = TransferProgress(enabled=args.progress)
+    hook = expect_downloads(progress)
+    results = []
+    client.hooks.append(hook)
+    try:
+        for token in args.tokens:
+            chunks = counted(client.iter_album(token, args.files, args.chunk_size), progress, token)
+            if args.extract:
+                directory = os.path.join(args.output, token) if len(args.tokens) > 1 else args.output
+                paths = extract_zip_stream(chunks, directory)
+                results.append({"album": token, "directory": directory, "files": [str(path) for path in paths]})
+            else:
+                path = os.path.join(args.output, f"{token}.zip")
+                with open_destination(path) as fh:
+                    for chunk in chunks:
+                        fh.write(chunk)
+                results.append({"album": token, "path": path, "size": os.path.getsize(path)})
+            progress.finish(token)
+    finally:
+        client.hooks.remove(hook)
+        progress.close()
+    output.emit({"albums": results}, [f"{result['album']}\t{result.get('path') or result['directory']}"
+                                      for result in results])
+    return 0
+
+
+def bucket_create(client, args, output: Output):
+    bucket = client.create_bucket()
+    output.emit({"token": bucket.token}, [bucket.token])
+    return 0
+
+
+def bucket_list(client, args, output: Output):
+    bucket = client.get_bucket(args.token)
+    files = [file_json(file) for file in bucket.files]
+    albums = [album_json(album) for album in bucket.albums]
+    lines = [f"{file['token']}\t{file['url']}" for file in files]
+    lines += [f"album {album['token']}\t{album['name']}\t{len(album['files'])} files" for album in albums]
+    output.emit({"token": bucket.token, "files": files, "albums": albums}, lines)
+    return 0
+
+
+def bucket_delete(client, args, output: Output):
+    deleted = client.delete_bucket(args.token)
+    output.emit({"token": args.token, "deleted": deleted}, [f"{args.token}\t{'deleted' if deleted else 'not deleted'}"])
+    return 0 if deleted else 1
+
+
+def album_create(client, args, output: Output):
+    album = client.create_album(args.bucket, args.name)
+    output.emit(album_json(album), [album.token])
+    return 0
+
+
+def album_associate(client, args, output: Output):
+    album = client.associate_files(args.token, args.files)
+    output.emit(album_json(album), [f"{album.token}\t{len(album.files)} files"])
+    return 0
+
+
+def album_disassociate(client, args, output: Output):
+    album = client.disassociate_files(args.token, args.files)
+    output.emit(album_json(album), [f"{album.token}\t{len(album.files)} files"])
+    return 0
+
+
+def build_parser():
+    from .waifuclient import DEFAULT_BASE_URL, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+    parser = argparse.ArgumentParser(prog="waifuvault", description="Upload to and download from waifuVault")
+    parser.add_argument("--base-url", default=os.environ.get("WAIFUVAULT_BASE_URL", DEFAULT_BASE_URL),
+                        help="The API to use, defaults to $WAIFUVAULT_BASE_URL or the public waifuVault")
+    parser.add_argument("--json", action="store_true", help="Print machine readable JSON to stdout")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not show progress")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                        help="Seconds to wait for a connection")
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT,
+                        help="Seconds to wait for the server to send data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upload_parser = commands.add_parser("upload", help="Upload files and directories")
+    upload_parser.add_argument("paths", nargs="+", help="Files, or directories to upload recursively")
+    upload_parser.add_argument("-j", "--jobs", type=int, default=4, help="Uploads to run at once")
+    upload_parser.add_argument("--deadline", type=float, help="Seconds to finish within, unfinished files fail")
+    upload_parser.add_argument("--bucket", help="Upload into this bucket")
+    upload_parser.add_argument("--album", help="Add the uploaded files to this album of the bucket")
+    upload_parser.add_argument("--expires", help="Expiry such as 1d or 10m")
+    upload_parser.add_argument("--password", help="Password protect the files")
+    upload_parser.add_argument("--hide-filename", action="store_true", help="Hide the file names in the URLs")
+    upload_parser.add_argument("--one-time-download", action="store_true", help="Delete the files once downloaded")
+    upload_parser.set_defaults(handler=upload)
+
+    download_parser = commands.add_parser("download", help="Download files by token or URL, or whole albums")
+    download_parser.add_argument("tokens", nargs="+", help="File tokens or URLs, or album tokens with --album")
+    download_parser.add_argument("-o", "--output", default=".", help="Directory to save to")
+    download_parser.add_argument("-j", "--jobs", type=int, default=4, help="Downloads to run at once")
+    download_parser.add_argument("--deadline", type=float, help="Seconds to finish within, unfinished files fail")
+    download_parser.add_argument("--password", help="Password of protected files")
+    download_parser.add_argument("--album", action="store_true", help="The tokens are albums, saved as zips")
+    download_parser.add_argument("--extract", action="store_true", help="Extract albums instead of saving zips")
+    download_parser.add_argument("--files", type=int, nargs="+", help="Only these file ids of the albums")
+    download_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help=argparse.SUPPRESS)
+    download_parser.set_defaults(handler=download)
+
+    bucket_parser = commands.add_parser("bucket", help="Manage buckets")
+    bucket_commands = bucket_parser.add_subparsers(dest="bucket_command", required=True)
+    bucket_commands.add_parser("create", help="Create a bucket").set_defaults(handler=bucket_create)
+    list_parser = bucket_commands.add_parser("list", help="List the files and albums of a bucket")
+    list_parser.add_argument("token")
+    list_parser.set_defaults(handler=bucket_list)
+    delete_parser = bucket_commands.add_parser("delete", help="Delete a bucket and its files")
+    delete_parser.add_argument("token")
+    delete_parser.set_defaults(handler=bucket_delete)
+
+    album_parser = commands.add_parser("album", help="Manage albums")
+    album_commands = album_parser.add_subparsers(dest="album_command", required=True)
+    create_parser = album_commands.add_parser("create", help="Create an album in a bucket")
+    create_parser.add_argument("bucket")
+    create_parser.add_argument("name")
+    create_parser.set_defaults(handler=album_create)
+    associate_parser = album_commands.add_parser("associate", help="Add files to an album")
+    associate_parser.add_argument("token")
+    associate_parser.add_argument("files", nargs="+")
+    associate_parser.set_defaults(handler=album_associate)
+    disassociate_parser = album_commands.add_parser("disassociate", help="Remove files from an album")
+    disassociate_parser.add_argument("token")
+    disassociate_parser.add_argument("files", nargs="+")
+    disassociate_parser.set_defaults(handler=album_disassociate)
+    return parser
+
+
+def main(argv=None):
+    from .waifuclient import WaifuVaultClient
+    args = build_parser().parse_args(argv)
+    args.progress = not args.quiet and sys.stderr.isatty()
+    if getattr(args, "jobs", 1) < 1:
+        print("waifuvault: error: --jobs must be at least 1", file=sys.stderr)
+        return 2
+    output = Output(args.json)
+    try:
+        with WaifuVaultClient(args.base_url, pool_maxsize=max(10, getattr(args, "jobs", 1)),
+                              connect_timeout=args.connect_timeout, read_timeout=args.read_timeout) as client:
+            return args.handler(client, args, output)
+    except Exception as e:
+        if args.json:
+            output.emit({"error": str(e)}, [])
+        print(f"waifuvault: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,717 @@
+# Pooled client for waifuVault
+import contextvars
+import copy
+import os
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+
+from .waifumodels import FileResponse, FileUpload, BucketResponse, FilesInfo, AlbumResponse, LazyModelList
+from .waifucache import RestrictionsCache, FileInfoCache
+from .waifubulk import (run_bounded, chunked, BulkResult, current_budget, check_deadline, sleep_within_deadline)
+from .waifustream import (DEFAULT_CHUNK_SIZE, DEFAULT_CHECKPOINT_SIZE, open_destination, write_chunks, spool_chunks,
+                          split_ranges, range_length, PositionalWriter, DownloadCheckpoint, content_range_total,
+                          ProgressReader, open_upload, iter_multipart)
+from .waifuzip import iter_zip_members, extract_zip_stream
+from .waifudedup import DedupIndex
+from .waifusync import sync_directory
+from .waifuretry import RetryPolicy, is_replayable
+from .waifulimit import RateLimiter, AdaptiveConcurrency, CONGESTION_STATUSES
+from .waifumetrics import RequestEvent, describe_request, content_length
+from .waifujson import response_json
+
+DEFAULT_BASE_URL = "https://waifuvault.moe/rest"
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+
+
+# Connection pool adapter applying default timeouts to requests that do not set their own
+class TimeoutHTTPAdapter(HTTPAdapter):
+    __attrs__ = HTTPAdapter.__attrs__ + ["timeout"]
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+class WaifuVaultClient:
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, pool_connections: int = 10, pool_maxsize: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True, session: requests.Session = None,
+                 restrictions_cache: RestrictionsCache = None, file_info_cache: FileInfoCache = None,
+                 dedup_index: DedupIndex = None, retry: RetryPolicy = None, rate_limit: RateLimiter = None,
+                 concurrency_limit: AdaptiveConcurrency = None, hooks: list = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._timeout_override = contextvars.ContextVar("waifuvault_timeout", default=None)
+        self.hooks = list(hooks) if hooks is not None else []
+        self.retry = retry
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.restrictions_cache = restrictions_cache if restrictions_cache is not None else RestrictionsCache()
+        self.file_info_cache = file_info_cache
+        self.dedup_index = dedup_index
+        self._session = session if session is not None else requests.Session()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._pool_lock = threading.Lock()
+        self._mount_adapter()
+        if not keep_alive:
+            self._session.headers["Connection"] = "close"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # Close the pooled connections
+    def close(self):
+        self._session.close()
+
+    def _mount_adapter(self):
+        adapter = TimeoutHTTPAdapter((self.connect_timeout, self.read_timeout),
+                                     pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                     pool_block=self.pool_block)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    # Grow the connection pool to keep count connections, so concurrent calls reuse them instead of
+    # opening new ones that urllib3 discards once the pool is full
+    # The old pool is closed, requests still using it finish normally
+    def _reserve_connections(self, count: int):
+        with self._pool_lock:
+            if count <= self.pool_maxsize:
+                return
+            previous = self._session.get_adapter(self.base_url)
+            self.pool_maxsize = count
+            self._mount_adapter()
+            if isinstance(previous, TimeoutHTTPAdapter):
+                previous.close()
+
+    # Override the connect and read timeouts, in seconds, of every request sent inside the with block
+    # Bulk calls started inside the block pass the override on to their workers
+    @contextmanager
+    def timeout(self, connect: float = None, read: float = None):
+        token = self._timeout_override.set((connect if connect is not None else self.connect_timeout,
+                                            read if read is not None else self.read_timeout))
+        try:
+            yield self
+        finally:
+            self._timeout_override.reset(token)
+
+    # Send a request over the pooled session, retrying transient failures when a retry policy is set
+    # replay builds fresh request arguments for every attempt, for bodies that can only be sent once
+    # Inside a bulk call with a deadline, no request is sent once it has passed and timeouts are capped to the time left
+    def _request(self, method: str, url: str, replay=None, replayable: bool = None, **kwargs):
+        if replayable is None:
+            replayable = replay is not None or is_replayable(kwargs.get("data"))
+        override = self._timeout_override.get()
+        if override is not None:
+            kwargs.setdefault("timeout", override)
+        budget = current_budget()
+        timeout = kwargs.get("timeout") or (self.connect_timeout, self.read_timeout)
+        attempt = 1
+        while True:
+            if replay is not None:
+                kwargs.update(replay())
+            if self.rate_limit is not None:
+                self.rate_limit.acquire()
+            ticket = self.concurrency_limit.acquire() if self.concurrency_limit is not None else None
+            if budget is not None:
+                # Checked once the slot is held, so a request that waited past the deadline is never sent
+                if budget.deadline.passed():
+                    self._discard_slot(ticket)
+                    raise budget.deadline.exceeded()
+                kwargs["timeout"] = budget.deadline.cap(timeout)
+                budget.sent = True
+            started = time.monotonic()
+            try:
+                response = getattr(self._session, method)(url, **kwargs)
+            except BaseException as e:
+                self._release_slot(ticket, kwargs, None)
+                self._emit(method, url, attempt, started, kwargs, error=e)
+                if (budget is not None and budget.deadline.passed()
+                        and isinstance(e, (requests.ConnectionError, requests.Timeout))):
+                    raise budget.deadline.exceeded() from e
+                if (not isinstance(e, (requests.ConnectionError, requests.Timeout)) or self.retry is None
+                        or not self.retry.allows(method, attempt, replayable)):
+                    raise
+                delay = self.retry.delay(attempt)
+                self.retry.notify(method, url, attempt, delay, exception=e)
+            else:
+                self._release_slot(ticket, kwargs, response)
+                self._emit(method, url, attempt, started, kwargs, response)
+                if (self.retry is None or not self.retry.retries_status(response.status_code)
+                        or not self.retry.allows(method, attempt, replayable)):
+                    return response
+                delay = self.retry.delay(attempt, response.headers)
+                if delay is None:
+                    return response
+                response.close()
+                self.retry.notify(method, url, attempt, delay, status=response.status_code)
+            sleep_within_deadline(delay)
+            attempt += 1
+
+    # Give back a concurrency slot whose request was never sent
+    def _discard_slot(self, ticket: int):
+        if ticket is not None:
+            self.concurrency_limit.discard(ticket)
+
+    # Give a concurrency slot back, reporting congestion and the time to the response headers
+    # requests reads the whole body before returning unless streaming, so the sample is the elapsed time it measured
+    # up to the headers rather than the time the call took
+    # Requests with a body are not used as latency samples, as their time depends on the upload size
+    def _release_slot(self, ticket: int, kwargs: dict, response=None):
+        if ticket is None:
+            return
+        if response is None:
+            self.concurrency_limit.release(ticket, None, True)
+            return
+        latency = response.elapsed.total_seconds() if kwargs.get("data") is None else None
+        self.concurrency_limit.release(ticket, latency, response.status_code in CONGESTION_STATUSES)
+
+    # Send a request event to every hook
+    # requests does not expose DNS and connect times, time to first byte is the time until the headers were parsed
+    def _emit(self, method: str, url: str, attempt: int, started: float, kwargs: dict, response=None, error=None):
+        if not self.hooks:
+            return
+        operation, template = describe_request(self.base_url, method, url)
+        total = time.monotonic() - started
+        if response is None:
+            event = RequestEvent(operation, method, template, url, attempt, error=error, total=total)
+        else:
+            received = content_length(response.headers)
+            if received is None and not kwargs.get("stream"):
+                received = len(response.content)
+            event = RequestEvent(operation, method, template, url, attempt, response.status_code, total=total,
+                                 ttfb=response.elapsed.total_seconds(),
+                                 bytes_sent=content_length(response.request.headers), bytes_received=received)
+        for hook in self.hooks:
+            hook(event)
+
+    # Resources Section
+    # Get Restrictions
+    def get_restrictions(self):
+        return self.restrictions_cache.set(self._fetch_restrictions())
+
+    # Clear Restrictions
+    def clear_restrictions(self):
+        self.restrictions_cache.clear()
+
+    def _fetch_restrictions(self):
+        url = f"{self.base_url}/resources/restrictions"
+        response = self._request("get", url)
+        check_error(response, False)
+        return response_json(response)
+
+    # File Stats
+    def get_file_stats(self):
+        url = f"{self.base_url}/resources/stats/files"
+        response = self._request("get", url)
+        check_error(response, False)
+        return FilesInfo(dict_obj=response_json(response))
+
+    # Buckets Section
+    # Create Bucket
+    def create_bucket(self):
+        url = f"{self.base_url}/bucket/create"
+        response = self._request("get", url)
+        check_error(response, False)
+        return BucketResponse(dict_obj=response_json(response))
+
+    # Delete Bucket
+    def delete_bucket(self, token: str):
+        url = f"{self.base_url}/bucket/{token}"
+        response = self._request("delete", url)
+        check_error(response, False)
+        return True if response.text == "true" else False
+
+    # Get Bucket
+    def get_bucket(self, token: str):
+        url = f"{self.base_url}/bucket/get"
+        data = {"bucket_token": token}
+        response = self._request("post", url, json=data)
+        check_error(response, False)
+        return BucketResponse(dict_obj=response_json(response))
+
+    # Albums Section
+    # Create Album
+    def create_album(self, bucket_token: str, name: str):
+        url = f"{self.base_url}/album/{bucket_token}"
+        data = {"name": name}
+        response = self._request("post", url, json=data)
+        check_error(response, False)
+        return AlbumResponse(dict_obj=response_json(response))
+
+    # Delete Album
+    def delete_album(self, album_token: str, delete_files: bool):
+        url = f"{self.base_url}/album/{album_token}?deleteFiles=" + ("true" if delete_files else "false")
+        response = self._request("delete", url)
+        check_error(response, False)
+        dict_obj = response_json(response)
+        return dict_obj.get("success")
+
+    # Get Album
+    def get_album(self, token: str):
+        url = f"{self.base_url}/album/{token}"
+        response = self._request("get", url)
+        check_error(response, False)
+        return AlbumResponse(dict_obj=response_json(response))
+
+    # Associate File
+    def associate_files(self, token: str, file_tokens: list[str]):
+        url = f"{self.base_url}/album/{token}/associate"
+        data = {"fileTokens": file_tokens}
+        response = self._request("post", url, json=data)
+        check_error(response, False)
+        return AlbumResponse(dict_obj=response_json(response))
+
+    # Disassociate File
+    def disassociate_files(self, token: str, file_tokens: list[str]):
+        url = f"{self.base_url}/album/{token}/disassociate"
+        data = {"fileTokens": file_tokens}
+        response = self._request("post", url, json=data)
+        check_error(response, False)
+        return AlbumResponse(dict_obj=response_json(response))
+
+    # Associate Files Batched
+    def associate_files_batched(self, token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                                deadline: float = None):
+        return self._album_files_batched(token, "associate", file_tokens, chunk_size, concurrency, deadline)
+
+    # Disassociate Files Batched
+    def disassociate_files_batched(self, token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                                   deadline: float = None):
+        return self._album_files_batched(token, "disassociate", file_tokens, chunk_size, concurrency, deadline)
+
+    # Send the tokens in chunks concurrently, only checking each response instead of parsing the whole album
+    def _album_files_batched(self, token: str, action: str, file_tokens, chunk_size: int, concurrency: int,
+                             deadline: float = None):
+        url = f"{self.base_url}/album/{token}/{action}"
+
+        def send(chunk: list[str]):
+            response = self._request("post", url, json={"fileTokens": chunk})
+            check_error(response, False)
+            return True
+
+        self._reserve_connections(concurrency)
+        result = BulkResult()
+        for chunk, outcome in run_bounded(send, chunked(file_tokens, chunk_size), concurrency, deadline):
+            result.add(chunk, outcome)
+        return result
+
+    # Share Album
+    def share_album(self, token: str):
+        url = f"{self.base_url}/album/share/{token}"
+        response = self._request("get", url)
+        check_error(response, False)
+        dict_obj = response_json(response)
+        return dict_obj.get("description")
+
+    # Revoke Album
+    def revoke_album(self, token: str):
+        url = f"{self.base_url}/album/revoke/{token}"
+        response = self._request("get", url)
+        check_error(response, False)
+        dict_obj = response_json(response)
+        return dict_obj.get("success")
+
+    # Download Album
+    def download_album(self, token: str, files: list[int] = None, spool_threshold: int = None):
+        if spool_threshold is not None:
+            return spool_chunks(self.iter_album(token, files), spool_threshold)
+        url = f"{self.base_url}/album/download/{token}"
+        if files is None:
+            files = []
+        response = self._request("post", url, json=files)
+        check_error(response, True)
+        return BytesIO(response.content)
+
+    # Iterate Album
+    def iter_album(self, token: str, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        url = f"{self.base_url}/album/download/{token}"
+        if files is None:
+            files = []
+        response = self._request("post", url, json=files, stream=True)
+        with response:
+            check_error(response, True)
+            for chunk in response.iter_content(chunk_size):
+                check_deadline()
+                yield chunk
+
+    # Download Album To
+    def download_album_to(self, token: str, destination, files: list[int] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE):
+        with open_destination(destination) as fh:
+            return write_chunks(fh, self.iter_album(token, files, chunk_size))
+
+    # Iterate Album Members
+    def iter_album_members(self, token: str, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        return iter_zip_members(self.iter_album(token, files, chunk_size))
+
+    # Extract Album
+    def extract_album(self, token: str, directory: str | os.PathLike, files: list[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE):
+        return extract_zip_stream(self.iter_album(token, files, chunk_size), directory)
+
+    # Download Album Resumable
+    def download_album_resumable(self, token: str, path: str | os.PathLike, files: list[int] = None,
+                                 chunk_size: int = DEFAULT_CHUNK_SIZE, checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE):
+        url = f"{self.base_url}/album/download/{token}"
+        if files is None:
+            files = []
+        return self._download_resumable("post", url, path, {}, files, chunk_size, checkpoint_size)
+
+    # Files Section
+    # Upload File
+    def upload_file(self, file_obj: FileUpload, ignore_client_restrictions: bool = False, progress=None):
+        if not ignore_client_restrictions:
+            self._check_restrictions(file_obj)
+        if self.dedup_index is None:
+            return self._upload_file(file_obj, progress)
+        key = self.dedup_index.key(file_obj)
+        existing = self._find_duplicate(key)
+        if existing is not None:
+            return existing
+        file_response = self._upload_file(file_obj, progress)
+        if key is not None:
+            self.dedup_index.record(key, file_response.token)
+        return file_response
+
+    # Get the info of an identical earlier upload that is still alive
+    def _find_duplicate(self, key: tuple):
+        token = self.dedup_index.lookup(key) if key is not None else None
+        if token is None:
+            return None
+        try:
+            return self.file_info(token, False)
+        except Exception:
+            self.dedup_index.forget(token)
+            return None
+
+    def _upload_file(self, file_obj: FileUpload, progress=None):
+        url = self.base_url
+        if file_obj.bucket_token:
+            url += f"/{file_obj.bucket_token}"
+        fields = {}
+        if file_obj.password:
+            fields['password'] = file_obj.password
+        if file_obj.is_url():
+            fields['url'] = file_obj.target
+            response = self._request("put", url, params=file_obj.build_parameters(), data=fields, headers=None)
+        else:
+            with open_upload(file_obj) as (filename, source, size):
+                reader = ProgressReader(source, size, progress)
+
+                # Build the multipart body, rewinding the source when the upload is retried
+                def body():
+                    if reader.bytes_read:
+                        reader.seek(0)
+                    if size is None:
+                        boundary = uuid.uuid4().hex
+                        multipart_data = iter_multipart(fields, filename, reader, boundary)
+                        content_type = f"multipart/form-data; boundary={boundary}"
+                    else:
+                        multipart_data = MultipartEncoder(
+                            fields={**fields, 'file': (filename, reader)}
+                        )
+                        content_type = multipart_data.content_type
+                    return {"data": multipart_data, "headers": {'Content-Type': content_type}}
+
+                response = self._request(
+                    "put",
+                    url,
+                    replay=body,
+                    replayable=reader.seekable(),
+                    params=file_obj.build_parameters())
+        check_error(response, False)
+        return FileResponse(dict_obj=response_json(response))
+
+    # Upload Many Files
+    def upload_many(self, file_objs, concurrency: int = 4, bucket_token: str = None,
+                    ignore_client_restrictions: bool = False, deadline: float = None):
+        restrictions = None if ignore_client_restrictions else self._current_restrictions()
+
+        def upload(file_obj: FileUpload):
+            file_obj = with_bucket_token(file_obj, bucket_token)
+            if restrictions is not None:
+                for restriction in restrictions.Restrictions:
+                    restriction.passes(file_obj)
+            return self.upload_file(file_obj, True)
+
+        self._reserve_connections(concurrency)
+        return run_bounded(upload, file_objs, concurrency, deadline)
+
+    # Sync Directory
+    def sync_directory(self, local_dir: str | os.PathLike, bucket_token: str, album: str = None,
+                       manifest_path: str | os.PathLike = None, delete_removed: bool = False, concurrency: int = 4,
+                       ignore_client_restrictions: bool = False, deadline: float = None):
+        self._reserve_connections(concurrency)
+        return sync_directory(self, local_dir, bucket_token, album, manifest_path, delete_removed, concurrency,
+                              ignore_client_restrictions, deadline)
+
+    # Update File
+    def file_update(self, token: str, password: str = None, previous_password: str = None, custom_expiry: str = None,
+                    hide_filename: bool = False):
+        url = f"{self.base_url}/{token}"
+        fields = {'hideFilename': "true" if hide_filename else "false"}
+        if password is not None:
+            fields['password'] = password
+        if previous_password is not None:
+            fields['previousPassword'] = previous_password
+        if custom_expiry is not None:
+            fields['customExpiry'] = custom_expiry
+
+        response = self._request(
+            "patch",
+            url,
+            data=fields
+        )
+        self._invalidate_file_info(token)
+        check_error(response, False)
+        return FileResponse(dict_obj=response_json(response))
+
+    # Update Many Files
+    def update_many(self, tokens, password: str = None, previous_password: str = None, custom_expiry: str = None,
+                    hide_filename: bool = False, concurrency: int = 4, deadline: float = None):
+        def update(token: str):
+            return self.file_update(token, password, previous_password, custom_expiry, hide_filename)
+
+        self._reserve_connections(concurrency)
+        result = BulkResult()
+        for token, outcome in run_bounded(update, file_tokens(tokens), concurrency, deadline):
+            result.add([token], outcome)
+        return result
+
+    # Get File Info
+    def file_info(self, token: str, formatted: bool):
+        if self.file_info_cache is not None:
+            cached = self.file_info_cache.get(token, formatted)
+            if cached is not None:
+                return cached
+        url = f"{self.base_url}/{token}"
+        response = self._request(
+            "get",
+            url,
+            params={'formatted': 'true' if formatted else 'false'}
+        )
+        check_error(response, False)
+        file_info = FileResponse(dict_obj=response_json(response))
+        if self.file_info_cache is not None:
+            self.file_info_cache.put(token, formatted, file_info)
+        return file_info
+
+    # Delete File
+    def delete_file(self, token: str):
+        url = f"{self.base_url}/{token}"
+        response = self._request("delete", url)
+        self._invalidate_file_info(token)
+        if self.dedup_index is not None:
+            self.dedup_index.forget(token)
+        check_error(response, False)
+        return True if response.text == "true" else False
+
+    # Delete Many Files
+    def delete_many(self, tokens, concurrency: int = 4, deadline: float = None):
+        def delete(token: str):
+            if not self.delete_file(token):
+                raise Exception(f"Error: File {token} was not deleted")
+            return True
+
+        self._reserve_connections(concurrency)
+        result = BulkResult()
+        for token, outcome in run_bounded(delete, file_tokens(tokens), concurrency, deadline):
+            result.add([token], outcome)
+        return result
+
+    # Get File
+    def get_file(self, file_obj: FileResponse, password: str = None, spool_threshold: int = None):
+        if spool_threshold is not None:
+            return spool_chunks(self.iter_file(file_obj, password), spool_threshold)
+        response = self._request("get", self._file_url(file_obj), headers=password_headers(password))
+        check_error(response, True)
+        return BytesIO(response.content)
+
+    # Iterate File
+    def iter_file(self, file_obj: FileResponse, password: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        response = self._request("get", self._file_url(file_obj), headers=password_headers(password), stream=True)
+        with response:
+            check_error(response, True)
+            for chunk in response.iter_content(chunk_size):
+                check_deadline()
+                yield chunk
+
+    # Get File To
+    def get_file_to(self, file_obj: FileResponse, destination, password: str = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE):
+        with open_destination(destination) as fh:
+            return write_chunks(fh, self.iter_file(file_obj, password, chunk_size))
+
+    # Get File Parallel
+    def get_file_parallel(self, file_obj: FileResponse, path: str | os.PathLike, password: str = None,
+                          connections: int = 4, min_part_size: int = 1024 * 1024,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE):
+        url = self._file_url(file_obj)
+        headers = password_headers(password)
+        response = self._request("head", url, headers=headers, allow_redirects=True)
+        check_error(response, True)
+        size = range_length(response.headers)
+        if size is None:
+            return self.get_file_to(FileResponse(url=url), path, password, chunk_size)
+
+        def fetch(byte_range: tuple[int, int]):
+            start, end = byte_range
+            range_headers = dict(headers, Range=f"bytes={start}-{end}")
+            with self._request("get", url, headers=range_headers, stream=True) as part:
+                check_error(part, True)
+                if part.status_code != 206:
+                    raise Exception(f"Error {part.status_code}: Range request for bytes {start}-{end} was not honoured")
+                offset = start
+                for chunk in part.iter_content(chunk_size):
+                    if offset + len(chunk) > end + 1:
+                        raise Exception(f"Error: Received more data than requested for bytes {start}-{end}")
+                    writer.write_at(chunk, offset)
+                    offset += len(chunk)
+            if offset != end + 1:
+                raise Exception(f"Error: Received {offset - start} of {end - start + 1} bytes for bytes {start}-{end}")
+
+        self._reserve_connections(connections)
+        # The ranges are closed before the writer, so no worker is still writing when a failed download is removed
+        with PositionalWriter(path, size) as writer:
+            with closing(run_bounded(fetch, split_ranges(size, connections, min_part_size), connections)) as ranges:
+                for byte_range, result in ranges:
+                    if isinstance(result, Exception):
+                        raise result
+        return size
+
+    # Download File Resumable
+    def download_resumable(self, file_obj: FileResponse, path: str | os.PathLike, password: str = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE, checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE):
+        url = self._file_url(file_obj)
+        return self._download_resumable("get", url, path, password_headers(password), None, chunk_size,
+                                        checkpoint_size)
+
+    # Download into a .part file, continuing with a Range request from the last checkpoint of an earlier attempt
+    def _download_resumable(self, method: str, url: str, path: str | os.PathLike, headers: dict, body,
+                            chunk_size: int, checkpoint_size: int):
+        checkpoint = DownloadCheckpoint(path, {"method": method, "url": url, "body": body})
+        offset = checkpoint.load()
+        request_headers = dict(headers)
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            if checkpoint.validator:
+                request_headers["If-Range"] = checkpoint.validator
+        kwargs = {"headers": request_headers, "stream": True}
+        if body is not None:
+            kwargs["json"] = body
+
+        with self._request(method, url, **kwargs) as response:
+            if response.status_code == 416 and offset:
+                if content_range_total(response.headers) == offset:
+                    checkpoint.complete()
+                    return offset
+                checkpoint.reset()
+                return self._download_resumable(method, url, path, headers, body, chunk_size, checkpoint_size)
+            check_error(response, True)
+            if response.status_code == 206:
+                total = content_range_total(response.headers)
+            else:
+                checkpoint.reset()
+                length = response.headers.get("Content-Length")
+                total = int(length) if length is not None and length.isdigit() else None
+            checkpoint.validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            with open(checkpoint.part_path, "r+b") as fh:
+                fh.seek(checkpoint.written)
+                unsaved = 0
+                try:
+                    for chunk in response.iter_content(chunk_size):
+                        fh.write(chunk)
+                        checkpoint.written += len(chunk)
+                        unsaved += len(chunk)
+                        if unsaved >= checkpoint_size:
+                            fh.flush()
+                            os.fsync(fh.fileno())
+                            checkpoint.save()
+                            unsaved = 0
+                finally:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                    checkpoint.save()
+
+        if total is not None and checkpoint.written != total:
+            raise Exception(f"Error: Downloaded {checkpoint.written} of {total} bytes, resume to continue")
+        checkpoint.complete()
+        return checkpoint.written
+
+    # Resolve the download URL of a file, looking it up by token when needed
+    def _file_url(self, file_obj: FileResponse):
+        if not file_obj.url and file_obj.token:
+            return self.file_info(file_obj.token, False).url
+        return file_obj.url
+
+    def _invalidate_file_info(self, token: str):
+        if self.file_info_cache is not None:
+            self.file_info_cache.invalidate(token)
+
+    # Get cached restrictions, refreshing them once expired
+    def _current_restrictions(self):
+        return self.restrictions_cache.get(self._fetch_restrictions)
+
+    # Check file restrictions
+    def _check_restrictions(self, file_obj: FileUpload):
+        for restriction in self._current_restrictions().Restrictions:
+            restriction.passes(file_obj)
+
+
+# Tokens for a bulk operation, from tokens, file responses or every file of a bucket, read lazily
+def file_tokens(source):
+    if isinstance(source, BucketResponse):
+        source = source.files
+    if isinstance(source, LazyModelList):
+        return source.tokens()
+    return (item.token if isinstance(item, FileResponse) else item for item in source)
+
+
+# Copy an upload into another bucket, leaving the original untouched
+def with_bucket_token(file_obj: FileUpload, bucket_token: str = None):
+    if bucket_token is None:
+        return file_obj
+    file_obj = copy.copy(file_obj)
+    file_obj.bucket_token = bucket_token
+    return file_obj
+
+
+# Build the download headers for a password protected file
+def password_headers(password: str = None):
+    headers = {}
+    if password:
+        headers["x-password"] = password
+    return headers
+
+
+# Check Error
+def check_error(response: requests.models.Response, is_download: bool):
+    if not response.ok:
+        try:
+            err = response_json(response)
+            status = err["status"]
+            name = err["name"]
+            message = err['message']
+        except:
+            status = response.status_code
+            name = "Password is Incorrect" if response.status_code == 403 and is_download else response.status_code
+            message = "Password is Incorrect" if response.status_code == 403 and is_download else response.text
+        raise Exception(f"Error {status} ({name}): {message}")
+    return
@@ -0,0 +1,98 @@
+# Content-addressed upload index for waifuVault, used to skip re-uploading identical files
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+
+from .waifumodels import FileUpload
+from .waifustream import BufferReader, open_upload
+
+DEFAULT_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DedupIndex:
+    def __init__(self, path: str | os.PathLike = ":memory:", chunk_size: int = DEFAULT_HASH_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS uploads (content_hash TEXT NOT NULL, "
+                                 "options_hash TEXT NOT NULL, bucket TEXT NOT NULL, token TEXT NOT NULL, "
+                                 "PRIMARY KEY (content_hash, options_hash, bucket))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS uploads_token ON uploads (token)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # Build the index key of an upload, or None when its content can not be read twice (URLs, iterables, pipes)
+    def key(self, file_obj: FileUpload):
+        content_hash = hash_upload(file_obj, self.chunk_size)
+        if content_hash is None:
+            return None
+        return content_hash, options_hash(file_obj), file_obj.bucket_token or ""
+
+    # Get the token of an earlier upload with the same key
+    def lookup(self, key: tuple):
+        with self._lock:
+            row = self._connection.execute("SELECT token FROM uploads WHERE content_hash = ? AND options_hash = ? "
+                                           "AND bucket = ?", key).fetchone()
+        return row[0] if row is not None else None
+
+    def record(self, key: tuple, token: str):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO uploads (content_hash, options_hash, bucket, token) "
+                                     "VALUES (?, ?, ?, ?)", (*key, token))
+
+    # Remove every entry pointing at a token, such as one that was deleted or has expired
+    def forget(self, token: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM uploads WHERE token = ?", (token,))
+
+
+# SHA-256 of the content of an upload, read in chunks and rewound afterwards so it can still be uploaded
+def hash_upload(file_obj: FileUpload, chunk_size: int = DEFAULT_HASH_CHUNK_SIZE):
+    target = file_obj.target
+    if file_obj.is_url():
+        return None
+    position = None
+    if file_obj.is_buffer() and hasattr(target, "read") and not isinstance(target, io.BytesIO):
+        try:
+            if not target.seekable():
+                return None
+            position = target.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+    elif file_obj.is_buffer() and not hasattr(target, "read"):
+        try:
+            memoryview(target).release()
+        except TypeError:
+            return None
+
+    digest = hashlib.sha256()
+    try:
+        with open_upload(file_obj) as (_, source, _):
+            if isinstance(source, BufferReader):
+                digest.update(source.view)
+            else:
+                while chunk := source.read(chunk_size):
+                    digest.update(chunk)
+    finally:
+        if position is not None:
+            target.seek(position)
+    return digest.hexdigest()
+
+
+# Digest of everything besides the content that changes the result of an upload
+def options_hash(file_obj: FileUpload):
+    name = file_obj.target_name if file_obj.is_buffer() else os.path.basename(file_obj.target)
+    options = {"name": name, "parameters": file_obj.build_parameters(), "password": file_obj.password}
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,62 @@
+# JSON decoding for waifuVault responses, using the fastest installed backend
+import json
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+_loads = None
+_backend = None
+
+
+def _load_backend(name: str):
+    if name == "orjson":
+        import orjson
+        return orjson.loads
+    if name == "msgspec":
+        import msgspec
+        decoder = msgspec.json.Decoder()
+        return decoder.decode
+    if name == "json":
+        return json.loads
+    raise ValueError(f"Unknown JSON backend {name}, expected one of {', '.join(BACKENDS)}")
+
+
+# Pick the JSON backend by name, or pass a loads callable taking bytes
+# With no argument the first installed of orjson, msgspec and json is used
+def set_json_backend(backend=None):
+    global _loads, _backend
+    if callable(backend):
+        _loads, _backend = backend, getattr(backend, "__module__", None) or "custom"
+        return _backend
+    names = BACKENDS if backend is None else (backend,)
+    for name in names:
+        try:
+            _loads = _load_backend(name)
+        except ImportError:
+            if backend is not None:
+                raise
+            continue
+        _backend = name
+        return _backend
+
+
+def get_json_backend():
+    if _loads is None:
+        set_json_backend()
+    return _backend
+
+
+# Parse a JSON body, given as bytes or text
+def loads(data):
+    if _loads is None:
+        set_json_backend()
+    return _loads(data)
+
+
+# Parse the body of a requests response from its raw bytes, skipping the decode to str
+def response_json(response):
+    return loads(response.content)
+
+
+# Parse the body of an aiohttp response from its raw bytes
+async def response_json_async(response):
+    return loads(await response.read())
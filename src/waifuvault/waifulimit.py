@@ -0,0 +1,129 @@
+# Client side rate limiting and adaptive concurrency for waifuVault requests
+import collections
+import threading
+import time
+
+CONGESTION_STATUSES = (429, 503)
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Take a token, returning how long the caller has to wait for it
+    # Tokens are reserved up front, so waiting callers are served in order without waking each other
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        import asyncio
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64, increase: float = 1.0,
+                 decrease: float = 0.5, latency_factor: float = 2.0, warmup: int = 10):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial <= max_limit")
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.warmup = warmup
+        self.baseline = None
+        self.in_flight = 0
+        self._samples = 0
+        self._started = 0
+        self._decreased_at = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._waiters = collections.deque()
+
+    # Wait for a free slot, returning a ticket to release it with
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            return self._take()
+
+    async def acquire_async(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.in_flight < int(self.limit):
+                    return self._take()
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass the wake up on so the slot is not lost
+                with self._lock:
+                    self._wake()
+                raise
+
+    # Free a slot that was never used for a request, leaving the limit as it is
+    def discard(self, ticket: int):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    # Free a slot, adjusting the limit: congestion or a latency spike shrinks it multiplicatively, at most once per
+    # window of requests, and healthy responses grow it by about increase per window
+    def release(self, ticket: int, latency: float = None, congested: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            spike = (latency is not None and self.baseline is not None and self._samples >= self.warmup
+                     and latency > self.baseline * self.latency_factor)
+            if congested or spike:
+                if ticket > self._decreased_at:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._decreased_at = self._started
+            else:
+                if latency is not None:
+                    self._samples += 1
+                    self.baseline = latency if self.baseline is None else self.baseline * 0.9 + latency * 0.1
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._wake()
+
+    def _take(self):
+        self.in_flight += 1
+        self._started += 1
+        return self._started
+
+    # Wake as many sync and async waiters as there are free slots
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        self._condition.notify(max(0, free))
+        while free > 0 and self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            loop.call_soon_threadsafe(_resolve, waiter)
+            free -= 1
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
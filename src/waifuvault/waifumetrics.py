@@ -0,0 +1,184 @@
+# Request instrumentation for waifuVault clients
+import bisect
+import re
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (method, path pattern relative to the base URL, operation, URL template), first match wins
+ROUTES = [
+    ("get", r"resources/restrictions", "get_restrictions", "resources/restrictions"),
+    ("get", r"resources/stats/files", "get_file_stats", "resources/stats/files"),
+    ("get", r"bucket/create", "create_bucket", "bucket/create"),
+    ("post", r"bucket/get", "get_bucket", "bucket/get"),
+    ("delete", r"bucket/[^/]+", "delete_bucket", "bucket/{bucket_token}"),
+    ("post", r"album/download/[^/]+", "download_album", "album/download/{album_token}"),
+    ("get", r"album/share/[^/]+", "share_album", "album/share/{album_token}"),
+    ("get", r"album/revoke/[^/]+", "revoke_album", "album/revoke/{album_token}"),
+    ("post", r"album/[^/]+/associate", "associate_files", "album/{album_token}/associate"),
+    ("post", r"album/[^/]+/disassociate", "disassociate_files", "album/{album_token}/disassociate"),
+    ("post", r"album/[^/]+", "create_album", "album/{bucket_token}"),
+    ("delete", r"album/[^/]+", "delete_album", "album/{album_token}"),
+    ("get", r"album/[^/]+", "get_album", "album/{album_token}"),
+    ("put", r"", "upload_file", ""),
+    ("put", r"[^/]+", "upload_file", "{bucket_token}"),
+    ("get", r"[^/]+", "file_info", "{token}"),
+    ("patch", r"[^/]+", "file_update", "{token}"),
+    ("delete", r"[^/]+", "delete_file", "{token}"),
+]
+_COMPILED_ROUTES = [(method, re.compile(pattern), operation, template) for method, pattern, operation, template in ROUTES]
+
+
+class RequestEvent:
+    def __init__(self, operation: str, method: str, url_template: str, url: str, attempt: int = 1,
+                 status: int = None, error: Exception = None, total: float = None, ttfb: float = None,
+                 dns: float = None, connect: float = None, bytes_sent: int = None, bytes_received: int = None):
+        self.operation = operation
+        self.method = method
+        self.url_template = url_template
+        self.url = url
+        self.attempt = attempt
+        self.status = status
+        self.error = error
+        self.total = total
+        self.ttfb = ttfb
+        self.dns = dns
+        self.connect = connect
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+
+
+# Name the operation behind a request and the URL template it was built from
+# Anything outside the API, such as file downloads, is reported as get_file
+def describe_request(base_url: str, method: str, url: str):
+    method = method.lower()
+    base_url = base_url.rstrip("/")
+    if url == base_url or url.startswith(base_url + "/"):
+        path = url[len(base_url):].lstrip("/").split("?")[0]
+        for route_method, pattern, operation, template in _COMPILED_ROUTES:
+            if route_method == method and pattern.fullmatch(path):
+                return operation, f"{base_url}/{template}" if template else base_url
+        return method, f"{base_url}/{path}"
+    return "get_file", "{file_url}"
+
+
+# Read a Content-Length header, returning None when it is missing
+def content_length(headers):
+    if headers is None:
+        return None
+    length = headers.get("Content-Length")
+    return int(length) if length is not None and str(length).isdigit() else None
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Estimate a quantile by interpolating inside the bucket it falls in
+    def quantile(self, q: float):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+# Base class for exporting request events to a metrics system such as Prometheus or OpenTelemetry
+# Subclasses implement observe and increment
+class MetricsAdapter:
+    def __call__(self, event: RequestEvent):
+        labels = {"operation": event.operation, "method": event.method,
+                  "status": str(event.status) if event.status is not None else "error"}
+        self.increment("waifuvault_requests_total", 1, labels)
+        for phase in ("dns", "connect", "ttfb", "total"):
+            value = getattr(event, phase)
+            if value is not None:
+                self.observe(f"waifuvault_request_{phase}_seconds", value, labels)
+        if event.bytes_sent:
+            self.increment("waifuvault_sent_bytes_total", event.bytes_sent, labels)
+        if event.bytes_received:
+            self.increment("waifuvault_received_bytes_total", event.bytes_received, labels)
+
+    def observe(self, name: str, value: float, labels: dict):
+        raise NotImplementedError
+
+    def increment(self, name: str, value: float, labels: dict):
+        raise NotImplementedError
+
+
+class MetricsCollector(MetricsAdapter):
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # Merge the histograms of a metric whose labels match the given ones
+    def histogram(self, name: str, **labels):
+        merged = Histogram(self.buckets)
+        with self._lock:
+            for (metric, metric_labels), histogram in self.histograms.items():
+                if metric == name and labels.items() <= dict(metric_labels).items():
+                    merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                    merged.count += histogram.count
+                    merged.sum += histogram.sum
+        return merged
+
+    # Sum a counter over every label set matching the given labels
+    def counter(self, name: str, **labels):
+        with self._lock:
+            return sum(value for (metric, metric_labels), value in self.counters.items()
+                       if metric == name and labels.items() <= dict(metric_labels).items())
+
+    # Count failed requests, both errors raised and error responses
+    def _errors(self, operation: str):
+        with self._lock:
+            return sum(value for (metric, metric_labels), value in self.counters.items()
+                       if metric == "waifuvault_requests_total" and dict(metric_labels)["operation"] == operation
+                       and dict(metric_labels)["status"][:1] not in ("1", "2", "3"))
+
+    # Summarize request counts and latencies per operation
+    def snapshot(self):
+        with self._lock:
+            keys = list(self.counters)
+        operations = sorted({dict(labels)["operation"] for name, labels in keys if name == "waifuvault_requests_total"})
+        summary = {}
+        for operation in operations:
+            latency = self.histogram("waifuvault_request_total_seconds", operation=operation)
+            summary[operation] = {
+                "requests": self.counter("waifuvault_requests_total", operation=operation),
+                "errors": self._errors(operation),
+                "p50": latency.quantile(0.5),
+                "p99": latency.quantile(0.99),
+                "sent_bytes": self.counter("waifuvault_sent_bytes_total", operation=operation),
+                "received_bytes": self.counter("waifuvault_received_bytes_total", operation=operation),
+            }
+        return summary
@@ -1,12 +1,20 @@
 # Models for waifuVault
 import io
 import mimetypes
+from collections.abc import MutableSequence
 import os
+import stat
+import typing
 from datetime import datetime, timedelta
 
 
 class FileUpload:
-    def __init__(self, target: str | io.BytesIO, target_name: str = "unknown", bucket_token: str = None,  expires: str = None, password: str = None, hidefilename: bool = False, oneTimeDownload: bool = False):
+    __slots__ = ("target", "target_name", "bucket_token", "hidefilename", "one_time_download", "expires", "password",
+                 "use_mmap")
+
+    # target can be a URL, a file path, any buffer protocol object (bytes, memoryview, mmap, ...), a readable binary
+    # stream or an iterable of byte chunks
+    def __init__(self, target: str | os.PathLike | io.BytesIO | bytes | memoryview | typing.BinaryIO | typing.Iterable[bytes], target_name: str = "unknown", bucket_token: str = None,  expires: str = None, password: str = None, hidefilename: bool = False, oneTimeDownload: bool = False, use_mmap: bool = False):
         self.target = target
         self.target_name = target_name
         self.bucket_token = bucket_token
@@ -14,14 +22,44 @@ class FileUpload:
         self.one_time_download = oneTimeDownload
         self.expires = expires
         self.password = password
+        self.use_mmap = use_mmap
 
     def is_url(self):
-        if isinstance(self.target, io.BytesIO):
+        if not isinstance(self.target, str):
             return False
         return self.target.lower().startswith("http://") or self.target.lower().startswith("https://")
 
     def is_buffer(self):
-        return isinstance(self.target, io.BytesIO)
+        return not isinstance(self.target, (str, os.PathLike))
+
+    # Size of the content in bytes without reading or copying it, or None if it can not be known up front
+    def size(self):
+        if self.is_url():
+            return None
+        if not self.is_buffer():
+            return os.path.getsize(self.target)
+        if isinstance(self.target, io.BytesIO):
+            with self.target.getbuffer() as view:
+                return view.nbytes
+        try:
+            with memoryview(self.target) as view:
+                return view.nbytes
+        except TypeError:
+            pass
+        try:
+            stat_result = os.fstat(self.target.fileno())
+            if not stat.S_ISREG(stat_result.st_mode):
+                return None
+            return stat_result.st_size - self.target.tell()
+        except (AttributeError, OSError, ValueError):
+            pass
+        try:
+            position = self.target.tell()
+            end = self.target.seek(0, io.SEEK_END)
+            self.target.seek(position)
+            return end - position
+        except (AttributeError, OSError, ValueError):
+            return None
 
     def build_parameters(self):
         parameters = {}
@@ -35,6 +73,8 @@ class FileUpload:
 
 
 class FilesInfo:
+    __slots__ = ("record_count", "record_size")
+
     def __init__(self, record_count: int = None, record_size: int = None, dict_obj: {} = None):
         if dict_obj is not None:
             self.record_count = dict_obj.get("recordCount")
@@ -45,6 +85,8 @@ class FilesInfo:
 
 
 class FileOptions:
+    __slots__ = ("hideFilename", "oneTimeDownload", "protected")
+
     def __init__(self, hide_filename: bool = False, one_time_download: bool = False, protected: bool = False, dict_obj: {} = None):
         if dict_obj is not None:
             self.hideFilename = dict_obj.get("hideFilename")
@@ -57,6 +99,8 @@ class FileOptions:
 
 
 class FileResponse:
+    __slots__ = ("token", "file_id", "url", "retentionPeriod", "bucket", "views", "album", "options")
+
     def __init__(self, token: str = None, file_id: int = None, url: str = None, retention_period: str | int = None, bucket: str = None, views: int = None, album: str = None,  options: FileOptions = None, dict_obj: {} = None):
         if dict_obj is not None:
             self.token = dict_obj.get("token")
@@ -79,6 +123,8 @@ class FileResponse:
 
 
 class AlbumInfo:
+    __slots__ = ("token", "public_token", "name", "bucket", "date_created")
+
     def __init__(self, token: str = None, public_token: str = None, name: str = None, bucket: str = None, date_created: int = None, dict_obj: {} = None):
         if dict_obj is not None:
             self.token = dict_obj.get("token")
@@ -94,43 +140,99 @@ class AlbumInfo:
             self.date_created =date_created
 
 
+# Attribute name to JSON key of the columns readable without building model objects
+FILE_COLUMNS = {"token": "token", "file_id": "id", "url": "url", "retentionPeriod": "retentionPeriod",
+                "bucket": "bucket", "views": "views"}
+ALBUM_COLUMNS = {"token": "token", "bucket_token": "bucketToken", "public_token": "publicToken", "name": "name"}
+
+
+# A list of models parsed from raw JSON objects on first access, so large buckets and albums stay cheap until used
+class LazyModelList(MutableSequence):
+    __slots__ = ("_model", "_columns", "_items")
+
+    def __init__(self, model, columns: dict, items: list = None):
+        self._model = model
+        self._columns = columns
+        self._items = list(items) if items is not None else []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyModelList(self._model, self._columns, self._items[index])
+        item = self._items[index]
+        if isinstance(item, dict):
+            item = self._items[index] = self._model(dict_obj=item)
+        return item
+
+    def __setitem__(self, index, value):
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def insert(self, index, value):
+        self._items.insert(index, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazyModelList)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"LazyModelList({len(self)} {self._model.__name__})"
+
+    # Read one field of every item as a plain list, without building model objects
+    def column(self, name: str):
+        key = self._columns.get(name, name)
+        return [item.get(key) if isinstance(item, dict) else getattr(item, name, None) for item in self._items]
+
+    def tokens(self):
+        return self.column("token")
+
+    def urls(self):
+        return self.column("url")
+
+    def ids(self):
+        return self.column("file_id")
+
+
 class AlbumResponse:
+    __slots__ = ("token", "bucket_token", "public_token", "name", "files")
+
     def __init__(self, token: str = None, bucket_token: str = None, public_token: str = None, name: str = None, files: list[FileResponse] = None, dict_obj: {} = None):
         if dict_obj is not None:
-            self.files = []
             self.token = dict_obj.get("token")
             self.bucket_token = dict_obj.get("bucketToken")
             self.public_token = dict_obj.get("publicToken")
             self.name = dict_obj.get("name")
-            files = dict_obj.get("files")
-            if files is not None:
-                for file in files:
-                    self.files.append(FileResponse(dict_obj=file))
+            self.files = LazyModelList(FileResponse, FILE_COLUMNS, dict_obj.get("files") or [])
         else:
             self.token = token
             self.bucket_token = bucket_token
             self.public_token = public_token
             self.name = name
-            self.files = files
+            self.files = LazyModelList(FileResponse, FILE_COLUMNS, files) if files is not None else None
 
 
 class BucketResponse:
+    __slots__ = ("token", "files", "albums")
+
     def __init__(self, token: str = None, files: list[FileResponse] = None, albums: list[AlbumResponse] = None, dict_obj: {} = None):
         if dict_obj is not None:
-            self.files = []
-            self.albums = []
             self.token = dict_obj.get("token")
-            for file in dict_obj.get("files"):
-                self.files.append(FileResponse(dict_obj=file))
-            for album in dict_obj.get("albums"):
-                self.albums.append(AlbumResponse(dict_obj=album))
+            self.files = LazyModelList(FileResponse, FILE_COLUMNS, dict_obj.get("files"))
+            self.albums = LazyModelList(AlbumResponse, ALBUM_COLUMNS, dict_obj.get("albums"))
         else:
             self.token = token
-            self.files = files
-            self.albums = albums
+            self.files = LazyModelList(FileResponse, FILE_COLUMNS, files) if files is not None else None
+            self.albums = LazyModelList(AlbumResponse, ALBUM_COLUMNS, albums) if albums is not None else None
 
 
 class Restriction:
+    __slots__ = ("type", "value")
+
     def __init__(self, type: str = None, value: str | int | list[str] = None, dict_obj: {} = None):
         if dict_obj is not None:
             self.type = dict_obj.get("type")
@@ -144,11 +246,9 @@ class Restriction:
             return
         match self.type:
             case "MAX_FILE_SIZE":
-                if file.is_buffer():
-                    if file.target.getbuffer().nbytes > self.value:
-                        raise ValueError(f'File size {file.target.getbuffer().nbytes} is larger than max allowed {self.value}')
-                elif os.path.getsize(file.target) > self.value:
-                    raise ValueError(f'File size {os.path.getsize(file.target)} is larger than max allowed {self.value}')
+                size = file.size()
+                if size is not None and size > self.value:
+                    raise ValueError(f'File size {size} is larger than max allowed {self.value}')
                 return
             case "BANNED_MIME_TYPE":
                 if file.is_buffer():
@@ -163,12 +263,13 @@ class Restriction:
 
 
 class RestrictionResponse:
-    def __init__(self, restrictions: list[Restriction] = None, rest_obj: [] = None):
+    __slots__ = ("Restrictions", "Expires")
+
+    def __init__(self, restrictions: list[Restriction] = None, rest_obj: [] = None, ttl: float = 600):
         if rest_obj is not None:
             self.Restrictions = []
             for rest in rest_obj:
                 self.Restrictions.append(Restriction(dict_obj=rest))
-            self.Expires = datetime.now() + timedelta(minutes=10)
         else:
             self.Restrictions = restrictions
-            self.Expires = datetime.now() + timedelta(minutes=10)
+        self.Expires = datetime.now() + timedelta(seconds=ttl)
@@ -0,0 +1,81 @@
+# Retry policy for waifuVault requests
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = ("get", "head", "delete", "patch", "put")
+
+
+class RetryEvent:
+    def __init__(self, method: str, url: str, attempt: int, delay: float, status: int = None,
+                 exception: Exception = None):
+        self.method = method
+        self.url = url
+        self.attempt = attempt
+        self.delay = delay
+        self.status = status
+        self.exception = exception
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, backoff: float = 0.5, max_backoff: float = 30.0, jitter: bool = True,
+                 statuses=RETRY_STATUSES, methods=RETRY_METHODS, respect_retry_after: bool = True,
+                 on_retry=None):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = tuple(statuses)
+        self.methods = tuple(method.lower() for method in methods)
+        self.respect_retry_after = respect_retry_after
+        self.on_retry = on_retry
+
+    # Whether a failed attempt may be sent again
+    # Requests with a one-shot body (such as a streamed upload) can only be retried when the body can be replayed
+    def allows(self, method: str, attempt: int, replayable: bool = True):
+        return attempt < self.max_attempts and method.lower() in self.methods and replayable
+
+    def retries_status(self, status: int):
+        return status in self.statuses
+
+    # Seconds to wait before the next attempt, using full jitter exponential backoff unless the server said otherwise
+    # None when the server asks for a longer wait than max_backoff, as retrying any sooner would be refused again
+    def delay(self, attempt: int, headers=None):
+        if self.respect_retry_after and headers is not None:
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_backoff else None
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    # Tell the hook about a retry, returning the event
+    def notify(self, method: str, url: str, attempt: int, delay: float, status: int = None,
+               exception: Exception = None):
+        event = RetryEvent(method, url, attempt, delay, status, exception)
+        if self.on_retry is not None:
+            self.on_retry(event)
+        return event
+
+
+# Seconds from a Retry-After header, given either as a number of seconds or an HTTP date
+def parse_retry_after(value: str):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Whether a request body can be sent again as is
+def is_replayable(data):
+    return data is None or isinstance(data, (dict, list, tuple, str, bytes))
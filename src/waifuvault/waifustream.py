@@ -0,0 +1,386 @@
+# Streaming helpers for waifuVault transfers
+import collections
+import io
+import json
+import mimetypes
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+
+from .waifubulk import check_deadline
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_CHECKPOINT_SIZE = 8 * 1024 * 1024
+
+
+# Open a path for binary writing, or pass an already open file object through untouched
+@contextmanager
+def open_destination(destination: str | os.PathLike, mode: str = "wb"):
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, mode) as fh:
+            yield fh
+    else:
+        yield destination
+
+
+# Write an iterable of chunks to a file object, returning the number of bytes written
+def write_chunks(fh, chunks):
+    written = 0
+    for chunk in chunks:
+        if chunk:
+            fh.write(chunk)
+            written += len(chunk)
+    return written
+
+
+# Make a file object that stays in memory up to max_size bytes and spills to a temporary file past it
+# A max_size of 0 writes straight to disk, where SpooledTemporaryFile itself would treat it as no limit
+def open_spool(max_size: int):
+    if max_size < 0:
+        raise ValueError("spool_threshold must not be negative")
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    if max_size == 0:
+        spool.rollover()
+    return spool
+
+
+# Collect chunks into a spooled file object, rewound to the start
+def spool_chunks(chunks, max_size: int):
+    spool = open_spool(max_size)
+    try:
+        write_chunks(spool, chunks)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def spool_chunks_async(chunks, max_size: int):
+    spool = open_spool(max_size)
+    try:
+        async for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+# Split a file size into inclusive (start, end) byte ranges of at least min_part_size
+def split_ranges(size: int, parts: int, min_part_size: int = 1024 * 1024):
+    if size <= 0:
+        return []
+    parts = max(1, min(parts, size // max(1, min_part_size)))
+    part_size = -(-size // parts)
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+# Check whether a response advertises byte range support, returning the content length if it does
+def range_length(headers):
+    if headers.get("Accept-Ranges", "").lower() != "bytes":
+        return None
+    length = headers.get("Content-Length")
+    return int(length) if length is not None and length.isdigit() else None
+
+
+# Create a uniquely named .part file next to path, with the usual umask permissions rather than the owner only ones
+# mkstemp would give, as the file replaces path once finished
+def open_part_file(path: str):
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        part_path = f"{path}.{os.urandom(4).hex()}.part"
+        try:
+            return part_path, os.open(part_path, flags, 0o666)
+        except FileExistsError:
+            continue
+
+
+# Writes a file of known size at arbitrary offsets
+# The data goes to a temporary .part file next to path, which only replaces path once it is complete, and is removed
+# if the with block raises, so a failed download never leaves a full size file of zeros behind
+class PositionalWriter:
+    def __init__(self, path: str | os.PathLike, size: int):
+        self.path = os.fspath(path)
+        self.size = size
+        self.part_path, fd = open_part_file(self.path)
+        self._fh = os.fdopen(fd, "wb")
+        self._fh.truncate(size)
+        self._fd = self._fh.fileno()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._writers = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    # Write data at an absolute offset without moving a shared file position
+    def write_at(self, data: bytes, offset: int):
+        with self._idle:
+            if self._fh.closed:
+                raise ValueError("I/O operation on closed file")
+            self._writers += 1
+        try:
+            if hasattr(os, "pwrite"):
+                view = memoryview(data)
+                while view:
+                    written = os.pwrite(self._fd, view, offset)
+                    view = view[written:]
+                    offset += written
+            else:
+                with self._lock:
+                    self._fh.seek(offset)
+                    self._fh.write(data)
+        finally:
+            with self._idle:
+                self._writers -= 1
+                self._idle.notify_all()
+
+    # Close the file once writes still running on other threads have finished
+    def close(self):
+        with self._idle:
+            self._idle.wait_for(lambda: not self._writers)
+            self._fh.close()
+
+    # Move the finished file into place, after checking it has the expected size
+    def commit(self):
+        written = os.path.getsize(self.part_path)
+        if written != self.size:
+            self.discard()
+            raise Exception(f"Error: Downloaded file is {written} bytes, expected {self.size}")
+        os.replace(self.part_path, self.path)
+
+    def discard(self):
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+
+class DownloadCheckpoint:
+    def __init__(self, path: str | os.PathLike, key: dict):
+        self.path = os.fspath(path)
+        self.part_path = f"{self.path}.part"
+        self.state_path = f"{self.path}.part.json"
+        self.key = key
+        self.written = 0
+        self.validator = None
+
+    # Restore progress from a previous attempt at the same download, discarding anything past the last checkpoint
+    def load(self):
+        try:
+            with open(self.state_path, "r") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            state = None
+        if state is None or state.get("key") != self.key or not os.path.exists(self.part_path):
+            self.reset()
+            return self.written
+        self.written = min(state.get("written", 0), os.path.getsize(self.part_path))
+        self.validator = state.get("validator")
+        with open(self.part_path, "r+b") as fh:
+            fh.truncate(self.written)
+        return self.written
+
+    # Start again from the first byte
+    def reset(self):
+        self.written = 0
+        self.validator = None
+        with open(self.part_path, "wb"):
+            pass
+        self.save()
+
+    # Record how many bytes of the part file are safely on disk
+    def save(self):
+        state = {"key": self.key, "written": self.written, "validator": self.validator}
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp_path, self.state_path)
+
+    # Move the completed part file into place and remove the state file
+    def complete(self):
+        os.replace(self.part_path, self.path)
+        os.remove(self.state_path)
+
+
+# Get the total size from a Content-Range header such as "bytes 100-199/200"
+def content_range_total(headers):
+    content_range = headers.get("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+class RateMeter:
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        self._samples = collections.deque()
+        self._total = 0
+
+    # Record a number of transferred bytes, returning the rate in bytes per second over the window
+    def update(self, amount: int):
+        now = time.monotonic()
+        self._samples.append((now, amount))
+        self._total += amount
+        while len(self._samples) > 1 and now - self._samples[0][0] > self.window:
+            self._total -= self._samples.popleft()[1]
+        elapsed = now - self._samples[0][0]
+        if elapsed <= 0:
+            return 0.0
+        return (self._total - self._samples[0][1]) / elapsed
+
+
+class ProgressReader:
+    def __init__(self, source, size: int = None, callback=None):
+        self._source = source
+        try:
+            self._start = source.tell()
+        except (AttributeError, OSError):
+            self._start = None
+        self._callback = callback
+        self._meter = RateMeter()
+        self.size = size
+        self.bytes_read = 0
+
+    # Bytes left to read, as used by the multipart encoders to size the upload
+    @property
+    def len(self):
+        return None if self.size is None else self.size - self.bytes_read
+
+    # Stops the upload once the deadline of the bulk call sending it has passed
+    def read(self, size: int = -1):
+        check_deadline()
+        data = self._source.read(size)
+        self.bytes_read += len(data)
+        if self._callback is not None:
+            self._callback(self.bytes_read, self.size, self._meter.update(len(data)))
+        return data
+
+    def tell(self):
+        return self.bytes_read
+
+    def seekable(self):
+        if self._start is None:
+            return False
+        seekable = getattr(self._source, "seekable", None)
+        return seekable() if seekable is not None else True
+
+    # Rewind to a position relative to where reading started, for retried uploads
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence != io.SEEK_SET or self._start is None:
+            raise io.UnsupportedOperation("ProgressReader can only seek to an absolute position of a seekable source")
+        self._source.seek(self._start + offset)
+        self.bytes_read = offset
+        return offset
+
+    # The source is owned by whoever opened it, so closing the reader leaves it open
+    def close(self):
+        pass
+
+
+class BufferReader:
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    # The whole buffer as a memoryview, without copying
+    @property
+    def view(self):
+        return self._view
+
+    def read(self, size: int = -1):
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        data = self._view[self._position:end].tobytes()
+        self._position = end
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("BufferReader can only seek to an absolute position")
+        self._position = offset
+        return offset
+
+    # Release the view so the underlying buffer (such as an mmap) can be closed
+    def close(self):
+        self._view.release()
+
+
+class IterReader:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            data = self._buffer + b"".join(bytes(chunk) for chunk in self._chunks)
+            self._buffer = b""
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += bytes(chunk)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+# Open the content of an upload, yielding its filename, a readable source and its size (None when unknown)
+# File handles and maps opened here are closed when the block exits
+@contextmanager
+def open_upload(file_obj):
+    target = file_obj.target
+    if not file_obj.is_buffer():
+        filename = os.path.basename(target)
+        with open(target, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if not file_obj.use_mmap or size == 0:
+                yield filename, fh, size
+                return
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped, closing(BufferReader(mapped)) as reader:
+                yield filename, reader, size
+    elif isinstance(target, io.BytesIO):
+        target.seek(0)
+        yield file_obj.target_name, target, file_obj.size()
+    elif hasattr(target, "read"):
+        yield file_obj.target_name, target, file_obj.size()
+    else:
+        try:
+            reader = BufferReader(target)
+        except TypeError:
+            yield file_obj.target_name, IterReader(target), None
+            return
+        with closing(reader):
+            yield file_obj.target_name, reader, len(reader.view)
+
+
+# Encode a multipart form as a stream of chunks, for uploads whose size is not known up front
+def iter_multipart(fields: dict, filename: str, reader, boundary: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    for name, value in fields.items():
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode()
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    quoted_filename = filename.replace('"', "%22")
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{quoted_filename}"\r\n'
+           f'Content-Type: {content_type}\r\n\r\n').encode()
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
@@ -0,0 +1,154 @@
+# Incremental directory to bucket sync for waifuVault
+import json
+import os
+import stat
+import time
+
+from .waifumodels import FileUpload
+from .waifubulk import run_bounded
+from .waifudedup import hash_upload
+
+MANIFEST_NAME = ".waifuvault-manifest.json"
+
+
+class SyncManifest:
+    def __init__(self, path: str | os.PathLike, bucket_token: str):
+        self.path = os.fspath(path)
+        self.bucket_token = bucket_token
+        self.entries = {}
+
+    # Load the entries of a previous sync into the same bucket
+    def load(self):
+        try:
+            with open(self.path, "r") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            state = None
+        if state is None or state.get("bucket") != self.bucket_token:
+            self.entries = {}
+        else:
+            self.entries = state.get("files", {})
+        return self.entries
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({"bucket": self.bucket_token, "files": self.entries}, fh)
+        os.replace(tmp_path, self.path)
+
+
+class SyncResult:
+    def __init__(self):
+        self.uploaded = []
+        self.unchanged = []
+        self.deleted = []
+        self.failed = []
+        self.album = None
+
+
+# Walk a directory, yielding (relative path, absolute path, stat) for every regular file
+# Symlinks are followed; other special files such as FIFOs and sockets are skipped, and files that can not be
+# stat'ed, such as dangling symlinks or files removed during the walk, are added to failed as (relative path, error)
+def scan_directory(local_dir: str | os.PathLike, exclude: str = None, failed: list = None):
+    root = os.path.abspath(local_dir)
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if path == exclude:
+                continue
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            try:
+                stat_result = os.stat(path)
+            except OSError as e:
+                if failed is not None:
+                    failed.append((relative, e))
+                continue
+            if stat.S_ISREG(stat_result.st_mode):
+                yield relative, path, stat_result
+
+
+# Mirror a local directory into a bucket, uploading only new or changed files
+def sync_directory(client, local_dir: str | os.PathLike, bucket_token: str, album: str = None,
+                   manifest_path: str | os.PathLike = None, delete_removed: bool = False, concurrency: int = 4,
+                   ignore_client_restrictions: bool = False, deadline: float = None):
+    expires = time.monotonic() + deadline if deadline is not None else None
+    if manifest_path is None:
+        manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    manifest = SyncManifest(manifest_path, bucket_token)
+    entries = manifest.load()
+    result = SyncResult()
+    alive = set(client.get_bucket(bucket_token).files.tokens())
+    restrictions = None if ignore_client_restrictions else client._current_restrictions()
+
+    local = {}
+    pending = []
+    for relative, path, stat_result in scan_directory(local_dir, os.path.abspath(manifest.path), result.failed):
+        local[relative] = path
+        entry = entries.get(relative)
+        if (entry is not None and entry["token"] in alive and entry["size"] == stat_result.st_size
+                and entry["mtime"] == stat_result.st_mtime_ns):
+            result.unchanged.append(relative)
+        else:
+            pending.append((relative, path, stat_result))
+
+    # Files that could not be read are kept remotely rather than treated as deleted
+    for relative, _ in result.failed:
+        local.setdefault(relative, None)
+
+    # Hash first so touched but unchanged files are not uploaded again
+    def upload(item):
+        relative, path, stat_result = item
+        file_obj = FileUpload(path, bucket_token=bucket_token)
+        content_hash = hash_upload(file_obj)
+        entry = entries.get(relative)
+        if entry is not None and entry["token"] in alive and entry["hash"] == content_hash:
+            return None, content_hash
+        if restrictions is not None:
+            for restriction in restrictions.Restrictions:
+                restriction.passes(file_obj)
+        return client.upload_file(file_obj, True), content_hash
+
+    replaced = []
+    try:
+        for (relative, path, stat_result), outcome in run_bounded(upload, pending, concurrency, deadline):
+            if isinstance(outcome, Exception):
+                result.failed.append((relative, outcome))
+                continue
+            file_response, content_hash = outcome
+            previous = entries.get(relative)
+            if file_response is None:
+                result.unchanged.append(relative)
+                token = previous["token"]
+            else:
+                result.uploaded.append((relative, file_response))
+                token = file_response.token
+                if previous is not None and previous["token"] in alive:
+                    replaced.append((relative, previous["token"]))
+            entries[relative] = {"size": stat_result.st_size, "mtime": stat_result.st_mtime_ns,
+                                 "hash": content_hash, "token": token}
+
+        # Remove remote files deleted locally, and the old remote copies of replaced files
+        if delete_removed:
+            deletions = [(relative, token, False) for relative, token in replaced]
+            for relative in list(entries):
+                if relative in local:
+                    continue
+                if entries[relative]["token"] in alive:
+                    deletions.append((relative, entries[relative]["token"], True))
+                else:
+                    del entries[relative]
+                    result.deleted.append(relative)
+            remaining = max(0.0, expires - time.monotonic()) if expires is not None else None
+            for (relative, token, removed), outcome in run_bounded(lambda item: client.delete_file(item[1]),
+                                                                   deletions, concurrency, remaining):
+                if isinstance(outcome, Exception):
+                    result.failed.append((relative, outcome))
+                elif removed:
+                    del entries[relative]
+                    result.deleted.append(relative)
+
+        if album is not None and result.uploaded:
+            result.album = client.associate_files(album, [file.token for _, file in result.uploaded])
+    finally:
+        manifest.save()
+    return result
@@ -1,314 +1,241 @@
 __base_url__ = "https://waifuvault.moe/rest"
 
-from aiohttp import ClientResponse
+__default_client = None
 
-__restrictions = None
+from .waifumodels import FileResponse, FileUpload
+from .waifustream import DEFAULT_CHUNK_SIZE, DEFAULT_CHECKPOINT_SIZE
 
-import json
-import os
-import aiohttp
-import asyncio
-from datetime import datetime
-from io import BytesIO
 
-import requests
-from requests_toolbelt import MultipartEncoder
+# Default Client Section
+# Get Default Client
+def get_default_client():
+    global __default_client
+    if __default_client is None:
+        # The transports are imported on first use, so importing the package stays fast
+        from .waifuclient import WaifuVaultClient
+        __default_client = WaifuVaultClient(__base_url__)
+    return __default_client
 
-from .waifumodels import FileResponse, FileUpload, BucketResponse, RestrictionResponse, FilesInfo, AlbumResponse
+
+# Set Default Client
+def set_default_client(client):
+    global __default_client
+    __default_client = client
+
+
+# Make a short-lived async client sharing the base URL, caches and limits of the default client
+# It opens its own session, so long-running services should keep an AsyncWaifuVaultClient instead
+def _async_client(limit: int = 100):
+    from .waifuasync import AsyncWaifuVaultClient
+    client = get_default_client()
+    return AsyncWaifuVaultClient(client.base_url, limit=limit, restrictions_cache=client.restrictions_cache,
+                                 file_info_cache=client.file_info_cache, dedup_index=client.dedup_index,
+                                 retry=client.retry, rate_limit=client.rate_limit,
+                                 concurrency_limit=client.concurrency_limit, hooks=client.hooks,
+                                 connect_timeout=client.connect_timeout, read_timeout=client.read_timeout)
 
 
 # Resources Section
 # Get Restrictions
 def get_restrictions():
-    global __restrictions
-    url = f"{__base_url__}/resources/restrictions"
-    response = requests.get(url)
-    __check_error(response, False)
-    __restrictions = RestrictionResponse(rest_obj=json.loads(response.text))
-    return __restrictions
+    return get_default_client().get_restrictions()
 
 
 # Clear Restrictions
 def clear_restrictions():
-    global __restrictions
-    __restrictions = None
+    get_default_client().clear_restrictions()
 
 
 # File Stats
 def get_file_stats():
-    url = f"{__base_url__}/resources/stats/files"
-    response = requests.get(url)
-    __check_error(response, False)
-    return FilesInfo(dict_obj=json.loads(response.text))
+    return get_default_client().get_file_stats()
 
 
 # Set Alt BaseURL
 def set_alt_baseurl(url: str):
+    global __base_url__
     __base_url__ = url
+    get_default_client().base_url = url
 
 
 # Buckets Section
 # Create Bucket
 def create_bucket():
-    url = f"{__base_url__}/bucket/create"
-    response = requests.get(url)
-    __check_error(response, False)
-    return BucketResponse(dict_obj=json.loads(response.text))
+    return get_default_client().create_bucket()
 
 
 # Delete Bucket
 def delete_bucket(token: str):
-    url = f"{__base_url__}/bucket/{token}"
-    response = requests.delete(url)
-    __check_error(response, False)
-    return True if response.text == "true" else False
+    return get_default_client().delete_bucket(token)
 
 
 # Get Bucket
 def get_bucket(token: str):
-    url = f"{__base_url__}/bucket/get"
-    data = {"bucket_token": token}
-    response = requests.post(url, json=data)
-    __check_error(response, False)
-    return BucketResponse(dict_obj=json.loads(response.text))
+    return get_default_client().get_bucket(token)
 
 
 # Albums Section
 # Create Album
 def create_album(bucket_token: str, name: str):
-    url = f"{__base_url__}/album/{bucket_token}"
-    data = {"name": name}
-    response = requests.post(url, json=data)
-    __check_error(response, False)
-    return AlbumResponse(dict_obj=json.loads(response.text))
+    return get_default_client().create_album(bucket_token, name)
 
 
 # Delete Album
 def delete_album(album_token: str, delete_files: bool):
-    url = f"{__base_url__}/album/{album_token}?deleteFiles=" + ("true" if delete_files else "false")
-    response = requests.delete(url)
-    __check_error(response, False)
-    dict_obj = json.loads(response.text)
-    return dict_obj.get("success")
+    return get_default_client().delete_album(album_token, delete_files)
 
 
 # Get Album
 def get_album(token: str):
-    url = f"{__base_url__}/album/{token}"
-    response = requests.get(url)
-    __check_error(response, False)
-    return AlbumResponse(dict_obj=json.loads(response.text))
+    return get_default_client().get_album(token)
 
 
 # Associate File
 def associate_files(token: str, file_tokens: list[str]):
-    url = f"{__base_url__}/album/{token}/associate"
-    data = {"fileTokens": file_tokens}
-    response = requests.post(url, json=data)
-    __check_error(response, False)
-    return AlbumResponse(dict_obj=json.loads(response.text))
+    return get_default_client().associate_files(token, file_tokens)
 
 
 # Disassociate File
 def disassociate_files(token: str, file_tokens: list[str]):
-    url = f"{__base_url__}/album/{token}/disassociate"
-    data = {"fileTokens": file_tokens}
-    response = requests.post(url, json=data)
-    __check_error(response, False)
-    return AlbumResponse(dict_obj=json.loads(response.text))
+    return get_default_client().disassociate_files(token, file_tokens)
+
+
+# Associate Files Batched
+def associate_files_batched(token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                            deadline: float = None):
+    return get_default_client().associate_files_batched(token, file_tokens, chunk_size, concurrency, deadline)
+
+
+# Disassociate Files Batched
+def disassociate_files_batched(token: str, file_tokens, chunk_size: int = 500, concurrency: int = 4,
+                               deadline: float = None):
+    return get_default_client().disassociate_files_batched(token, file_tokens, chunk_size, concurrency, deadline)
 
 
 # Share Album
 def share_album(token: str):
-    url = f"{__base_url__}/album/share/{token}"
-    response = requests.get(url)
-    __check_error(response, False)
-    dict_obj = json.loads(response.text)
-    return dict_obj.get("description")
+    return get_default_client().share_album(token)
 
 
 # Revoke Album
 def revoke_album(token: str):
-    url = f"{__base_url__}/album/revoke/{token}"
-    response = requests.get(url)
-    __check_error(response, False)
-    dict_obj = json.loads(response.text)
-    return dict_obj.get("success")
+    return get_default_client().revoke_album(token)
 
 
 # Download Album
-def download_album(token: str, files: list[int] = None):
-    url = f"{__base_url__}/album/download/{token}"
-    if files is None:
-        files = []
-    response = requests.post(url, json=files)
-    __check_error(response, True)
-    return BytesIO(response.content)
+def download_album(token: str, files: list[int] = None, spool_threshold: int = None):
+    return get_default_client().download_album(token, files, spool_threshold)
+
+
+# Iterate Album
+def iter_album(token: str, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().iter_album(token, files, chunk_size)
+
+
+# Download Album To
+def download_album_to(token: str, destination, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().download_album_to(token, destination, files, chunk_size)
+
+
+# Iterate Album Members
+def iter_album_members(token: str, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().iter_album_members(token, files, chunk_size)
+
+
+# Extract Album
+def extract_album(token: str, directory, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().extract_album(token, directory, files, chunk_size)
+
+
+# Download Album Resumable
+def download_album_resumable(token: str, path, files: list[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE):
+    return get_default_client().download_album_resumable(token, path, files, chunk_size, checkpoint_size)
 
 
 # Files Section
 # Upload File
-def upload_file(file_obj: FileUpload, ignore_client_restrictions: bool = False):
-    url = __base_url__
-    if not ignore_client_restrictions:
-        __check_restrictions(file_obj)
-    if file_obj.bucket_token:
-        url += f"/{file_obj.bucket_token}"
-    fields = {}
-    if file_obj.password:
-        fields['password'] = file_obj.password
-    if file_obj.is_buffer():
-        fields['file'] = (file_obj.target_name, file_obj.target)
-        multipart_data = MultipartEncoder(
-            fields=fields
-        )
-        header_data = {'Content-Type': multipart_data.content_type}
-    elif file_obj.is_url():
-        fields['url'] = file_obj.target
-        multipart_data = fields
-        header_data = None
-    else:
-        fields['file'] = (os.path.basename(file_obj.target), open(file_obj.target, 'rb'))
-        multipart_data = MultipartEncoder(
-            fields=fields
-        )
-        header_data = {'Content-Type': multipart_data.content_type}
-
-    response = requests.put(
-        url,
-        params=file_obj.build_parameters(),
-        data=multipart_data,
-        headers=header_data)
-    __check_error(response, False)
-    return FileResponse(dict_obj=json.loads(response.text))
+def upload_file(file_obj: FileUpload, ignore_client_restrictions: bool = False, progress=None):
+    return get_default_client().upload_file(file_obj, ignore_client_restrictions, progress)
 
 
 # Upload File Async
-async def upload_file_async(file_obj: FileUpload, ignore_client_restrictions: bool = False):
-    url = __base_url__
-    if not ignore_client_restrictions:
-        __check_restrictions(file_obj)
-    if file_obj.bucket_token:
-        url += f"/{file_obj.bucket_token}"
-    fields = {}
-    if file_obj.password:
-        fields['password'] = file_obj.password
-    if file_obj.is_buffer():
-        fields['file'] = (file_obj.target_name, file_obj.target)
-        multipart_data = MultipartEncoder(
-            fields=fields
-        )
-        header_data = {'Content-Type': multipart_data.content_type}
-    elif file_obj.is_url():
-        fields['url'] = file_obj.target
-        multipart_data = fields
-        header_data = None
-    else:
-        fields['file'] = (os.path.basename(file_obj.target), open(file_obj.target, 'rb'))
-        multipart_data = MultipartEncoder(
-            fields=fields
-        )
-        header_data = {'Content-Type': multipart_data.content_type}
-
-    async with aiohttp.ClientSession() as session:
-        response = await session.put(url, params=file_obj.build_parameters(), data=multipart_data, headers=header_data)
-        async with response:
-            await __check_error_async(response, False)
-            text = response.text
-            return FileResponse(dict_obj=json.loads(text))
+async def upload_file_async(file_obj: FileUpload, ignore_client_restrictions: bool = False, progress=None):
+    async with _async_client() as client:
+        return await client.upload_file(file_obj, ignore_client_restrictions, progress)
+
+
+# Upload Many Files
+def upload_many(file_objs, concurrency: int = 4, bucket_token: str = None, ignore_client_restrictions: bool = False,
+                deadline: float = None):
+    return get_default_client().upload_many(file_objs, concurrency, bucket_token, ignore_client_restrictions, deadline)
+
+
+# Sync Directory
+def sync_directory(local_dir, bucket_token: str, album: str = None, manifest_path=None, delete_removed: bool = False,
+                   concurrency: int = 4, ignore_client_restrictions: bool = False, deadline: float = None):
+    return get_default_client().sync_directory(local_dir, bucket_token, album, manifest_path, delete_removed,
+                                               concurrency, ignore_client_restrictions, deadline)
+
+
+# Upload Many Files Async
+async def upload_many_async(file_objs, concurrency: int = 4, bucket_token: str = None,
+                            ignore_client_restrictions: bool = False, deadline: float = None):
+    async with _async_client(concurrency) as client:
+        async for item, result in client.upload_many(file_objs, concurrency, bucket_token,
+                                                     ignore_client_restrictions, deadline):
+            yield item, result
 
 
 # Update File
 def file_update(token: str, password: str = None, previous_password: str = None, custom_expiry: str = None, hide_filename:bool = False):
-    url = f"{__base_url__}/{token}"
-    fields = {'hideFilename': "true" if hide_filename else "false"}
-    if password is not None:
-        fields['password'] = password
-    if previous_password is not None:
-        fields['previousPassword'] = previous_password
-    if custom_expiry is not None:
-        fields['customExpiry'] = custom_expiry
-
-    response = requests.patch(
-        url,
-        data=fields
-    )
-    __check_error(response, False)
-    return FileResponse(dict_obj=json.loads(response.text))
+    return get_default_client().file_update(token, password, previous_password, custom_expiry, hide_filename)
+
+
+# Update Many Files
+def update_many(tokens, password: str = None, previous_password: str = None, custom_expiry: str = None,
+                hide_filename: bool = False, concurrency: int = 4, deadline: float = None):
+    return get_default_client().update_many(tokens, password, previous_password, custom_expiry, hide_filename,
+                                            concurrency, deadline)
 
 
 # Get File Info
 def file_info(token: str, formatted: bool):
-    url = f"{__base_url__}/{token}"
-    response = requests.get(
-        url,
-        params={'formatted': 'true' if formatted else 'false'}
-    )
-    __check_error(response, False)
-    return FileResponse(dict_obj=json.loads(response.text))
+    return get_default_client().file_info(token, formatted)
 
 
 # Delete File
 def delete_file(token: str):
-    url = f"{__base_url__}/{token}"
-    response = requests.delete(url)
-    __check_error(response, False)
-    return True if response.text == "true" else False
+    return get_default_client().delete_file(token)
+
+
+# Delete Many Files
+def delete_many(tokens, concurrency: int = 4, deadline: float = None):
+    return get_default_client().delete_many(tokens, concurrency, deadline)
 
 
 # Get File
-def get_file(file_obj: FileResponse, password: str = None):
-    headers = {}
-    if password:
-        headers["x-password"] = password
-    if not file_obj.url and file_obj.token:
-        url = file_info(file_obj.token, False).url
-    else:
-        url = file_obj.url
-    response = requests.get(url, headers=headers)
-    __check_error(response, True)
-    return BytesIO(response.content)
-
-
-# Check Error
-def __check_error(response: requests.models.Response, is_download: bool):
-    if not response.ok:
-        try:
-            err = json.loads(response.text)
-            status = err["status"]
-            name = err["name"]
-            message = err['message']
-        except:
-            status = response.status_code
-            name = "Password is Incorrect" if response.status_code == 403 and is_download else response.status_code
-            message = "Password is Incorrect" if response.status_code == 403 and is_download else response.text
-        raise Exception(f"Error {status} ({name}): {message}")
-    return
-
-
-# Check Error Async
-async def __check_error_async(response: ClientResponse, is_download: bool):
-    if not response.ok:
-        try:
-            err = await response.json()
-            status = err.get("status", response.status)
-            name = err.get("name", "Unknown Error")
-            message = err.get("message", "Unknown Message")
-        except Exception:
-            text = await response.text()
-            status = response.status
-            name = "Password is Incorrect" if status == 403 and is_download else status
-            message = "Password is Incorrect" if status == 403 and is_download else text
-        raise Exception(f"Error {status} ({name}): {message}")
-    return
-
-
-# Check file restrictions
-def __check_restrictions(file_obj: FileUpload):
-    global __restrictions
-    if __restrictions is None:
-        __restrictions = get_restrictions()
-    if __restrictions is not None and __restrictions.Expires < datetime.now():
-        __restrictions = get_restrictions()
-    for restriction in __restrictions.Restrictions:
-        restriction.passes(file_obj)
\ No newline at end of file
+def get_file(file_obj: FileResponse, password: str = None, spool_threshold: int = None):
+    return get_default_client().get_file(file_obj, password, spool_threshold)
+
+
+# Iterate File
+def iter_file(file_obj: FileResponse, password: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().iter_file(file_obj, password, chunk_size)
+
+
+# Get File To
+def get_file_to(file_obj: FileResponse, destination, password: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().get_file_to(file_obj, destination, password, chunk_size)
+
+
+# Get File Parallel
+def get_file_parallel(file_obj: FileResponse, path, password: str = None, connections: int = 4,
+                      min_part_size: int = 1024 * 1024, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    return get_default_client().get_file_parallel(file_obj, path, password, connections, min_part_size, chunk_size)
+
+
+# Download File Resumable
+def download_resumable(file_obj: FileResponse, path, password: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE):
+    return get_default_client().download_resumable(file_obj, path, password, chunk_size, checkpoint_size)
@@ -0,0 +1,159 @@
+# Incremental zip reader for streamed waifuVault album downloads
+import os
+import struct
+import zipfile
+import zlib
+
+LOCAL_FILE_HEADER = b"PK\x03\x04"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+CENTRAL_DIRECTORY = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+READ_SIZE = 64 * 1024
+
+
+class _ChunkReader:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    # Read up to n bytes, returning an empty result only at the end of the stream
+    def read_up_to(self, n: int):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b""
+            self._buffer = bytes(chunk)
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
+
+    # Read exactly n bytes
+    def read(self, n: int):
+        parts = []
+        while n > 0:
+            data = self.read_up_to(n)
+            if not data:
+                raise zipfile.BadZipFile("Unexpected end of album zip stream")
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    # Push bytes back to the front of the stream
+    def unread(self, data: bytes):
+        self._buffer = data + self._buffer
+
+
+# Iterate over the members of a zip arriving as a stream of chunks, yielding (name, chunk iterator) pairs
+# Each member's data must be read before advancing; anything left unread is skipped
+def iter_zip_members(chunks):
+    reader = _ChunkReader(chunks)
+    while True:
+        signature = reader.read_up_to(4)
+        if not signature:
+            return
+        if len(signature) < 4:
+            signature += reader.read(4 - len(signature))
+        if signature in CENTRAL_DIRECTORY:
+            return
+        if signature != LOCAL_FILE_HEADER:
+            raise zipfile.BadZipFile(f"Unexpected zip signature {signature!r}")
+        (_, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = struct.unpack("<HHHHHIIIHH", reader.read(26))
+        raw_name = reader.read(name_length)
+        extra = reader.read(extra_length)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        if flags & 0x1:
+            raise zipfile.BadZipFile(f"Encrypted zip member {name} can not be streamed")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise zipfile.BadZipFile(f"Unsupported compression method {method} for zip member {name}")
+        compressed_size, size, is_zip64 = _zip64_sizes(extra, compressed_size, size)
+        data = _member_data(reader, name, flags, method, crc, compressed_size, is_zip64)
+        if name.endswith("/"):
+            for _ in data:
+                pass
+            continue
+        yield name, data
+        for _ in data:
+            pass
+
+
+# Extract the members of a streamed zip into a directory, returning the extracted paths
+def extract_zip_stream(chunks, directory: str | os.PathLike):
+    root = os.path.abspath(directory)
+    extracted = []
+    for name, data in iter_zip_members(chunks):
+        path = os.path.abspath(os.path.join(root, name))
+        if os.path.commonpath([root, path]) != root:
+            raise zipfile.BadZipFile(f"Zip member {name} would be extracted outside of {directory}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            for chunk in data:
+                fh.write(chunk)
+        extracted.append(path)
+    return extracted
+
+
+def _zip64_sizes(extra: bytes, compressed_size: int, size: int):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack("<HH", extra[offset:offset + 4])
+        if header_id == 0x0001:
+            values = extra[offset + 4:offset + 4 + length]
+            if size == 0xFFFFFFFF and len(values) >= 8:
+                size, = struct.unpack("<Q", values[:8])
+                values = values[8:]
+            if compressed_size == 0xFFFFFFFF and len(values) >= 8:
+                compressed_size, = struct.unpack("<Q", values[:8])
+            return compressed_size, size, True
+        offset += 4 + length
+    return compressed_size, size, False
+
+
+def _member_data(reader: _ChunkReader, name: str, flags: int, method: int, crc: int, compressed_size: int,
+                 is_zip64: bool):
+    has_descriptor = bool(flags & 0x08)
+    actual_crc = 0
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None
+    if has_descriptor and decompressor is None and not name.endswith("/"):
+        raise zipfile.BadZipFile(f"Stored zip member {name} without a size can not be streamed")
+
+    if has_descriptor and decompressor is None:
+        crc, = struct.unpack("<I", _read_descriptor(reader, is_zip64))
+    elif has_descriptor:
+        while not decompressor.eof:
+            compressed = reader.read_up_to(READ_SIZE)
+            if not compressed:
+                raise zipfile.BadZipFile(f"Unexpected end of zip member {name}")
+            chunk = decompressor.decompress(compressed)
+            if decompressor.unused_data:
+                reader.unread(decompressor.unused_data)
+            if chunk:
+                actual_crc = zlib.crc32(chunk, actual_crc)
+                yield chunk
+        crc, = struct.unpack("<I", _read_descriptor(reader, is_zip64))
+    else:
+        remaining = compressed_size
+        while remaining > 0:
+            compressed = reader.read_up_to(min(READ_SIZE, remaining))
+            if not compressed:
+                raise zipfile.BadZipFile(f"Unexpected end of zip member {name}")
+            remaining -= len(compressed)
+            chunk = decompressor.decompress(compressed) if decompressor is not None else compressed
+            if chunk:
+                actual_crc = zlib.crc32(chunk, actual_crc)
+                yield chunk
+        if decompressor is not None:
+            chunk = decompressor.flush()
+            if chunk:
+                actual_crc = zlib.crc32(chunk, actual_crc)
+                yield chunk
+
+    if actual_crc != crc:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for zip member {name}")
+
+
+# Read a data descriptor, returning its CRC-32 field
+def _read_descriptor(reader: _ChunkReader, is_zip64: bool):
+    crc = reader.read(4)
+    if crc == DATA_DESCRIPTOR:
+        crc = reader.read(4)
+    reader.read(16 if is_zip64 else 8)
+    return crc
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import waifuvault
+from benchmarks.bench import run_benchmarks, compare_results, percentile
+
+
+# Run a script in a fresh interpreter that can import the package under test
+def run_fresh(script):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(waifuvault.__file__)))
+    return subprocess.run([sys.executable, "-c", script], env=env, check=True, capture_output=True, text=True).stdout
+
+
+def test_benchmarks_smoke():
+    # Given
+    logged = []
+
+    # When
+    results = run_benchmarks(["upload.small.*", "download.small.sync.single", "album.extract.sync.single",
+                              "startup.*"], count=5,
+                             large_size=64 * 1024, large_count=1, concurrency=2, log=logged.append)
+
+    # Then
+    assert (sorted(results["scenarios"]) == ["album.extract.sync.single", "download.small.sync.single",
+                                             "startup.import.cold", "upload.small.async.bulk",
+                                             "upload.small.async.single", "upload.small.sync.bulk",
+                                             "upload.small.sync.single"]), \
+        "Scenarios do not match"
+    assert (all(result["ops"] > 0 and result["p99_ms"] >= result["p50_ms"] for result in
+                results["scenarios"].values())), "Scenario results missing"
+    assert (len(logged) == 7), "Results not logged"
+
+
+def test_compare_results():
+    # Given
+    baseline = {"scenarios": {"a": {"ops_per_sec": 100, "p50_ms": 10, "p99_ms": 20, "peak_rss_mb": 50}}}
+    current = {"scenarios": {"a": {"ops_per_sec": 80, "p50_ms": 10, "p99_ms": 30, "peak_rss_mb": 40},
+                             "b": {"ops_per_sec": 1}}}
+
+    # When
+    changes = compare_results(baseline, current)
+
+    # Then
+    assert (changes == {"a": {"ops_per_sec": 0.2, "p50_ms": 0.0, "p99_ms": 0.5, "peak_rss_mb": -0.2}}), \
+        "Changes do not match"
+    assert (percentile([1, 2, 3, 4], 0.5) == 2.5), "Percentile does not match"
+
+
+def test_import_does_not_load_transports():
+    # Given
+    script = ("import sys, waifuvault; print(sorted(m for m in ('requests', 'requests_toolbelt', 'aiohttp', 'asyncio') "
+              "if m in sys.modules))")
+
+    # When
+    output = run_fresh(script)
+
+    # Then
+    assert (output.strip() == "[]"), f"Importing waifuvault loaded {output.strip()}"
+
+
+def test_clients_load_lazily():
+    # Given
+    script = "import sys, waifuvault; waifuvault.WaifuVaultClient; print('requests' in sys.modules, 'aiohttp' in sys.modules)"
+
+    # When
+    output = run_fresh(script)
+
+    # Then
+    assert (output.split() == ["True", "False"]), "Sync client did not load only requests"
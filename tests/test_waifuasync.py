@@ -0,0 +1,328 @@
+import asyncio
+import io
+import re
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import waifuvault
+
+
+# Async Response Mock Object
+def async_response_mock(ok, text, content=None, status=200):
+    response = AsyncMock()
+    response.ok = ok
+    response.status = status
+    response.text = AsyncMock(return_value=text)
+    response.read = AsyncMock(return_value=content if content is not None else text.encode())
+    return response
+
+
+ok_response_numeric = '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "bucket":"test-bucket", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}'
+restrictions_small = '[{"type": "MAX_FILE_SIZE","value": 100},{"type": "BANNED_MIME_TYPE","value": "application/x-msdownload,application/x-executable"}]'
+
+
+@pytest.mark.asyncio
+async def test_async_file_info(mocker):
+    # Given
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                            return_value=async_response_mock(True, ok_response_numeric))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        upload_info = await client.file_info("test-token", True)
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/rest/test-token', params={'formatted': 'true'})
+    assert (upload_info.token == "test-token"), "Token does not match"
+    assert (upload_info.retentionPeriod == 100), "Retention does not match"
+
+
+@pytest.mark.asyncio
+async def test_async_file_info_error(mocker):
+    # Given
+    bad_request = async_response_mock(False, '', status=400)
+    bad_request.json = AsyncMock(return_value={"name": "BAD_REQUEST", "message": "Error Test", "status": 400})
+    mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock, return_value=bad_request)
+
+    # Then
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        with pytest.raises(Exception, match=re.escape('Error 400 (BAD_REQUEST): Error Test')):
+            await client.file_info("bad-token", True)
+
+
+@pytest.mark.asyncio
+async def test_async_get_bucket(mocker):
+    # Given
+    mock_post = mocker.patch('aiohttp.ClientSession.post', new_callable=AsyncMock,
+                             return_value=async_response_mock(True, '{"token": "test-bucket", "files":[{"token":"some-file-token", "url":"some-file-url", "bucket":"test-bucket", "retentionPeriod":10, "options":{"hideFilename":false, "oneTimeDownload": false, "protected":false}}], "albums":[]}'))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        bucket = await client.get_bucket("test-bucket")
+
+    # Then
+    mock_post.assert_called_once_with('https://waifuvault.moe/rest/bucket/get', json={'bucket_token': 'test-bucket'})
+    assert (bucket.token == "test-bucket"), "Get Bucket did not return bucket"
+    assert (bucket.files[0].token == "some-file-token"), "Get Bucket did not return files"
+
+
+@pytest.mark.asyncio
+async def test_async_download(mocker):
+    # Given
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                            return_value=async_response_mock(True, '', bytes("someval", "utf8")))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        file_down = await client.get_file(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), "dangerWaifu")
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/f/something', headers={'x-password': 'dangerWaifu'})
+    assert (isinstance(file_down, io.BytesIO)), "Download did not return a buffer"
+    assert (file_down.read() == b"someval"), "Download returned wrong content"
+
+
+@pytest.mark.asyncio
+async def test_async_restriction_error(mocker):
+    # Given
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                            return_value=async_response_mock(True, restrictions_small))
+    mock_put = mocker.patch('aiohttp.ClientSession.put', new_callable=AsyncMock)
+
+    # Then
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        with pytest.raises(ValueError, match=re.escape('File size 97674 is larger than max allowed 100')):
+            await client.upload_file(waifuvault.FileUpload("tests/testfile.png"))
+    mock_put.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_session_reused(mocker):
+    # Given
+    mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                 return_value=async_response_mock(True, ok_response_numeric))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient(limit=250) as client:
+        await client.file_info("test-token", False)
+        session = client._session
+        await client.file_info("test-token", False)
+
+        # Then
+        assert (client._session is session), "Session was replaced between calls"
+        assert (session.connector.limit == 250), "Connector limit not applied"
+    assert (client._session is None), "Session was not closed"
+
+
+@pytest.mark.asyncio
+async def test_async_upload_many(mocker):
+    # Given
+    restrictions = '[{"type": "MAX_FILE_SIZE","value": 536870912}]'
+    bad_request = async_response_mock(False, '', status=400)
+    bad_request.json = AsyncMock(return_value={"name": "BAD_REQUEST", "message": "Error Test", "status": 400})
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                            return_value=async_response_mock(True, restrictions))
+    mock_put = mocker.patch('aiohttp.ClientSession.put', new_callable=AsyncMock,
+                            side_effect=[async_response_mock(True, ok_response_numeric), bad_request,
+                                         async_response_mock(True, ok_response_numeric)])
+    uploads = [waifuvault.FileUpload(f"https://walker.moe/assets/{name}.png") for name in ["a", "b", "c"]]
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        results = [result async for result in client.upload_many(uploads, concurrency=1, bucket_token="job-bucket")]
+
+    # Then
+    mock_get.assert_called_once()
+    assert (mock_put.call_count == 3), "Not every upload was sent"
+    assert (mock_put.call_args.args[0] == 'https://waifuvault.moe/rest/job-bucket'), "Bucket token not applied"
+    assert ([item for item, result in results] == uploads), "Results not reported for every input"
+    assert (isinstance(results[1][1], Exception)), "Failure not reported"
+    assert (results[2][1].token == "test-token"), "Failure cancelled the batch"
+
+
+@pytest.mark.asyncio
+async def test_async_associate_files_batched(mocker):
+    # Given
+    mock_post = mocker.patch('aiohttp.ClientSession.post', new_callable=AsyncMock,
+                             side_effect=lambda url, json=None: async_response_mock(True, "{}"))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        result = await client.associate_files_batched("test-album", [f"file-{index}" for index in range(5)],
+                                                      chunk_size=2, concurrency=2)
+
+    # Then
+    assert (mock_post.call_count == 3), "Tokens not sent in chunks"
+    assert (mock_post.call_args.args[0] == 'https://waifuvault.moe/rest/album/test-album/associate'), \
+        "Wrong endpoint used"
+    assert (result.ok and len(result.succeeded) == 5), "Result does not match"
+
+
+@pytest.mark.asyncio
+async def test_async_delete_many(mocker):
+    # Given
+    mock_delete = mocker.patch('aiohttp.ClientSession.delete', new_callable=AsyncMock,
+                               side_effect=lambda url: async_response_mock(True, "false" if url.endswith("2") else "true"))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        result = await client.delete_many(["file1", "file2", "file3"])
+
+    # Then
+    assert (mock_delete.call_count == 3), "Not every file was deleted"
+    assert (set(result.succeeded) == {"file1", "file3"}), "Deleted files not reported"
+    assert (list(result.failed) == ["file2"]), "File not deleted was not reported"
+
+
+@pytest.mark.asyncio
+async def test_async_timeouts(mocker):
+    # Given
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock,
+                            side_effect=lambda url, **kwargs: async_response_mock(True, ok_response_numeric))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient(connect_timeout=3, read_timeout=30) as client:
+        with client.timeout(read=5):
+            await client.file_info("test-token", False)
+        await client.file_info("other-token", False)
+        session_timeout = client._get_session().timeout
+
+    # Then
+    assert (mock_get.call_args_list[0].kwargs["timeout"].sock_read == 5), "Override not applied"
+    assert (mock_get.call_args_list[0].kwargs["timeout"].sock_connect == 3), "Default connect timeout not kept"
+    assert ("timeout" not in mock_get.call_args_list[1].kwargs), "Override outlived the with block"
+    assert (session_timeout.sock_connect == 3 and session_timeout.sock_read == 30), "Session timeouts not set"
+
+
+@pytest.mark.asyncio
+async def test_async_delete_many_deadline(mocker):
+    # Given
+    async def delete(url):
+        if url.endswith("slow"):
+            await asyncio.sleep(5)
+        return async_response_mock(True, "true")
+    mocker.patch('aiohttp.ClientSession.delete', new=AsyncMock(side_effect=delete))
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        result = await client.delete_many(["fast", "slow", "queued"], concurrency=1, deadline=0.1)
+
+    # Then
+    assert (list(result.succeeded) == ["fast"]), "Finished call not reported"
+    assert (result.unknown == ["slow"]), "Cancelled call in flight not reported as unknown"
+    assert (result.unfinished == ["queued"]), "Call never started not reported as unfinished"
+
+
+@pytest.mark.asyncio
+async def test_async_delete_many_deadline_while_waiting_for_slot(mocker):
+    # Given
+    async def delete(url):
+        await asyncio.sleep(5)
+    mock_delete = mocker.patch('aiohttp.ClientSession.delete', new=AsyncMock(side_effect=delete))
+    concurrency_limit = waifuvault.AdaptiveConcurrency(initial=1, max_limit=1)
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient(concurrency_limit=concurrency_limit) as client:
+        result = await client.delete_many(["slow", "queued"], concurrency=2, deadline=0.1)
+
+    # Then
+    assert (mock_delete.call_count == 1), "Request sent after waiting past the deadline"
+    assert (len(result.unknown) == 1), "Call in flight not reported as unknown"
+    assert (len(result.unfinished) == 1), "Call waiting for a slot not reported as unfinished"
+    assert (concurrency_limit.in_flight == 0), "Slot not given back"
+
+
+# Async Streamed Response Mock Object
+def async_stream_response_mock(chunks):
+    async def iter_chunked(size):
+        for chunk in chunks:
+            yield chunk
+    response = async_response_mock(True, '')
+    response.content = MagicMock()
+    response.content.iter_chunked = MagicMock(side_effect=iter_chunked)
+    return response
+
+
+@pytest.mark.asyncio
+async def test_async_get_file_to(mocker, tmp_path):
+    # Given
+    response = async_stream_response_mock([b"some", b"val"])
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock, return_value=response)
+    destination = tmp_path / "download.bin"
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        written = await client.get_file_to(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"),
+                                           destination, "dangerWaifu", chunk_size=4)
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/f/something', headers={'x-password': 'dangerWaifu'})
+    response.content.iter_chunked.assert_called_once_with(4)
+    assert (written == 7), "Written size does not match"
+    assert (destination.read_bytes() == b"someval"), "File content does not match"
+
+
+@pytest.mark.asyncio
+async def test_async_get_file_parallel(mocker, tmp_path):
+    # Given
+    content = bytes(range(256)) * 3
+    head = async_response_mock(True, '')
+    head.headers = {"Accept-Ranges": "bytes", "Content-Length": str(len(content))}
+
+    async def get(url, headers=None):
+        start, end = (int(value) for value in headers["Range"][len("bytes="):].split("-"))
+        response = async_stream_response_mock([content[start:end + 1]])
+        response.status = 206
+        return response
+    mocker.patch('aiohttp.ClientSession.head', new_callable=AsyncMock, return_value=head)
+    mocker.patch('aiohttp.ClientSession.get', side_effect=get)
+    to_thread = mocker.spy(asyncio, "to_thread")
+    destination = tmp_path / "download.bin"
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        size = await client.get_file_parallel(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"),
+                                              destination, connections=3, min_part_size=256)
+
+    # Then
+    assert (size == len(content)), "Size does not match"
+    assert (destination.read_bytes() == content), "File content does not match"
+    assert (to_thread.call_count == 3), "Writes were not moved off the event loop"
+    assert ([path.name for path in tmp_path.iterdir()] == ["download.bin"]), "Temporary file left behind"
+
+
+@pytest.mark.asyncio
+async def test_async_get_file_spooled(mocker):
+    # Given
+    response = async_stream_response_mock([b"some", b"val"])
+    mocker.patch('aiohttp.ClientSession.get', new_callable=AsyncMock, return_value=response)
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        spool = await client.get_file(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"),
+                                      spool_threshold=4)
+
+    # Then
+    assert (spool.read() == b"someval"), "Spooled content does not match"
+    assert (spool._rolled), "Download over the threshold was kept in memory"
+    spool.close()
+
+
+@pytest.mark.asyncio
+async def test_async_upload_file_streams(mocker):
+    # Given
+    sent = {}
+
+    async def put(url, params=None, data=None):
+        sent["size"] = data.size
+        sent["payload"] = data._parts[0][0]
+        return async_response_mock(True, ok_response_numeric)
+    mocker.patch('aiohttp.ClientSession.put', side_effect=put)
+
+    # When
+    async with waifuvault.AsyncWaifuVaultClient() as client:
+        await client.upload_file(waifuvault.FileUpload("tests/testfile.png"), True)
+
+    # Then
+    assert (sent["payload"].size == 97674), "Upload size not known up front"
+    assert (sent["payload"]._value._source.closed), "File handle was not closed"
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import waifuvault
+
+restrictions_json = [{"type": "MAX_FILE_SIZE", "value": 536870912},
+                     {"type": "BANNED_MIME_TYPE", "value": "application/x-msdownload,application/x-executable"}]
+
+
+def test_cache_single_flight():
+    # Given
+    cache = waifuvault.RestrictionsCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return restrictions_json
+
+    # When
+    threads = [threading.Thread(target=cache.get, args=(loader,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Then
+    assert (len(calls) == 1), "Restrictions fetched more than once"
+    assert (cache.get(loader).Restrictions[0].value == 536870912), "Restrictions not cached"
+
+
+@pytest.mark.asyncio
+async def test_cache_single_flight_async():
+    # Given
+    cache = waifuvault.RestrictionsCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return restrictions_json
+
+    # When
+    results = await asyncio.gather(*[cache.get_async(loader) for _ in range(8)])
+
+    # Then
+    assert (len(calls) == 1), "Restrictions fetched more than once"
+    assert (all(result is results[0] for result in results)), "Tasks got different restrictions"
+
+
+def test_cache_ttl():
+    # Given
+    cache = waifuvault.RestrictionsCache(ttl=0, refresh_ahead=0)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return restrictions_json
+
+    # When
+    cache.get(loader)
+    cache.get(loader)
+
+    # Then
+    assert (len(calls) == 2), "Expired restrictions were not fetched again"
+
+
+def test_cache_refresh_ahead():
+    # Given
+    cache = waifuvault.RestrictionsCache(ttl=30, refresh_ahead=10)
+    cache.set(restrictions_json).Expires = datetime.now() + timedelta(seconds=5)
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return restrictions_json
+
+    # When
+    restrictions = cache.get(loader)
+
+    # Then
+    assert (restrictions.Restrictions[0].type == "MAX_FILE_SIZE"), "Cached restrictions not returned"
+    assert (refreshed.wait(1)), "Background refresh not started"
+
+
+def test_cache_refresh_ahead_single_flight():
+    # Given
+    cache = waifuvault.RestrictionsCache(ttl=30, refresh_ahead=10)
+    cache.set(restrictions_json).Expires = datetime.now() + timedelta(seconds=5)
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def loader():
+        with lock:
+            running.append(1)
+            overlaps.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.pop()
+        return restrictions_json
+
+    def get_many():
+        for _ in range(20):
+            cache.get(loader)
+
+    # Widen the window between deciding to refresh and starting it, as a preempted thread would
+    should_refresh = cache._should_refresh
+
+    def slow_should_refresh(restrictions):
+        due = should_refresh(restrictions)
+        time.sleep(0.001)
+        return due
+    cache._should_refresh = slow_should_refresh
+
+    # When
+    threads = [threading.Thread(target=get_many) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.05)
+
+    # Then
+    assert (overlaps and max(overlaps) == 1), "Background refreshes ran concurrently"
+
+
+def test_cache_refresh_ahead_clamped_to_ttl():
+    # Given
+    cache = waifuvault.RestrictionsCache(ttl=30, refresh_ahead=60)
+    cache.set(restrictions_json)
+    calls = []
+
+    # When
+    for _ in range(5):
+        cache.get(lambda: calls.append(1) or restrictions_json)
+
+    # Then
+    assert (cache.refresh_ahead == 15), "Refresh ahead not clamped to the TTL"
+    assert (calls == []), "Fresh restrictions refreshed on every get"
+
+
+def test_cache_persistence(tmp_path):
+    # Given
+    path = tmp_path / "restrictions.json"
+    waifuvault.RestrictionsCache(path=path).set(restrictions_json)
+
+    # When
+    restrictions = waifuvault.RestrictionsCache(path=path).get(lambda: pytest.fail("Restrictions fetched"))
+
+    # Then
+    assert (restrictions.Restrictions[1].type == "BANNED_MIME_TYPE"), "Persisted restrictions not loaded"
+    assert (json.loads(path.read_text())["restrictions"] == restrictions_json), "Restrictions not persisted"
+
+
+def test_cache_persistence_expired(tmp_path):
+    # Given
+    path = tmp_path / "restrictions.json"
+    expired = (datetime.now() - timedelta(seconds=1)).timestamp()
+    path.write_text(json.dumps({"expires": expired, "restrictions": []}))
+
+    # When
+    restrictions = waifuvault.RestrictionsCache(path=path).get(lambda: restrictions_json)
+
+    # Then
+    assert (len(restrictions.Restrictions) == 2), "Expired persisted restrictions used"
+
+
+def test_cache_shared_between_clients(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get')
+    mock_get.return_value.ok = True
+    mock_get.return_value.text = json.dumps(restrictions_json)
+    mock_get.return_value.content = mock_get.return_value.text.encode()
+    cache = waifuvault.RestrictionsCache()
+    first = waifuvault.WaifuVaultClient(restrictions_cache=cache)
+    second = waifuvault.WaifuVaultClient(restrictions_cache=cache)
+
+    # When
+    first._current_restrictions()
+    second._current_restrictions()
+    second.clear_restrictions()
+    first._current_restrictions()
+
+    # Then
+    assert (mock_get.call_count == 2), "Clients did not share the restrictions cache"
+
+
+def test_file_info_cache_lru():
+    # Given
+    cache = waifuvault.FileInfoCache(maxsize=2)
+    cache.put("a", False, "info-a")
+    cache.put("b", False, "info-b")
+
+    # When
+    cache.get("a", False)
+    cache.put("c", False, "info-c")
+
+    # Then
+    assert (cache.get("a", False) == "info-a"), "Recently used entry evicted"
+    assert (cache.get("b", False) is None), "Least recently used entry not evicted"
+    assert (cache.stats() == {"hits": 2, "misses": 1, "size": 2, "maxsize": 2}), "Counters do not match"
+
+
+def test_file_info_cache_ttl():
+    # Given
+    cache = waifuvault.FileInfoCache(ttl=0)
+    cache.put("a", False, "info-a")
+
+    # When
+    info = cache.get("a", False)
+
+    # Then
+    assert (info is None), "Expired entry returned"
+
+
+def test_client_file_info_cache(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get')
+    mock_get.return_value.ok = True
+    mock_get.return_value.text = '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}'
+    mock_get.return_value.content = mock_get.return_value.text.encode()
+    mock_delete = mocker.patch('requests.Session.delete')
+    mock_delete.return_value.ok = True
+    mock_delete.return_value.text = "true"
+    cache = waifuvault.FileInfoCache()
+    client = waifuvault.WaifuVaultClient(file_info_cache=cache)
+
+    # When
+    client.file_info("test-token", False)
+    client.file_info("test-token", False)
+    client.file_info("test-token", True)
+    client.delete_file("test-token")
+    client.file_info("test-token", False)
+
+    # Then
+    assert (mock_get.call_count == 3), "Cached file info not reused or not invalidated"
+    assert (cache.hits == 1), "Cache hit not counted"
+    assert (cache.misses == 3), "Cache misses not counted"
@@ -0,0 +1,182 @@
+import io
+import json
+import os
+import time
+
+import pytest
+from benchmarks.standin import StandInServer
+import waifuvault
+from waifuvault import WaifuVaultClient
+from waifuvault.waifucli import (main, build_parser, download, Output, TransferProgress, expect_downloads,
+                                 collect_files, file_name, download_path)
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    with StandInServer() as server:
+        yield server.base_url
+
+
+def run(capsys, base_url, *argv):
+    code = main(["--base-url", base_url, "--json", *argv])
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_cli_upload_directory_into_album(capsys, base_url, tmp_path):
+    # Given
+    source = tmp_path / "source"
+    (source / "nested").mkdir(parents=True)
+    (source / "a.txt").write_bytes(b"a" * 100)
+    (source / "nested" / "b.txt").write_bytes(b"b" * 200)
+    _, bucket = run(capsys, base_url, "bucket", "create")
+    _, album = run(capsys, base_url, "album", "create", bucket["token"], "cli")
+
+    # When
+    code, uploaded = run(capsys, base_url, "upload", str(source), "-j", "2", "--bucket", bucket["token"],
+                         "--album", album["token"])
+    _, listing = run(capsys, base_url, "bucket", "list", bucket["token"])
+
+    # Then
+    assert (code == 0), "Upload failed"
+    assert ([os.path.basename(file["path"]) for file in uploaded["files"]] == ["a.txt", "b.txt"]), \
+        "Uploads not reported in order"
+    assert (sorted(uploaded["album"]["files"]) == sorted(file["token"] for file in uploaded["files"])), \
+        "Files not added to the album"
+    assert (sorted(file["token"] for file in listing["files"]) == sorted(uploaded["album"]["files"])), \
+        "Bucket listing does not match"
+    assert (listing["albums"][0]["name"] == "cli"), "Album not listed"
+
+
+def test_cli_download_files_and_albums(capsys, base_url, tmp_path):
+    # Given
+    source = tmp_path / "data.bin"
+    source.write_bytes(os.urandom(4096))
+    _, bucket = run(capsys, base_url, "bucket", "create")
+    _, uploaded = run(capsys, base_url, "upload", str(source), "--bucket", bucket["token"])
+    token = uploaded["files"][0]["token"]
+    _, album = run(capsys, base_url, "album", "create", bucket["token"], "download")
+    run(capsys, base_url, "album", "associate", album["token"], token)
+
+    # When
+    code, downloaded = run(capsys, base_url, "download", token, "-o", str(tmp_path / "files"))
+    _, zipped = run(capsys, base_url, "download", "--album", album["token"], "-o", str(tmp_path / "zips"))
+    _, extracted = run(capsys, base_url, "download", "--album", "--extract", album["token"], "-o",
+                       str(tmp_path / "extracted"))
+
+    # Then
+    assert (code == 0), "Download failed"
+    with open(downloaded["files"][0]["path"], "rb") as fh:
+        assert (fh.read() == source.read_bytes()), "Downloaded file does not match"
+    assert (zipped["albums"][0]["size"] > 4096), "Album zip not saved"
+    with open(extracted["albums"][0]["files"][0], "rb") as fh:
+        assert (fh.read() == source.read_bytes()), "Extracted file does not match"
+
+
+def test_cli_download_same_names(capsys, base_url, tmp_path):
+    # Given
+    tokens = []
+    for directory in ["one", "two"]:
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "image.png").write_bytes(directory.encode())
+        _, uploaded = run(capsys, base_url, "upload", str(tmp_path / directory / "image.png"))
+        tokens.append(uploaded["files"][0]["token"])
+
+    # When
+    code, downloaded = run(capsys, base_url, "download", *tokens, "-o", str(tmp_path / "out"))
+
+    # Then
+    paths = [file["path"] for file in downloaded["files"]]
+    assert (code == 0), "Download failed"
+    assert (sorted(os.path.basename(path) for path in paths) == ["image (2).png", "image.png"]), \
+        "Clashing names not made unique"
+    assert (sorted(open(path, "rb").read() for path in paths) == [b"one", b"two"]), "A download was overwritten"
+
+
+def test_cli_reports_failures(capsys, base_url, tmp_path):
+    # When
+    code, result = run(capsys, base_url, "download", "missing-token", "-o", str(tmp_path))
+
+    # Then
+    assert (code == 1), "Failure not reflected in the exit status"
+    assert ("File not found" in result["files"][0]["error"]), "Error not reported"
+
+
+def test_transfer_progress():
+    # Given
+    stream = io.StringIO()
+    progress = TransferProgress(total_items=2, total_bytes=2048, stream=stream, interval=0)
+
+    # When
+    progress.update("a", 512)
+    progress.update("b", 512)
+    progress.update("a", 1024)
+    progress.finish("a")
+    progress.close()
+
+    # Then
+    assert (progress.bytes_done == 1536), "Bytes not aggregated across items"
+    assert ("1/2 files  1.5 KB / 2.0 KB" in stream.getvalue()), "Progress line not written"
+    assert (stream.getvalue().endswith("\n")), "Progress line not ended"
+
+
+def test_download_progress_eta():
+    # Given
+    stream = io.StringIO()
+    progress = TransferProgress(total_items=2, stream=stream, interval=0)
+    hook = expect_downloads(progress)
+
+    # When
+    hook(waifuvault.RequestEvent("file_info", "get", "{token}", "u", status=200, bytes_received=300))
+    hook(waifuvault.RequestEvent("get_file", "get", "{file_url}", "u", status=200, bytes_received=1024))
+    hook(waifuvault.RequestEvent("get_file", "get", "{file_url}", "u", status=503, bytes_received=50))
+    hook(waifuvault.RequestEvent("get_file", "get", "{file_url}", "u", status=200, bytes_received=1024))
+    progress.update("a", 512)
+    time.sleep(0.01)
+    progress.update("a", 1024)
+
+    # Then
+    assert (progress.total_bytes == 2048), "Download sizes not added to the total"
+    assert (progress.eta() is not None), "No ETA for downloads"
+    assert ("ETA" in progress.line()), "ETA not rendered"
+
+
+def test_cli_download_removes_progress_hook(capsys, base_url, tmp_path):
+    # Given
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"data" * 100)
+    _, uploaded = run(capsys, base_url, "upload", str(source))
+    client = WaifuVaultClient(base_url)
+    args = build_parser().parse_args(["download", uploaded["files"][0]["token"], "-o", str(tmp_path / "out")])
+    args.progress = False
+
+    # When
+    code = download(client, args, Output(True, io.StringIO()))
+
+    # Then
+    assert (code == 0), "Download failed"
+    assert (client.hooks == []), "Progress hook left on the client"
+
+
+def test_collect_files_and_names(tmp_path):
+    # Given
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "two").write_text("2")
+    (tmp_path / "one").write_text("1")
+
+    # Then
+    assert (collect_files([str(tmp_path)]) == [str(tmp_path / "one"), str(tmp_path / "b" / "two")]), \
+        "Directory not walked"
+    with pytest.raises(ValueError):
+        collect_files([str(tmp_path / "missing")])
+    assert (file_name("https://waifuvault.moe/f/token/my%20file.png") == "my file.png"), "File name not decoded"
+
+
+def test_download_names_stay_in_output(tmp_path):
+    # Given
+    names = [file_name(f"https://waifuvault.moe/f/token/{name}") for name in ["..%2F..%2Fevil.sh", "..", "%2E%2E", ""]]
+
+    # Then
+    assert (names == ["evil.sh", "download", "download", "token"]), "Encoded path not reduced to its base name"
+    assert (download_path(str(tmp_path), "evil.sh") == os.path.join(str(tmp_path), "evil.sh")), "Plain name refused"
+    with pytest.raises(ValueError):
+        download_path(str(tmp_path), "../evil.sh")
@@ -0,0 +1,680 @@
+import io
+import os
+import socket
+import threading
+import time
+import zipfile
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+import waifuvault
+from waifuvault.waifubulk import run_bounded
+
+
+# Response Mock Object
+class response_mock:
+    def __init__(self, ok, text, content=None, code=None):
+        self.ok = ok
+        self.code = code
+        self.text = text
+        self.content = content if content is not None else text.encode()
+
+
+ok_response_numeric = response_mock(True,
+                                    '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "bucket":"test-bucket", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}')
+restrictions_response = response_mock(True,
+                                      '[{"type": "MAX_FILE_SIZE","value": 536870912},{"type": "BANNED_MIME_TYPE","value": "application/x-msdownload,application/x-executable"}]')
+bad_request = response_mock(False,
+                            '{"name": "BAD_REQUEST", "message": "Error Test", "status": 400}', code=400)
+
+
+def test_client_base_url(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', return_value=ok_response_numeric)
+    client = waifuvault.WaifuVaultClient("https://example.com/rest")
+
+    # When
+    upload_info = client.file_info("test-token", False)
+
+    # Then
+    mock_get.assert_called_once_with('https://example.com/rest/test-token', params={'formatted': 'false'})
+    assert (upload_info.token == "test-token"), "Token does not match"
+
+
+def test_client_pool_settings():
+    # Given
+    client = waifuvault.WaifuVaultClient(pool_connections=4, pool_maxsize=32, keep_alive=False)
+
+    # When
+    adapter = client._session.get_adapter("https://waifuvault.moe/rest")
+
+    # Then
+    assert (adapter._pool_connections == 4), "Pool connections not applied"
+    assert (adapter._pool_maxsize == 32), "Pool size not applied"
+    assert (client._session.headers["Connection"] == "close"), "Keep-alive not disabled"
+
+
+def test_bulk_calls_grow_connection_pool(mocker):
+    # Given
+    mocker.patch('requests.Session.delete', return_value=response_mock(True, "true"))
+    client = waifuvault.WaifuVaultClient(pool_maxsize=4)
+    small = client._session.get_adapter("https://waifuvault.moe/rest")
+
+    # When
+    client.delete_many(["a", "b"], concurrency=2)
+    unchanged = client._session.get_adapter("https://waifuvault.moe/rest")
+    client.delete_many(["a", "b"], concurrency=32)
+    grown = client._session.get_adapter("https://waifuvault.moe/rest")
+
+    # Then
+    assert (unchanged is small), "Pool replaced although it was large enough"
+    assert (grown._pool_maxsize == 32 and client.pool_maxsize == 32), "Pool not sized for the concurrency"
+    assert (grown.timeout == small.timeout), "Grown pool lost the default timeouts"
+
+
+def test_client_reuses_session(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', return_value=ok_response_numeric)
+    client = waifuvault.WaifuVaultClient()
+
+    # When
+    session = client._session
+    client.file_info("test-token", False)
+    client.file_info("test-token", True)
+
+    # Then
+    assert (mock_get.call_count == 2), "Session was not used for both calls"
+    assert (client._session is session), "Session was replaced between calls"
+
+
+def test_client_context_manager_closes(mocker):
+    # Given
+    mock_close = mocker.patch('requests.Session.close')
+
+    # When
+    with waifuvault.WaifuVaultClient() as client:
+        pass
+
+    # Then
+    mock_close.assert_called_once()
+
+
+def test_module_functions_use_default_client(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', return_value=ok_response_numeric)
+    client = waifuvault.WaifuVaultClient("https://example.com/rest", session=requests.Session())
+    previous = waifuvault.get_default_client()
+    waifuvault.set_default_client(client)
+
+    # When
+    try:
+        waifuvault.file_info("test-token", False)
+    finally:
+        waifuvault.set_default_client(previous)
+
+    # Then
+    mock_get.assert_called_once_with('https://example.com/rest/test-token', params={'formatted': 'false'})
+
+
+def test_upload_many(mocker):
+    # Given
+    def put(url, params=None, data=None, headers=None):
+        return bad_request if data["url"].endswith("bad.png") else ok_response_numeric
+    mock_put = mocker.patch('requests.Session.put', side_effect=put)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
+    uploads = [waifuvault.FileUpload(f"https://walker.moe/assets/{name}.png") for name in ["a", "bad", "c", "d"]]
+    client = waifuvault.WaifuVaultClient()
+
+    # When
+    results = dict(client.upload_many(uploads, concurrency=2, bucket_token="job-bucket"))
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/rest/resources/restrictions')
+    assert (mock_put.call_count == 4), "Not every upload was sent"
+    assert (all(call.args[0] == 'https://waifuvault.moe/rest/job-bucket' for call in mock_put.call_args_list)), "Bucket token not applied"
+    assert (set(results) == set(uploads)), "Results not reported for every input"
+    assert (isinstance(results[uploads[1]], Exception)), "Failure not reported"
+    assert (results[uploads[3]].token == "test-token"), "Failure cancelled the batch"
+    assert (uploads[0].bucket_token is None), "Input upload was modified"
+
+
+def test_upload_many_restriction_error(mocker):
+    # Given
+    mock_put = mocker.patch('requests.Session.put', return_value=ok_response_numeric)
+    mocker.patch('requests.Session.get', return_value=response_mock(True, '[{"type": "MAX_FILE_SIZE","value": 100}]'))
+    uploads = [waifuvault.FileUpload("tests/testfile.png"), waifuvault.FileUpload("https://walker.moe/assets/a.png")]
+
+    # When
+    results = list(waifuvault.WaifuVaultClient().upload_many(uploads))
+
+    # Then
+    errors = [result for item, result in results if isinstance(result, ValueError)]
+    assert (len(results) == 2), "Results not reported for every input"
+    assert (len(errors) == 1), "Restriction failure not reported"
+    mock_put.assert_called_once()
+
+
+def test_associate_files_batched(mocker):
+    # Given
+    def post(url, json=None):
+        return bad_request if "bad" in json["fileTokens"] else response_mock(True, "{}")
+    mock_post = mocker.patch('requests.Session.post', side_effect=post)
+    tokens = [f"file-{index}" for index in range(7)] + ["bad"]
+
+    # When
+    result = waifuvault.WaifuVaultClient().associate_files_batched("test-album", iter(tokens), chunk_size=3,
+                                                                   concurrency=2)
+
+    # Then
+    chunks = sorted(call.kwargs["json"]["fileTokens"] for call in mock_post.call_args_list)
+    assert (chunks == [tokens[0:3], tokens[3:6], tokens[6:8]]), "Tokens not sent in chunks"
+    assert (all(call.args[0] == 'https://waifuvault.moe/rest/album/test-album/associate'
+                for call in mock_post.call_args_list)), "Wrong endpoint used"
+    assert (sorted(result.succeeded) == tokens[0:6]), "Successful chunks not reported"
+    assert (sorted(result.failed) == ["bad", "file-6"]), "Failed chunk not reported per token"
+    assert (not result.ok), "Result reported as ok"
+
+
+def test_disassociate_files_batched(mocker):
+    # Given
+    mock_post = mocker.patch('requests.Session.post', return_value=response_mock(True, "{}"))
+
+    # When
+    result = waifuvault.disassociate_files_batched("test-album", ["file1", "file2"], chunk_size=1)
+
+    # Then
+    assert (mock_post.call_count == 2), "Tokens not sent in chunks"
+    assert (mock_post.call_args.args[0] == 'https://waifuvault.moe/rest/album/test-album/disassociate'), \
+        "Wrong endpoint used"
+    assert (result.ok and set(result.succeeded) == {"file1", "file2"}), "Result does not match"
+
+
+def test_delete_many_from_bucket(mocker):
+    # Given
+    def delete(url):
+        return bad_request if url.endswith("/bad") else response_mock(True, "true")
+    mock_delete = mocker.patch('requests.Session.delete', side_effect=delete)
+    bucket = waifuvault.BucketResponse(dict_obj={"token": "test-bucket", "albums": [], "files": [
+        {"token": token, "options": {}} for token in ["file1", "bad", "file2"]]})
+
+    # When
+    result = waifuvault.WaifuVaultClient().delete_many(bucket, concurrency=2)
+
+    # Then
+    assert (mock_delete.call_count == 3), "Not every file was deleted"
+    assert (all(isinstance(item, dict) for item in bucket.files._items)), "Bucket files were parsed"
+    assert (set(result.succeeded) == {"file1", "file2"}), "Deleted files not reported"
+    assert ("Error Test" in str(result.failed["bad"])), "Failure not reported"
+
+
+def test_update_many(mocker):
+    # Given
+    mock_patch = mocker.patch('requests.Session.patch', return_value=ok_response_numeric)
+    files = [waifuvault.FileResponse(token="file1"), "file2"]
+
+    # When
+    result = waifuvault.update_many(files, custom_expiry="1d", hide_filename=True)
+
+    # Then
+    assert (sorted(call.args[0] for call in mock_patch.call_args_list) ==
+            ['https://waifuvault.moe/rest/file1', 'https://waifuvault.moe/rest/file2']), "Not every file was updated"
+    assert (mock_patch.call_args.kwargs["data"] == {'hideFilename': 'true', 'customExpiry': '1d'}), \
+        "Update fields do not match"
+    assert (result.ok and result.succeeded["file2"].token == "test-token"), "Updated files not reported"
+
+
+def test_default_timeouts_applied_by_adapter():
+    # Given
+    client = waifuvault.WaifuVaultClient(connect_timeout=3, read_timeout=30)
+
+    # When
+    adapter = client._session.get_adapter("https://waifuvault.moe/rest")
+
+    # Then
+    assert (adapter.timeout == (3, 30)), "Default timeouts not set on the adapter"
+
+
+def test_timeout_override(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', return_value=ok_response_numeric)
+    mock_patch = mocker.patch('requests.Session.patch', return_value=ok_response_numeric)
+    client = waifuvault.WaifuVaultClient(connect_timeout=3)
+
+    # When
+    with client.timeout(read=5):
+        client.file_info("test-token", False)
+        client.update_many(["file1", "file2"], hide_filename=True)
+    client.file_info("other-token", False)
+
+    # Then
+    assert (mock_get.call_args_list[0].kwargs["timeout"] == (3, 5)), "Override not applied"
+    assert (all(call.kwargs["timeout"] == (3, 5) for call in mock_patch.call_args_list)), \
+        "Override not applied in bulk workers"
+    assert ("timeout" not in mock_get.call_args_list[1].kwargs), "Override outlived the with block"
+
+
+def test_delete_many_deadline(mocker):
+    # Given
+    def delete(url, timeout=None):
+        if url.endswith("slow"):
+            time.sleep(timeout[1])
+            raise requests.ReadTimeout("Read timed out")
+        return response_mock(True, "true")
+    mock_delete = mocker.patch('requests.Session.delete', side_effect=delete)
+    tokens = ["fast", "slow", "queued"]
+
+    # When
+    started = time.monotonic()
+    result = waifuvault.WaifuVaultClient().delete_many(tokens, concurrency=1, deadline=0.2)
+    elapsed = time.monotonic() - started
+
+    # Then
+    assert (elapsed < 0.5), "Deadline did not stop the running call"
+    assert (mock_delete.call_args_list[1].kwargs["timeout"][1] <= 0.2), "Read timeout not capped to the deadline"
+    assert (list(result.succeeded) == ["fast"]), "Finished call not reported"
+    assert (result.unknown == ["slow"]), "Call in flight not reported as unknown"
+    assert (result.unfinished == ["queued"]), "Call never started not reported as unfinished"
+    assert (isinstance(result.failed["queued"], waifuvault.DeadlineExceeded)), "Wrong error for unstarted call"
+
+
+def test_delete_many_deadline_while_waiting_for_slot(mocker):
+    # Given
+    def delete(url, timeout=None):
+        time.sleep(timeout[1])
+        raise requests.ReadTimeout("Read timed out")
+    mock_delete = mocker.patch('requests.Session.delete', side_effect=delete)
+    concurrency_limit = waifuvault.AdaptiveConcurrency(initial=1, max_limit=1)
+    client = waifuvault.WaifuVaultClient(concurrency_limit=concurrency_limit)
+
+    # When
+    result = client.delete_many(["slow", "queued"], concurrency=2, deadline=0.2)
+
+    # Then
+    assert (mock_delete.call_count == 1), "Request sent after waiting past the deadline"
+    assert (len(result.unknown) == 1), "Call in flight not reported as unknown"
+    assert (len(result.unfinished) == 1), "Call waiting for a slot not reported as unfinished"
+    assert (concurrency_limit.in_flight == 0), "Slot not given back"
+
+
+def test_run_bounded_waits_for_calls_finishing_after_deadline():
+    # Given
+    def work(item):
+        time.sleep(0.3)
+        return item * 2
+
+    # When
+    results = dict(run_bounded(work, [1, 2, 3], 2, deadline=0.1))
+
+    # Then
+    assert (results[1] == 2 and results[2] == 4), "Calls finishing after the deadline not reported"
+    assert (isinstance(results[3], waifuvault.DeadlineExceeded)), "Call never started not reported"
+
+
+def test_upload_many_deadline_ends_requests_in_flight():
+    # Given
+    listener = socket.create_server(("127.0.0.1", 0))
+    connections = []
+
+    # A server that reads requests and never answers
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connections.append(connection)
+    threading.Thread(target=serve, daemon=True).start()
+    client = waifuvault.WaifuVaultClient(f"http://127.0.0.1:{listener.getsockname()[1]}/rest")
+    uploads = [waifuvault.FileUpload(b"content", f"{name}.txt") for name in ["a", "b"]]
+
+    # When
+    started = time.monotonic()
+    try:
+        results = dict(client.upload_many(uploads, concurrency=1, ignore_client_restrictions=True, deadline=0.3))
+    finally:
+        listener.close()
+        for connection in connections:
+            connection.close()
+    elapsed = time.monotonic() - started
+
+    # Then
+    assert (elapsed < 1.5), "Request in flight outlived the deadline"
+    assert (isinstance(results[uploads[0]], waifuvault.OutcomeUnknown)), "Upload in flight not reported as unknown"
+    assert (isinstance(results[uploads[1]], waifuvault.DeadlineExceeded)), "Upload never sent not reported"
+
+
+# Streamed Response Mock Object
+def stream_response_mock(chunks):
+    response = MagicMock()
+    response.ok = True
+    response.iter_content.return_value = iter(chunks)
+    response.__enter__.return_value = response
+    return response
+
+
+def test_iter_file(mocker):
+    # Given
+    response = stream_response_mock([b"some", b"val"])
+    mock_get = mocker.patch('requests.Session.get', return_value=response)
+
+    # When
+    chunks = list(waifuvault.WaifuVaultClient().iter_file(
+        waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), "dangerWaifu", chunk_size=4))
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/f/something', headers={'x-password': 'dangerWaifu'}, stream=True)
+    response.iter_content.assert_called_once_with(4)
+    response.__exit__.assert_called_once()
+    assert (chunks == [b"some", b"val"]), "Chunks do not match"
+
+
+def test_get_file_to_path(mocker, tmp_path):
+    # Given
+    mock_get = mocker.patch('requests.Session.get',
+                            side_effect=[ok_response_numeric, stream_response_mock([b"some", b"val"])])
+    destination = tmp_path / "download.bin"
+
+    # When
+    written = waifuvault.WaifuVaultClient().get_file_to(waifuvault.FileResponse(token="test-token"), destination)
+
+    # Then
+    assert (mock_get.call_args_list[0].args[0] == 'https://waifuvault.moe/rest/test-token'), "Token was not resolved"
+    assert (mock_get.call_args_list[1].args[0] == 'https://waifuvault.moe/f/something'), "Resolved URL not used"
+    assert (written == 7), "Written size does not match"
+    assert (destination.read_bytes() == b"someval"), "File content does not match"
+
+
+def test_get_file_to_fileobj(mocker):
+    # Given
+    mocker.patch('requests.Session.get', return_value=stream_response_mock([b"some", b"val"]))
+    buf = io.BytesIO()
+
+    # When
+    waifuvault.get_file_to(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), buf)
+
+    # Then
+    assert (buf.getvalue() == b"someval"), "Buffer content does not match"
+    assert (not buf.closed), "Caller's file object was closed"
+
+
+def test_get_file_spooled(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', side_effect=[stream_response_mock([b"some", b"val"]),
+                                                                 stream_response_mock([b"x" * 16, b"y" * 16])])
+    file_obj = waifuvault.FileResponse(url="https://waifuvault.moe/f/something")
+
+    # When
+    small = waifuvault.WaifuVaultClient().get_file(file_obj, spool_threshold=64)
+    large = waifuvault.WaifuVaultClient().get_file(file_obj, spool_threshold=8)
+
+    # Then
+    assert (mock_get.call_args.kwargs["stream"] is True), "Spooled download was not streamed"
+    assert (small.read() == b"someval"), "Spooled content does not match"
+    assert (not small._rolled), "Small download was written to disk"
+    assert (large.read() == b"x" * 16 + b"y" * 16), "Spilled content does not match"
+    assert (large._rolled), "Large download was kept in memory"
+    small.close()
+    large.close()
+
+
+def test_get_file_spool_threshold_zero(mocker):
+    # Given
+    mock_get = mocker.patch('requests.Session.get', return_value=stream_response_mock([b"some", b"val"]))
+    file_obj = waifuvault.FileResponse(url="https://waifuvault.moe/f/something")
+
+    # When
+    spool = waifuvault.WaifuVaultClient().get_file(file_obj, spool_threshold=0)
+
+    # Then
+    assert (spool._rolled), "Zero threshold kept the download in memory"
+    assert (spool.read() == b"someval"), "Spooled content does not match"
+    spool.close()
+    with pytest.raises(ValueError):
+        waifuvault.WaifuVaultClient().get_file(file_obj, spool_threshold=-1)
+    mock_get.assert_called_once()
+
+
+def test_download_album_spooled(mocker):
+    # Given
+    mock_post = mocker.patch('requests.Session.post', return_value=stream_response_mock([b"zip", b"data"]))
+
+    # When
+    album = waifuvault.download_album("test-album", [1], spool_threshold=2)
+
+    # Then
+    mock_post.assert_called_once_with('https://waifuvault.moe/rest/album/download/test-album', json=[1], stream=True)
+    assert (album.read() == b"zipdata"), "Spooled album does not match"
+    album.close()
+
+
+def test_download_album_to(mocker, tmp_path):
+    # Given
+    response = stream_response_mock([b"some", b"val"])
+    mock_post = mocker.patch('requests.Session.post', return_value=response)
+    destination = tmp_path / "album.zip"
+
+    # When
+    written = waifuvault.WaifuVaultClient().download_album_to("test-album", destination, [1])
+
+    # Then
+    mock_post.assert_called_once_with('https://waifuvault.moe/rest/album/download/test-album', json=[1], stream=True)
+    assert (written == 7), "Written size does not match"
+    assert (destination.read_bytes() == b"someval"), "Album content does not match"
+
+
+def test_extract_album(mocker, tmp_path):
+    # Given
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("one.txt", b"first")
+        zf.writestr("two.txt", b"second")
+    data = buf.getvalue()
+    mocker.patch('requests.Session.post', return_value=stream_response_mock([data[:50], data[50:]]))
+
+    # When
+    extracted = waifuvault.extract_album("test-album", tmp_path)
+
+    # Then
+    assert (len(extracted) == 2), "Wrong number of extracted files"
+    assert ((tmp_path / "two.txt").read_bytes() == b"second"), "Extracted content does not match"
+
+
+# Range Response Mock Object
+def range_server_mock(content, accept_ranges=True):
+    def head(url, headers=None, allow_redirects=None):
+        response = MagicMock()
+        response.ok = True
+        response.headers = {"Content-Length": str(len(content))}
+        if accept_ranges:
+            response.headers["Accept-Ranges"] = "bytes"
+        return response
+
+    def get(url, headers=None, stream=None):
+        start, end = 0, len(content) - 1
+        if "Range" in headers:
+            start, end = (int(value) for value in headers["Range"][len("bytes="):].split("-"))
+        response = stream_response_mock([content[start:end + 1][i:i + 1000] for i in range(0, end + 1 - start, 1000)])
+        response.status_code = 206 if "Range" in headers else 200
+        return response
+    return head, get
+
+
+def test_get_file_parallel(mocker, tmp_path):
+    # Given
+    content = os.urandom(3 * 1024 * 1024 + 17)
+    head, get = range_server_mock(content)
+    mocker.patch('requests.Session.head', side_effect=head)
+    mock_get = mocker.patch('requests.Session.get', side_effect=get)
+    destination = tmp_path / "download.bin"
+
+    # When
+    size = waifuvault.WaifuVaultClient().get_file_parallel(
+        waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), destination, "dangerWaifu", connections=3)
+
+    # Then
+    ranges = sorted(call.kwargs["headers"]["Range"] for call in mock_get.call_args_list)
+    assert (len(ranges) == 3), "File was not split across connections"
+    assert (all(call.kwargs["headers"]["x-password"] == "dangerWaifu" for call in mock_get.call_args_list)), "Password not sent"
+    assert (size == len(content)), "Size does not match"
+    assert (destination.read_bytes() == content), "File content does not match"
+    umask = os.umask(0)
+    os.umask(umask)
+    assert (destination.stat().st_mode & 0o777 == 0o666 & ~umask), "File does not have the usual permissions"
+
+
+def test_get_file_parallel_short_range(mocker, tmp_path):
+    # Given
+    content = os.urandom(3 * 1024 * 1024)
+    head, get = range_server_mock(content)
+
+    def short_get(url, headers=None, stream=None):
+        response = get(url, headers, stream)
+        if not headers["Range"].startswith("bytes=0-"):
+            response.iter_content = MagicMock(return_value=iter([b"short"]))
+        return response
+    mocker.patch('requests.Session.head', side_effect=head)
+    mocker.patch('requests.Session.get', side_effect=short_get)
+    destination = tmp_path / "download.bin"
+
+    # When
+    with pytest.raises(Exception) as e:
+        waifuvault.WaifuVaultClient().get_file_parallel(
+            waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), destination, connections=3)
+
+    # Then
+    assert ("Received 5 of" in str(e.value)), "Short range not reported"
+    assert (list(tmp_path.iterdir()) == []), "Failed download left a file behind"
+
+
+def test_get_file_parallel_fallback(mocker, tmp_path):
+    # Given
+    content = os.urandom(3 * 1024 * 1024)
+    head, get = range_server_mock(content, accept_ranges=False)
+    mocker.patch('requests.Session.head', side_effect=head)
+    mock_get = mocker.patch('requests.Session.get', side_effect=get)
+    destination = tmp_path / "download.bin"
+
+    # When
+    waifuvault.get_file_parallel(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), destination)
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/f/something', headers={}, stream=True)
+    assert (destination.read_bytes() == content), "File content does not match"
+
+
+# Resumable Response Mock Object
+def resumable_server_mock(content, fail_after=None, etag='"v1"'):
+    def get(url, headers=None, stream=None):
+        start = int(headers["Range"][len("bytes="):-1]) if "Range" in headers else 0
+        honour_range = "Range" in headers and headers.get("If-Range", etag) == etag
+        if not honour_range:
+            start = 0
+        body = content[start:]
+
+        def chunks():
+            for i in range(0, len(body), 1000):
+                if fail_after is not None and start + i >= fail_after:
+                    raise requests.ConnectionError("Connection reset")
+                yield body[i:i + 1000]
+        response = stream_response_mock([])
+        response.iter_content.return_value = chunks()
+        response.status_code = 206 if honour_range else 200
+        response.headers = {"ETag": etag, "Content-Length": str(len(body))}
+        if honour_range:
+            response.headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        return response
+    return get
+
+
+def test_download_resumable(mocker, tmp_path):
+    # Given
+    content = os.urandom(50000)
+    destination = tmp_path / "download.bin"
+    client = waifuvault.WaifuVaultClient()
+    file_res = waifuvault.FileResponse(url="https://waifuvault.moe/f/something")
+    mocker.patch('requests.Session.get', side_effect=resumable_server_mock(content, fail_after=30000))
+
+    # When
+    with pytest.raises(requests.ConnectionError):
+        client.download_resumable(file_res, destination, checkpoint_size=10000)
+    mock_get = mocker.patch('requests.Session.get', side_effect=resumable_server_mock(content))
+    size = client.download_resumable(file_res, destination, checkpoint_size=10000)
+
+    # Then
+    mock_get.assert_called_once_with('https://waifuvault.moe/f/something',
+                                     headers={'Range': 'bytes=30000-', 'If-Range': '"v1"'}, stream=True)
+    assert (size == len(content)), "Size does not match"
+    assert (destination.read_bytes() == content), "File content does not match"
+    assert (not os.path.exists(f"{destination}.part")), "Part file was not removed"
+    assert (not os.path.exists(f"{destination}.part.json")), "State file was not removed"
+
+
+def test_download_resumable_changed_file(mocker, tmp_path):
+    # Given
+    content = os.urandom(50000)
+    destination = tmp_path / "download.bin"
+    mocker.patch('requests.Session.get', side_effect=resumable_server_mock(content, fail_after=20000))
+    with pytest.raises(requests.ConnectionError):
+        waifuvault.download_resumable(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), destination)
+
+    # When
+    changed = os.urandom(40000)
+    mocker.patch('requests.Session.get', side_effect=resumable_server_mock(changed, etag='"v2"'))
+    waifuvault.download_resumable(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), destination)
+
+    # Then
+    assert (destination.read_bytes() == changed), "Stale partial data was kept"
+
+
+def test_download_album_resumable(mocker, tmp_path):
+    # Given
+    content = os.urandom(5000)
+    get = resumable_server_mock(content)
+    mock_post = mocker.patch('requests.Session.post', side_effect=lambda url, json=None, **kwargs: get(url, **kwargs))
+
+    # When
+    waifuvault.download_album_resumable("test-album", tmp_path / "album.zip", [1])
+
+    # Then
+    mock_post.assert_called_once_with('https://waifuvault.moe/rest/album/download/test-album', json=[1],
+                                      headers={}, stream=True)
+    assert ((tmp_path / "album.zip").read_bytes() == content), "Album content does not match"
+
+
+def test_upload_file_progress(mocker):
+    # Given
+    sent = {}
+
+    def put(url, params=None, data=None, headers=None):
+        sent["body"] = data.read()
+        sent["source"] = data.fields["file"][1]._source
+        return ok_response_numeric
+    mocker.patch('requests.Session.put', side_effect=put)
+    calls = []
+
+    # When
+    waifuvault.WaifuVaultClient().upload_file(waifuvault.FileUpload("tests/testfile.png"), True,
+                                              progress=lambda sent_bytes, total, rate: calls.append((sent_bytes, total)))
+
+    # Then
+    assert (calls[-1] == (97674, 97674)), "Progress did not report the whole file"
+    assert (all(a[0] <= b[0] for a, b in zip(calls, calls[1:]))), "Progress went backwards"
+    assert (sent["source"].closed), "File handle was not closed"
+    assert (len(sent["body"]) > 97674), "Body was not streamed"
+
+
+def test_upload_buffer_progress(mocker):
+    # Given
+    mocker.patch('requests.Session.put', side_effect=lambda url, params=None, data=None, headers=None: (data.read(), ok_response_numeric)[1])
+    buf = io.BytesIO(b"x" * 5000)
+    buf.seek(5000)
+    calls = []
+
+    # When
+    waifuvault.upload_file(waifuvault.FileUpload(buf, "buf.bin"), True, lambda *args: calls.append(args))
+
+    # Then
+    assert (calls[-1][:2] == (5000, 5000)), "Progress did not report the whole buffer"
+    assert (not buf.closed), "Caller's buffer was closed"
@@ -0,0 +1,87 @@
+import io
+
+import waifuvault
+from waifuvault.waifudedup import hash_upload
+
+
+# Response Mock Object
+class response_mock:
+    def __init__(self, ok, text, content=None, code=None):
+        self.ok = ok
+        self.code = code
+        self.text = text
+        self.content = content if content is not None else text.encode()
+
+
+ok_response = response_mock(True,
+                            '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}')
+bad_request = response_mock(False,
+                            '{"name": "BAD_REQUEST", "message": "Error Test", "status": 400}', code=400)
+
+
+def test_hash_upload_sources(tmp_path):
+    # Given
+    path = tmp_path / "dedup.txt"
+    path.write_bytes(b"dedup content")
+    stream = io.BytesIO(b"xxdedup content")
+    stream.seek(2)
+    stream = io.BufferedReader(stream)
+
+    # When
+    hashes = [hash_upload(waifuvault.FileUpload(target)) for target in
+              (str(path), b"dedup content", memoryview(b"dedup content"), io.BytesIO(b"dedup content"), stream)]
+
+    # Then
+    assert (len(set(hashes)) == 1), "Hashes differ between sources"
+    assert (stream.read() == b"dedup content"), "Stream not rewound after hashing"
+    assert (hash_upload(waifuvault.FileUpload(iter([b"dedup"]))) is None), "Iterable hashed"
+    assert (hash_upload(waifuvault.FileUpload("https://example.com/file")) is None), "URL hashed"
+
+
+def test_dedup_index_key_options():
+    # Given
+    index = waifuvault.DedupIndex()
+
+    # When
+    plain = index.key(waifuvault.FileUpload(b"content", "a.txt"))
+    bucket = index.key(waifuvault.FileUpload(b"content", "a.txt", bucket_token="bucket"))
+    password = index.key(waifuvault.FileUpload(b"content", "a.txt", password="secret"))
+
+    # Then
+    assert (plain[0] == bucket[0] == password[0]), "Content hash depends on options"
+    assert (len({plain, bucket, password}) == 3), "Options or bucket not part of the key"
+
+
+def test_upload_deduplicated(mocker, tmp_path):
+    # Given
+    mocker.patch('requests.Session.get', return_value=ok_response)
+    mock_put = mocker.patch('requests.Session.put', return_value=ok_response)
+    index = waifuvault.DedupIndex(tmp_path / "dedup.sqlite")
+    client = waifuvault.WaifuVaultClient(dedup_index=index)
+
+    # When
+    first = client.upload_file(waifuvault.FileUpload(b"content", "a.txt"), True)
+    second = client.upload_file(waifuvault.FileUpload(bytearray(b"content"), "a.txt"), True)
+    client.upload_file(waifuvault.FileUpload(b"other content", "a.txt"), True)
+
+    # Then
+    assert (mock_put.call_count == 2), "Identical content uploaded twice"
+    assert (first.token == second.token == "test-token"), "Existing upload not returned"
+
+
+def test_upload_deduplicated_dead_token(mocker):
+    # Given
+    mocker.patch('requests.Session.get', return_value=bad_request)
+    mock_put = mocker.patch('requests.Session.put', return_value=ok_response)
+    index = waifuvault.DedupIndex()
+    client = waifuvault.WaifuVaultClient(dedup_index=index)
+    key = index.key(waifuvault.FileUpload(b"content", "a.txt"))
+    index.record(key, "expired-token")
+
+    # When
+    upload_info = client.upload_file(waifuvault.FileUpload(b"content", "a.txt"), True)
+
+    # Then
+    mock_put.assert_called_once()
+    assert (upload_info.token == "test-token"), "Token does not match"
+    assert (index.lookup(key) == "test-token"), "Dead token not replaced"
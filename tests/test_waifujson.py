@@ -0,0 +1,67 @@
+import pytest
+import waifuvault
+from waifuvault import waifujson
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    yield
+    waifuvault.set_json_backend()
+
+
+def test_default_backend_is_fastest_installed():
+    # When
+    backend = waifuvault.set_json_backend()
+
+    # Then
+    assert (backend in waifujson.BACKENDS), "Unknown default backend"
+    assert (waifuvault.get_json_backend() == backend), "Backend not reported"
+    assert (waifujson.loads(b'{"token": "test-token"}') == {"token": "test-token"}), "Bytes not parsed"
+
+
+def test_stdlib_backend():
+    # When
+    waifuvault.set_json_backend("json")
+
+    # Then
+    assert (waifuvault.get_json_backend() == "json"), "Backend not switched"
+    assert (waifujson.loads(b'[1, 2]') == [1, 2]), "Bytes not parsed"
+    assert (waifujson.loads('[1, 2]') == [1, 2]), "Text not parsed"
+
+
+def test_custom_backend():
+    # Given
+    calls = []
+
+    def loads(data):
+        calls.append(data)
+        return {"custom": True}
+
+    # When
+    waifuvault.set_json_backend(loads)
+
+    # Then
+    assert (waifujson.loads(b'{}') == {"custom": True}), "Custom backend not used"
+    assert (calls == [b'{}']), "Custom backend not given the raw bytes"
+
+
+def test_unknown_backend():
+    # Then
+    with pytest.raises(ValueError, match="Unknown JSON backend"):
+        waifuvault.set_json_backend("yaml")
+
+
+def test_client_parses_response_bytes(mocker):
+    # Given
+    waifuvault.set_json_backend("json")
+    response = mocker.MagicMock()
+    response.ok = True
+    response.content = b'{"recordCount": 2, "recordSize": 10}'
+    mocker.patch('requests.Session.get', return_value=response)
+    client = waifuvault.WaifuVaultClient()
+
+    # When
+    stats = client.get_file_stats()
+
+    # Then
+    assert (stats.record_count == 2), "Stats not parsed from the response bytes"
@@ -0,0 +1,149 @@
+import asyncio
+import datetime
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import waifuvault
+
+
+def test_rate_limiter_reservations():
+    # Given
+    limiter = waifuvault.RateLimiter(rate=10, burst=2)
+
+    # When
+    delays = [limiter.reserve() for _ in range(4)]
+
+    # Then
+    assert (delays[:2] == [0.0, 0.0]), "Burst not allowed"
+    assert (0.05 < delays[2] <= 0.1 and 0.15 < delays[3] <= 0.2), "Requests not spaced by the rate"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_async():
+    # Given
+    limiter = waifuvault.RateLimiter(rate=50, burst=1)
+    started = time.monotonic()
+
+    # When
+    await asyncio.gather(*[limiter.acquire_async() for _ in range(5)])
+
+    # Then
+    assert (time.monotonic() - started >= 0.07), "Async acquires not rate limited"
+
+
+def test_concurrency_limit_bounds_in_flight():
+    # Given
+    limit = waifuvault.AdaptiveConcurrency(initial=2, max_limit=2)
+    peak = []
+
+    def work():
+        ticket = limit.acquire()
+        peak.append(limit.in_flight)
+        time.sleep(0.01)
+        limit.release(ticket)
+
+    # When
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Then
+    assert (max(peak) <= 2), "Concurrency limit exceeded"
+    assert (limit.in_flight == 0), "Slots not released"
+
+
+def test_concurrency_limit_aimd():
+    # Given
+    limit = waifuvault.AdaptiveConcurrency(initial=8, max_limit=16)
+    tickets = [limit.acquire() for _ in range(4)]
+
+    # When
+    limit.release(tickets[0], congested=True)
+    limit.release(tickets[1], congested=True)
+    shrunk = limit.limit
+    limit.release(tickets[2], 0.1)
+    limit.release(tickets[3], 0.1)
+
+    # Then
+    assert (shrunk == 4), "Limit not decreased once per window"
+    assert (4.4 < limit.limit < 4.6), "Limit not increased additively"
+
+
+def test_concurrency_limit_latency_spike():
+    # Given
+    limit = waifuvault.AdaptiveConcurrency(initial=8, warmup=3)
+    for _ in range(3):
+        limit.release(limit.acquire(), 0.1)
+    before = limit.limit
+
+    # When
+    limit.release(limit.acquire(), 1.0)
+
+    # Then
+    assert (limit.limit == before / 2), "Latency spike did not shrink the limit"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_async():
+    # Given
+    limit = waifuvault.AdaptiveConcurrency(initial=1, max_limit=1)
+    ticket = await limit.acquire_async()
+    waiting = asyncio.ensure_future(limit.acquire_async())
+    await asyncio.sleep(0.01)
+    blocked = not waiting.done()
+
+    # When
+    limit.release(ticket)
+    second = await asyncio.wait_for(waiting, 1)
+
+    # Then
+    assert (blocked), "Acquire did not wait for a free slot"
+    assert (second == 2 and limit.in_flight == 1), "Slot not handed over"
+
+
+def test_client_latency_sample_is_time_to_headers(mocker):
+    # Given
+    def get(url, **kwargs):
+        time.sleep(0.2)
+        response = MagicMock()
+        response.ok = True
+        response.status_code = 200
+        response.elapsed = datetime.timedelta(milliseconds=5)
+        response.content = b"file content"
+        return response
+    mocker.patch('requests.Session.get', side_effect=get)
+    concurrency_limit = waifuvault.AdaptiveConcurrency(initial=8)
+    release = mocker.spy(concurrency_limit, "release")
+    client = waifuvault.WaifuVaultClient(concurrency_limit=concurrency_limit)
+
+    # When
+    client.get_file(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"))
+
+    # Then
+    assert (release.call_args.args[1] == 0.005), "Body download time used as the latency sample"
+
+
+def test_client_reports_congestion(mocker):
+    # Given
+    response = MagicMock()
+    response.ok = True
+    response.status_code = 429
+    response.text = '{"recordCount": 1, "recordSize": 2}'
+    response.content = response.text.encode()
+    mocker.patch('requests.Session.get', return_value=response)
+    rate_limit = waifuvault.RateLimiter(rate=1000)
+    concurrency_limit = waifuvault.AdaptiveConcurrency(initial=8)
+    client = waifuvault.WaifuVaultClient(rate_limit=rate_limit, concurrency_limit=concurrency_limit)
+
+    # When
+    client.get_file_stats()
+
+    # Then
+    assert (concurrency_limit.limit == 4), "Throttled response did not shrink the limit"
+    assert (concurrency_limit.in_flight == 0), "Slot not released"
+    assert (rate_limit._tokens < rate_limit.burst), "Rate limit token not taken"
@@ -0,0 +1,140 @@
+import datetime
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+import waifuvault
+from waifuvault.waifumetrics import describe_request
+
+
+def test_describe_request():
+    # Given
+    base_url = "https://waifuvault.moe/rest"
+
+    # When
+    described = [describe_request(base_url, method, url) for method, url in [
+        ("get", f"{base_url}/test-token"),
+        ("put", f"{base_url}/test-bucket"),
+        ("post", f"{base_url}/album/test-album/associate"),
+        ("delete", f"{base_url}/album/test-album?deleteFiles=true"),
+        ("get", "https://waifuvault.moe/f/something"),
+    ]]
+
+    # Then
+    assert (described == [("file_info", f"{base_url}/{{token}}"),
+                          ("upload_file", f"{base_url}/{{bucket_token}}"),
+                          ("associate_files", f"{base_url}/album/{{album_token}}/associate"),
+                          ("delete_album", f"{base_url}/album/{{album_token}}"),
+                          ("get_file", "{file_url}")]), "Operations do not match"
+
+
+def test_histogram_quantiles():
+    # Given
+    histogram = waifuvault.Histogram(buckets=(1, 2, 4))
+
+    # When
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+
+    # Then
+    assert (histogram.counts == [1, 2, 1, 1]), "Bucket counts do not match"
+    assert (histogram.quantile(0.5) == 1.75), "Median does not match"
+    assert (histogram.quantile(1.0) == 4), "Overflow bucket not clamped"
+
+
+def test_collector_snapshot():
+    # Given
+    collector = waifuvault.MetricsCollector()
+
+    # When
+    collector(waifuvault.RequestEvent("file_info", "get", "{token}", "u", status=200, total=0.02, bytes_received=100))
+    collector(waifuvault.RequestEvent("file_info", "get", "{token}", "u", status=404, total=0.04, bytes_received=50))
+    collector(waifuvault.RequestEvent("file_info", "get", "{token}", "u", error=OSError(), total=1.0))
+
+    # Then
+    summary = collector.snapshot()["file_info"]
+    assert (summary["requests"] == 3 and summary["errors"] == 2), "Counts do not match"
+    assert (summary["received_bytes"] == 150), "Bytes do not match"
+    assert (collector.histogram("waifuvault_request_total_seconds", status="200").count == 1), "Labels not applied"
+
+
+def test_collector_snapshot_while_recording():
+    # Given
+    collector = waifuvault.MetricsCollector()
+    collector(waifuvault.RequestEvent("file_info", "get", "{token}", "u", status=200, total=0.02))
+    for count in range(20000):
+        collector.increment("waifuvault_requests_total", 1, {"operation": "upload", "status": "200", "count": count})
+    stop = threading.Event()
+
+    def record():
+        count = 20000
+        while not stop.is_set() and count < 200000:
+            collector.increment("waifuvault_sent_bytes_total", 1, {"operation": "upload", "count": count})
+            count += 1
+    writer = threading.Thread(target=record)
+    writer.start()
+
+    # When
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            summary = collector.snapshot()
+    finally:
+        stop.set()
+        writer.join()
+
+    # Then
+    assert (summary["file_info"]["requests"] == 1), "Snapshot failed while events were recorded"
+
+
+def test_adapter_interface():
+    # Given
+    class RecordingAdapter(waifuvault.MetricsAdapter):
+        def __init__(self):
+            self.calls = []
+
+        def observe(self, name, value, labels):
+            self.calls.append(("observe", name, value))
+
+        def increment(self, name, value, labels):
+            self.calls.append(("increment", name, value))
+
+    adapter = RecordingAdapter()
+
+    # When
+    adapter(waifuvault.RequestEvent("upload_file", "put", "", "u", status=200, ttfb=0.1, total=0.2, bytes_sent=10))
+
+    # Then
+    assert (adapter.calls == [("increment", "waifuvault_requests_total", 1),
+                              ("observe", "waifuvault_request_ttfb_seconds", 0.1),
+                              ("observe", "waifuvault_request_total_seconds", 0.2),
+                              ("increment", "waifuvault_sent_bytes_total", 10)]), "Adapter calls do not match"
+
+
+def test_client_emits_events(mocker):
+    # Given
+    response = MagicMock()
+    response.ok = True
+    response.status_code = 200
+    response.text = '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "options":{}}'
+    response.content = response.text.encode()
+    response.headers = {"Content-Length": "80"}
+    response.request.headers = {}
+    response.elapsed = datetime.timedelta(milliseconds=5)
+    mocker.patch('requests.Session.get', side_effect=[response, requests.ConnectionError("reset")])
+    events = []
+    client = waifuvault.WaifuVaultClient(hooks=[events.append])
+
+    # When
+    client.file_info("test-token", False)
+    with pytest.raises(requests.ConnectionError):
+        client.file_info("other-token", False)
+
+    # Then
+    assert ([(event.operation, event.status) for event in events] == [("file_info", 200), ("file_info", None)]), \
+        "Events do not match"
+    assert (events[0].ttfb == 0.005 and events[0].bytes_received == 80), "Timings or sizes do not match"
+    assert (isinstance(events[1].error, requests.ConnectionError)), "Error not reported"
@@ -0,0 +1,84 @@
+import pytest
+import waifuvault
+
+
+def bucket_json(count):
+    files = [{"token": f"token-{i}", "id": i, "url": f"https://waifuvault.moe/f/{i}/file", "bucket": "test-bucket",
+              "retentionPeriod": 10, "views": 0, "album": None,
+              "options": {"hideFilename": False, "oneTimeDownload": False, "protected": False}}
+             for i in range(count)]
+    albums = [{"token": "album-token", "bucketToken": "test-bucket", "publicToken": None, "name": "album",
+               "files": files[:2]}]
+    return {"token": "test-bucket", "files": files, "albums": albums}
+
+
+def test_bucket_files_are_parsed_lazily():
+    # Given
+    bucket = waifuvault.BucketResponse(dict_obj=bucket_json(3))
+
+    # When
+    file = bucket.files[1]
+
+    # Then
+    assert (isinstance(file, waifuvault.FileResponse)), "Item was not converted to a file response"
+    assert (file.token == "token-1"), "Item has the wrong token"
+    assert (bucket.files[1] is file), "Converted item was not cached"
+    assert (isinstance(bucket.files._items[0], dict)), "Untouched item was converted"
+    assert (len(bucket.files) == 3), "Lazy list has the wrong length"
+
+
+def test_bucket_columns_do_not_build_models():
+    # Given
+    bucket = waifuvault.BucketResponse(dict_obj=bucket_json(3))
+
+    # When
+    tokens = bucket.files.tokens()
+    ids = bucket.files.ids()
+    urls = bucket.files.urls()
+
+    # Then
+    assert (tokens == ["token-0", "token-1", "token-2"]), "Tokens column is wrong"
+    assert (ids == [0, 1, 2]), "Ids column is wrong"
+    assert (urls[2] == "https://waifuvault.moe/f/2/file"), "Urls column is wrong"
+    assert (all(isinstance(item, dict) for item in bucket.files._items)), "Columns built model objects"
+
+
+def test_bucket_albums_are_lazy():
+    # Given
+    bucket = waifuvault.BucketResponse(dict_obj=bucket_json(3))
+
+    # When
+    album = bucket.albums[0]
+
+    # Then
+    assert (bucket.albums.column("bucket_token") == ["test-bucket"]), "Album column is wrong"
+    assert (album.name == "album"), "Album was not parsed"
+    assert (album.files.tokens() == ["token-0", "token-1"]), "Album files are wrong"
+
+
+def test_lazy_list_slicing_and_mutation():
+    # Given
+    bucket = waifuvault.BucketResponse(dict_obj=bucket_json(4))
+
+    # When
+    head = bucket.files[:2]
+    del bucket.files[0]
+    bucket.files.append(waifuvault.FileResponse(token="appended"))
+
+    # Then
+    assert (isinstance(head, waifuvault.LazyModelList)), "Slice is not a lazy list"
+    assert ([file.token for file in head] == ["token-0", "token-1"]), "Slice has the wrong items"
+    assert (bucket.files.tokens() == ["token-1", "token-2", "token-3", "appended"]), "Mutation failed"
+
+
+def test_models_have_slots():
+    # Given
+    file = waifuvault.FileResponse(token="test-token")
+    bucket = waifuvault.BucketResponse(token="test-bucket", files=[file], albums=[])
+
+    # Then
+    assert (not hasattr(file, "__dict__")), "File response has an instance dict"
+    assert (not hasattr(bucket, "__dict__")), "Bucket response has an instance dict"
+    assert (bucket.files.tokens() == ["test-token"]), "Built lists do not support columns"
+    with pytest.raises(AttributeError):
+        file.unknown = True
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import requests
+
+import waifuvault
+from waifuvault.waifuretry import parse_retry_after
+
+file_json = '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}'
+
+
+# Response Mock Object with a status code
+def status_response(status_code, text=file_json, headers=None):
+    response = MagicMock()
+    response.ok = status_code < 400
+    response.status_code = status_code
+    response.status = status_code
+    response.text = text
+    response.content = text.encode()
+    response.headers = headers or {}
+    return response
+
+
+def test_retry_delay_backoff():
+    # Given
+    policy = waifuvault.RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+
+    # When
+    delays = [policy.delay(attempt) for attempt in range(1, 5)]
+
+    # Then
+    assert (delays == [1, 2, 4, 5]), "Backoff does not match"
+    assert (0 <= waifuvault.RetryPolicy(backoff=1).delay(3) <= 4), "Jitter out of range"
+
+
+def test_retry_after():
+    # Given
+    policy = waifuvault.RetryPolicy(max_backoff=60)
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+    # When
+    seconds = policy.delay(1, {"Retry-After": "12"})
+    date = parse_retry_after(retry_at)
+
+    # Then
+    assert (seconds == 12), "Retry-After seconds not honored"
+    assert (25 < date <= 30), "Retry-After date not honored"
+    assert (policy.delay(1, {"Retry-After": "600"}) is None), "Retry-After past max_backoff not refused"
+
+
+def test_client_retries_transient_status(mocker):
+    # Given
+    mocker.patch('time.sleep')
+    mock_get = mocker.patch('requests.Session.get',
+                            side_effect=[status_response(503), status_response(429), status_response(200)])
+    events = []
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy(on_retry=events.append))
+
+    # When
+    upload_info = client.file_info("test-token", False)
+
+    # Then
+    assert (mock_get.call_count == 3), "Transient errors not retried"
+    assert (upload_info.token == "test-token"), "Token does not match"
+    assert ([(event.attempt, event.status) for event in events] == [(1, 503), (2, 429)]), "Retry hook not called"
+
+
+def test_client_does_not_retry_before_retry_after(mocker):
+    # Given
+    mock_sleep = mocker.patch('time.sleep')
+    mock_get = mocker.patch('requests.Session.get',
+                            return_value=status_response(429, '{"message": "Slow down"}', {"Retry-After": "120"}))
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy(max_backoff=30))
+
+    # When
+    with pytest.raises(Exception):
+        client.file_info("test-token", False)
+
+    # Then
+    assert (mock_get.call_count == 1), "Retried before Retry-After elapsed"
+    mock_sleep.assert_not_called()
+
+
+def test_client_retries_connection_errors(mocker):
+    # Given
+    mocker.patch('time.sleep')
+    mock_get = mocker.patch('requests.Session.get',
+                            side_effect=[requests.ConnectionError("reset"), status_response(200)])
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy())
+
+    # When
+    client.file_info("test-token", False)
+
+    # Then
+    assert (mock_get.call_count == 2), "Connection error not retried"
+
+
+def test_client_gives_up(mocker):
+    # Given
+    mocker.patch('time.sleep')
+    mock_get = mocker.patch('requests.Session.get', return_value=status_response(
+        503, '{"name": "SERVICE_UNAVAILABLE", "message": "Busy", "status": 503}'))
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy(max_attempts=2))
+
+    # When
+    with pytest.raises(Exception) as error:
+        client.file_info("test-token", False)
+
+    # Then
+    assert (mock_get.call_count == 2), "Attempts do not match"
+    assert (str(error.value) == "Error 503 (SERVICE_UNAVAILABLE): Busy"), "Error message does not match"
+
+
+def test_client_does_not_retry_post(mocker):
+    # Given
+    mocker.patch('time.sleep')
+    mock_post = mocker.patch('requests.Session.post', return_value=status_response(
+        503, '{"name": "SERVICE_UNAVAILABLE", "message": "Busy", "status": 503}'))
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy())
+
+    # When
+    with pytest.raises(Exception):
+        client.create_album("test-bucket", "test-name")
+
+    # Then
+    mock_post.assert_called_once()
+
+
+def test_upload_retried_only_when_rewindable(mocker):
+    # Given
+    mocker.patch('time.sleep')
+    bodies = []
+
+    def put(url, **kwargs):
+        bodies.append(kwargs["data"].read() if hasattr(kwargs["data"], "read") else b"".join(kwargs["data"]))
+        return status_response(503 if len(bodies) % 2 else 200)
+
+    mocker.patch('requests.Session.put', side_effect=put)
+    client = waifuvault.WaifuVaultClient(retry=waifuvault.RetryPolicy())
+
+    # When
+    client.upload_file(waifuvault.FileUpload(b"rewindable", "a.txt"), True)
+    with pytest.raises(Exception):
+        client.upload_file(waifuvault.FileUpload(iter([b"one-shot"]), "a.txt"), True)
+
+    # Then
+    assert (len(bodies) == 3), "Attempts do not match"
+    assert (b"\r\n\r\nrewindable\r\n" in bodies[0] and b"\r\n\r\nrewindable\r\n" in bodies[1]), \
+        "Retried upload not rewound"
+
+
+@pytest.mark.asyncio
+async def test_async_client_retries(mocker):
+    # Given
+    mocker.patch('asyncio.sleep', new=AsyncMock())
+    responses = [status_response(502), status_response(200)]
+    for response in responses:
+        response.text = AsyncMock(return_value=file_json)
+        response.read = AsyncMock(return_value=file_json.encode())
+        response.__aenter__ = AsyncMock(return_value=response)
+        response.__aexit__ = AsyncMock(return_value=None)
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new=AsyncMock(side_effect=responses))
+    client = waifuvault.AsyncWaifuVaultClient(retry=waifuvault.RetryPolicy())
+
+    # When
+    upload_info = await client.file_info("test-token", False)
+    await client.close()
+
+    # Then
+    assert (mock_get.call_count == 2), "Transient error not retried"
+    assert (upload_info.token == "test-token"), "Token does not match"
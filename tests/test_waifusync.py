@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+
+import pytest
+
+import waifuvault
+
+
+# Fake client recording sync calls
+class sync_client_mock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.uploads = []
+        self.deleted = []
+        self.associated = []
+        self.count = 0
+
+    def get_bucket(self, token):
+        files = [waifuvault.FileResponse(token=file_token) for file_token in self.files]
+        return waifuvault.BucketResponse(token=token, files=files, albums=[])
+
+    def _current_restrictions(self):
+        return waifuvault.RestrictionResponse(restrictions=[])
+
+    def upload_file(self, file_obj, ignore_client_restrictions=False):
+        with self.lock:
+            self.count += 1
+            token = f"token-{self.count}"
+            self.files[token] = file_obj.target
+            self.uploads.append(os.path.basename(file_obj.target))
+        return waifuvault.FileResponse(token=token)
+
+    def delete_file(self, token):
+        with self.lock:
+            del self.files[token]
+            self.deleted.append(token)
+        return True
+
+    def associate_files(self, token, file_tokens):
+        self.associated.append((token, sorted(file_tokens)))
+        return waifuvault.AlbumResponse(token=token)
+
+
+def test_sync_uploads_new_files(tmp_path):
+    # Given
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.txt").write_bytes(b"b")
+    client = sync_client_mock()
+
+    # When
+    result = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket", album="album")
+
+    # Then
+    manifest = json.loads((tmp_path / ".waifuvault-manifest.json").read_text())
+    assert (sorted(client.uploads) == ["a.txt", "b.txt"]), "New files not uploaded"
+    assert (sorted(manifest["files"]) == ["a.txt", "sub/b.txt"]), "Manifest does not match"
+    assert (client.associated == [("album", ["token-1", "token-2"])]), "New files not added to the album"
+    assert (len(result.uploaded) == 2 and result.failed == []), "Result does not match"
+
+
+def test_sync_skips_unchanged_files(tmp_path):
+    # Given
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "b.txt").write_bytes(b"b")
+    client = sync_client_mock()
+    waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+    os.utime(tmp_path / "a.txt", ns=(0, 0))
+    (tmp_path / "b.txt").write_bytes(b"changed")
+
+    # When
+    result = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+
+    # Then
+    assert (client.uploads[-1] == "b.txt"), "Changed file not uploaded"
+    assert (len(client.uploads) == 3), "Unchanged file uploaded again"
+    assert (sorted(result.unchanged) == ["a.txt"]), "Touched file not detected as unchanged"
+
+
+def test_sync_deletes_removed_files(tmp_path):
+    # Given
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "b.txt").write_bytes(b"b")
+    client = sync_client_mock()
+    waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+    b_token = next(token for token, path in client.files.items() if path.endswith("b.txt"))
+    os.remove(tmp_path / "b.txt")
+
+    # When
+    kept = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+    result = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket", delete_removed=True)
+
+    # Then
+    assert (kept.deleted == []), "Remote file deleted without delete_removed"
+    assert (client.deleted == [b_token]), "Removed file not deleted remotely"
+    assert (result.deleted == ["b.txt"]), "Result does not match"
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="Needs symlinks and FIFOs")
+def test_sync_skips_special_and_unreadable_files(tmp_path):
+    # Given
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "b.txt").write_bytes(b"b")
+    client = sync_client_mock()
+    waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+    os.remove(tmp_path / "b.txt")
+    os.symlink(tmp_path / "missing.txt", tmp_path / "b.txt")
+    os.mkfifo(tmp_path / "pipe")
+
+    # When
+    result = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket", delete_removed=True)
+
+    # Then
+    assert ([relative for relative, _ in result.failed] == ["b.txt"]), "Dangling symlink not reported"
+    assert (isinstance(result.failed[0][1], FileNotFoundError)), "Wrong error for dangling symlink"
+    assert (sorted(client.uploads) == ["a.txt", "b.txt"]), "Special file uploaded"
+    assert (client.deleted == []), "Unreadable file deleted remotely"
+    assert (sorted(result.unchanged) == ["a.txt"]), "Regular file not synced"
+
+
+def test_sync_reuploads_expired_files(tmp_path):
+    # Given
+    (tmp_path / "a.txt").write_bytes(b"a")
+    client = sync_client_mock()
+    waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+    client.files.clear()
+
+    # When
+    result = waifuvault.waifusync.sync_directory(client, tmp_path, "bucket")
+
+    # Then
+    assert (len(result.uploaded) == 1), "File missing from the bucket not uploaded again"
@@ -1,4 +1,5 @@
 import io
+import mmap
 import re
 from unittest.mock import AsyncMock
 
@@ -14,13 +15,18 @@ class response_mock:
         self.ok = ok
         self.code = code
         self.text = text
-        self.content = content
+        self.content = content if content is not None else text.encode()
 
 
 # Mocked responses
 ok_async_response = AsyncMock()
 ok_async_response.ok = True
-ok_async_response.text = '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "bucket":"test-bucket", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}'
+ok_async_response.read = AsyncMock(side_effect=lambda: ok_async_response.text.return_value.encode())
+ok_async_response.text = AsyncMock(return_value='{"url":"https://waifuvault.moe/f/something", "token":"test-token", "bucket":"test-bucket", "retentionPeriod":100, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}')
+restrictions_async_response = AsyncMock()
+restrictions_async_response.ok = True
+restrictions_async_response.read = AsyncMock(side_effect=lambda: restrictions_async_response.text.return_value.encode())
+restrictions_async_response.text = AsyncMock(return_value='[{"type": "MAX_FILE_SIZE","value": 536870912},{"type": "BANNED_MIME_TYPE","value": "application/x-msdownload,application/x-executable"}]')
 
 ok_response_numeric_long = response_mock(True,
                                     '{"url":"https://waifuvault.moe/f/something", "token":"test-token", "bucket":"test-bucket", "retentionPeriod":28860366525, "options":{"protected": false, "oneTimeDownload": false, "hideFilename": false}}')
@@ -62,8 +68,8 @@ album_response = response_mock(True,
 # URL Upload Tests
 def test_upload_url(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = ok_response_numeric)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = ok_response_numeric)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
     upload_file = waifuvault.FileUpload("https://walker.moe/assets/sunflowers.png", expires="10m")
 
     # When
@@ -83,8 +89,8 @@ def test_upload_url(mocker):
 
 def test_upload_bucket(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = ok_response_numeric)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = ok_response_numeric)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
     upload_file = waifuvault.FileUpload("https://walker.moe/assets/sunflowers.png", expires="10m", bucket_token="test-bucket")
 
     # When
@@ -105,8 +111,8 @@ def test_upload_bucket(mocker):
 
 def test_upload_url_error(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = bad_request)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
 
     # When
     upload_file = waifuvault.FileUpload("https://walker.moe/assets/sunflowers.png", expires="10m")
@@ -118,8 +124,8 @@ def test_upload_url_error(mocker):
 
 def test_upload_file(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = ok_response_numeric)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = ok_response_numeric)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
     upload_file = waifuvault.FileUpload("tests/testfile.png", expires="10m")
 
     # When
@@ -136,8 +142,9 @@ def test_upload_file(mocker):
 @pytest.mark.asyncio
 async def test_upload_file_async(mocker):
     # Given
+    waifuvault.clear_restrictions()
     mock_put = mocker.patch('aiohttp.ClientSession.put', new_callable = AsyncMock, return_value = ok_async_response)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_get = mocker.patch('aiohttp.ClientSession.get', new_callable = AsyncMock, return_value = restrictions_async_response)
     upload_file = waifuvault.FileUpload("tests/testfile.png", expires="10m")
 
     # When
@@ -151,10 +158,29 @@ async def test_upload_file_async(mocker):
     assert (upload_res.retentionPeriod == 100), "Retention does not match"
 
 
+@pytest.mark.asyncio
+async def test_upload_file_async_uses_default_client_base_url(mocker):
+    # Given
+    mock_put = mocker.patch('aiohttp.ClientSession.put', new_callable = AsyncMock, return_value = ok_async_response)
+    mocker.patch('aiohttp.ClientSession.get', new_callable = AsyncMock, return_value = restrictions_async_response)
+    upload_file = waifuvault.FileUpload("tests/testfile.png", expires="10m")
+    previous = waifuvault.get_default_client()
+    waifuvault.set_default_client(waifuvault.WaifuVaultClient("http://alt.example/rest"))
+
+    # When
+    try:
+        await waifuvault.upload_file_async(upload_file, ignore_client_restrictions=True)
+    finally:
+        waifuvault.set_default_client(previous)
+
+    # Then
+    assert (mock_put.call_args.args[0].startswith("http://alt.example/rest")), "Default client base URL not used"
+
+
 def test_upload_file_error(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = bad_request)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
 
     # When
     upload_file = waifuvault.FileUpload("tests/testfile.png", expires="10m")
@@ -166,8 +192,8 @@ def test_upload_file_error(mocker):
 
 def test_upload_buffer(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = ok_response_numeric)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = ok_response_numeric)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
     with open("tests/testfile.png", "rb") as fh:
         buf = io.BytesIO(fh.read())
     upload_file = waifuvault.FileUpload(buf,"testfile_buf.png",expires="10m")
@@ -185,8 +211,8 @@ def test_upload_buffer(mocker):
 
 def test_upload_buffer_error(mocker):
     # Given
-    mock_put = mocker.patch('requests.put', return_value = bad_request)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_put = mocker.patch('requests.Session.put', return_value = bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
     with open("tests/testfile.png", "rb") as fh:
         buf = io.BytesIO(fh.read())
 
@@ -201,8 +227,8 @@ def test_upload_buffer_error(mocker):
 def test_upload_restriction_error(mocker):
     # Given
     waifuvault.clear_restrictions()
-    mock_put = mocker.patch('requests.put', return_value=bad_request)
-    mock_get = mocker.patch('requests.get', return_value=restrictions_small_response)
+    mock_put = mocker.patch('requests.Session.put', return_value=bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_small_response)
 
     # When
     upload_file = waifuvault.FileUpload("tests/testfile.png", expires="10m")
@@ -214,7 +240,7 @@ def test_upload_restriction_error(mocker):
 
 def test_file_info(mocker):
     # Given
-    mock_get = mocker.patch('requests.get', return_value = ok_response_human)
+    mock_get = mocker.patch('requests.Session.get', return_value = ok_response_human)
 
     # When
     upload_info = waifuvault.file_info("test-token",True)
@@ -231,7 +257,7 @@ def test_file_info(mocker):
 
 def test_file_info_long(mocker):
     # Given
-    mock_get = mocker.patch('requests.get', return_value = ok_response_numeric_long)
+    mock_get = mocker.patch('requests.Session.get', return_value = ok_response_numeric_long)
 
     # When
     upload_info = waifuvault.file_info("test-token",False)
@@ -248,7 +274,7 @@ def test_file_info_long(mocker):
 
 def test_file_info_error(mocker):
     # When
-    mock_get = mocker.patch('requests.get', return_value = bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value = bad_request)
 
     # Then
     with pytest.raises(Exception, match=re.escape('Error 400 (BAD_REQUEST): Error Test')):
@@ -257,7 +283,7 @@ def test_file_info_error(mocker):
 
 def test_update_info(mocker):
     # Given
-    mock_patch = mocker.patch('requests.patch', return_value = ok_response_numeric_protected)
+    mock_patch = mocker.patch('requests.Session.patch', return_value = ok_response_numeric_protected)
 
     # When
     update_info = waifuvault.file_update("test-token","dangerWaifu")
@@ -274,7 +300,7 @@ def test_update_info(mocker):
 
 def test_update_info_error(mocker):
     # When
-    mock_patch = mocker.patch('requests.patch', return_value = bad_request)
+    mock_patch = mocker.patch('requests.Session.patch', return_value = bad_request)
 
     # Then
     with pytest.raises(Exception, match=re.escape('Error 400 (BAD_REQUEST): Error Test')):
@@ -283,7 +309,7 @@ def test_update_info_error(mocker):
 
 def test_delete(mocker):
     # Given
-    mock_del = mocker.patch('requests.delete',
+    mock_del = mocker.patch('requests.Session.delete',
         return_value=response_mock(True,
             'true'))
 
@@ -297,7 +323,7 @@ def test_delete(mocker):
 
 def test_delete_error(mocker):
     # When
-    mock_del = mocker.patch('requests.delete', return_value = bad_request)
+    mock_del = mocker.patch('requests.Session.delete', return_value = bad_request)
 
     # Then
     with pytest.raises(Exception, match=re.escape('Error 400 (BAD_REQUEST): Error Test')):
@@ -306,7 +332,7 @@ def test_delete_error(mocker):
 
 def test_download(mocker):
     # Given
-    mock_get = mocker.patch('requests.get',return_value = response_mock(True,'', bytes("someval","utf8")))
+    mock_get = mocker.patch('requests.Session.get',return_value = response_mock(True,'', bytes("someval","utf8")))
 
     # When
     file_down = waifuvault.get_file(waifuvault.FileResponse(url="https://waifuvault.moe/f/something"), "dangerWaifu")
@@ -318,7 +344,7 @@ def test_download(mocker):
 
 def test_download_error(mocker):
     # When
-    mock_get = mocker.patch('requests.get', return_value=bad_request)
+    mock_get = mocker.patch('requests.Session.get', return_value=bad_request)
 
     # Then
     with pytest.raises(Exception, match=re.escape('Error 400 (BAD_REQUEST): Error Test')):
@@ -327,7 +353,7 @@ def test_download_error(mocker):
 
 def test_create_bucket(mocker):
     # Given
-    mock_create = mocker.patch('requests.get',
+    mock_create = mocker.patch('requests.Session.get',
                             return_value=response_mock(True,
                                                        '{"token": "test-bucket", "files":[], "albums":[]}'))
 
@@ -341,7 +367,7 @@ def test_create_bucket(mocker):
 
 def test_get_bucket(mocker):
     # Given
-    mock_get = mocker.patch('requests.post',
+    mock_get = mocker.patch('requests.Session.post',
                                return_value=response_mock(True,
                                                           '{"token": "test-bucket", "files":[{"token":"some-file-token", "url":"some-file-url", "bucket":"test-bucket", "retentionPeriod":10, "options":{"hideFilename":false, "oneTimeDownload": false, "protected":false}}], "albums":[]}'))
 
@@ -357,7 +383,7 @@ def test_get_bucket(mocker):
 
 def test_delete_bucket(mocker):
     # Given
-    mock_del = mocker.patch('requests.delete',
+    mock_del = mocker.patch('requests.Session.delete',
                             return_value=response_mock(True,
                                                        'true'))
 
@@ -371,7 +397,7 @@ def test_delete_bucket(mocker):
 
 def test_create_album(mocker):
     # Given
-    mock_get = mocker.patch('requests.post',
+    mock_get = mocker.patch('requests.Session.post',
                             return_value=response_mock(True,
                                                        '{"token": "test-album", "bucketToken":"test-bucket", "publicToken":null, "name":"test-name", "files":[]}'))
 
@@ -388,7 +414,7 @@ def test_create_album(mocker):
 
 def test_delete_album(mocker):
     # Given
-    mock_del = mocker.patch('requests.delete',
+    mock_del = mocker.patch('requests.Session.delete',
                             return_value=response_mock(True,
                                                        '{"success":true, "description":"yes"}'))
 
@@ -402,7 +428,7 @@ def test_delete_album(mocker):
 
 def test_get_album(mocker):
     # Given
-    mock_get = mocker.patch('requests.get',
+    mock_get = mocker.patch('requests.Session.get',
                             return_value=response_mock(True,
                                                        '{"token":"test-token", "bucketToken": "test-bucket", "publicToken": null, "name":"test-name", "files":[]}'))
 
@@ -420,7 +446,7 @@ def test_get_album(mocker):
 
 def test_share_album(mocker):
     # Given
-    mock_share = mocker.patch('requests.get',
+    mock_share = mocker.patch('requests.Session.get',
                             return_value=response_mock(True,
                                                        '{"success":true, "description":"test-url"}'))
 
@@ -434,7 +460,7 @@ def test_share_album(mocker):
 
 def test_revoke_album(mocker):
     # Given
-    mock_revoke = mocker.patch('requests.get',
+    mock_revoke = mocker.patch('requests.Session.get',
                             return_value=response_mock(True,
                                                        '{"success":true, "description":"test-url"}'))
 
@@ -448,7 +474,7 @@ def test_revoke_album(mocker):
 
 def test_associate_files(mocker):
     # Given
-    mock_associate = mocker.patch('requests.post', return_value=album_response)
+    mock_associate = mocker.patch('requests.Session.post', return_value=album_response)
 
     # When
     album = waifuvault.associate_files("test-album", ["file1","file2"])
@@ -464,7 +490,7 @@ def test_associate_files(mocker):
 
 def test_disassociate_files(mocker):
     # Given
-    mock_disassociate = mocker.patch('requests.post', return_value=album_response)
+    mock_disassociate = mocker.patch('requests.Session.post', return_value=album_response)
 
     # When
     album = waifuvault.disassociate_files("test-album", ["file1","file2"])
@@ -479,7 +505,7 @@ def test_disassociate_files(mocker):
 
 def test_download_album(mocker):
     # Given
-    mock_download_album = mocker.patch('requests.post',return_value = response_mock(True,'', bytes("someval","utf8")))
+    mock_download_album = mocker.patch('requests.Session.post',return_value = response_mock(True,'', bytes("someval","utf8")))
 
     # When
     album_down = waifuvault.download_album("test-album")
@@ -491,7 +517,7 @@ def test_download_album(mocker):
 
 def test_download_album_selective(mocker):
     # Given
-    mock_download_album = mocker.patch('requests.post',return_value = response_mock(True,'', bytes("someval","utf8")))
+    mock_download_album = mocker.patch('requests.Session.post',return_value = response_mock(True,'', bytes("someval","utf8")))
 
     # When
     album_down = waifuvault.download_album("test-album", [1])
@@ -503,7 +529,7 @@ def test_download_album_selective(mocker):
 
 def test_get_restrictions(mocker):
     # Given
-    mock_get = mocker.patch('requests.get', return_value=restrictions_response)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_response)
 
     # When
     restrictions = waifuvault.get_restrictions()
@@ -516,7 +542,7 @@ def test_get_restrictions(mocker):
 
 def test_get_file_stats(mocker):
     # Given
-    mock_get = mocker.patch('requests.get', return_value=size_response)
+    mock_get = mocker.patch('requests.Session.get', return_value=size_response)
 
     # When
     file_stats = waifuvault.get_file_stats()
@@ -539,3 +565,63 @@ def test_url_args():
     assert (args.get("expires") == "1d"), "expires not in arguments"
     assert (args.get("hide_filename") == "true"), "hide_filename not in arguments"
     assert (args.get("one_time_download") == "true"), "one_time_download not in arguments"
+
+
+def test_upload_sizes_without_copy(tmp_path):
+    # Given
+    data = bytes(range(256)) * 4
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+
+    # When
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        fh.seek(24)
+        sizes = [waifuvault.FileUpload(target).size() for target in
+                 [data, bytearray(data), memoryview(data), io.BytesIO(data), mapped, fh, path]]
+    generator_size = waifuvault.FileUpload(chunk for chunk in [data]).size()
+
+    # Then
+    assert (sizes == [1024, 1024, 1024, 1024, 1024, 1000, 1024]), "Sizes do not match"
+    assert (generator_size is None), "Generator size should be unknown"
+
+
+def test_upload_bytes_restriction_error(mocker):
+    # Given
+    waifuvault.clear_restrictions()
+    mock_put = mocker.patch('requests.Session.put', return_value=ok_response_numeric)
+    mock_get = mocker.patch('requests.Session.get', return_value=restrictions_small_response)
+
+    # When
+    upload_file = waifuvault.FileUpload(b"x" * 101, "bytes.bin")
+
+    # Then
+    with pytest.raises(ValueError, match=re.escape('File size 101 is larger than max allowed 100')):
+        waifuvault.upload_file(upload_file)
+    mock_put.assert_not_called()
+    waifuvault.clear_restrictions()
+
+
+def test_upload_generator(mocker):
+    # Given
+    sent = {}
+
+    def put(url, params=None, data=None, headers=None):
+        sent["body"] = b"".join(data)
+        sent["headers"] = headers
+        return ok_response_numeric
+    mocker.patch('requests.Session.put', side_effect=put)
+    mocker.patch('requests.Session.get', return_value=restrictions_small_response)
+    waifuvault.clear_restrictions()
+
+    # When
+    upload_res = waifuvault.upload_file(waifuvault.FileUpload((chunk for chunk in [b"some", b"val"] * 100), "gen.txt",
+                                                              password="dangerWaifu"))
+
+    # Then
+    boundary = sent["headers"]["Content-Type"].split("boundary=")[1]
+    assert (sent["headers"]["Content-Type"].startswith("multipart/form-data")), "Content type does not match"
+    assert (b'name="password"\r\n\r\ndangerWaifu\r\n' in sent["body"]), "Password not sent"
+    assert (b'filename="gen.txt"\r\nContent-Type: text/plain\r\n\r\n' + b"someval" * 100 in sent["body"]), "File not sent"
+    assert (sent["body"].endswith(f"--{boundary}--\r\n".encode())), "Body not terminated"
+    assert (upload_res.token == "test-token"), "Token does not match"
+    waifuvault.clear_restrictions()
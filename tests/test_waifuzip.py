@@ -0,0 +1,93 @@
+import io
+import os
+import re
+import zipfile
+
+import pytest
+from waifuvault.waifuzip import iter_zip_members, extract_zip_stream
+
+
+# Non seekable output so zipfile writes data descriptors
+class stream_mock(io.RawIOBase):
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def build_zip(members, compression=zipfile.ZIP_DEFLATED, seekable=True):
+    out = io.BytesIO() if seekable else stream_mock()
+    with zipfile.ZipFile(out, "w", compression) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return out.getvalue() if seekable else bytes(out.data)
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+members = {"a.txt": b"hello" * 1000, "dir/": b"", "dir/b.bin": os.urandom(100000), "empty.txt": b""}
+expected = {name: data for name, data in members.items() if not name.endswith("/")}
+
+
+@pytest.mark.parametrize("compression,seekable", [(zipfile.ZIP_STORED, True), (zipfile.ZIP_DEFLATED, True),
+                                                  (zipfile.ZIP_DEFLATED, False)])
+def test_iter_zip_members(compression, seekable):
+    # Given
+    data = build_zip(members, compression, seekable)
+
+    # When
+    result = {name: b"".join(chunks) for name, chunks in iter_zip_members(chunked(data, 1000))}
+
+    # Then
+    assert (result == expected), "Members do not match"
+
+
+def test_iter_zip_members_skips_unread():
+    # Given
+    data = build_zip(members, seekable=False)
+
+    # When
+    names = [name for name, chunks in iter_zip_members(chunked(data, 7))]
+
+    # Then
+    assert (names == ["a.txt", "dir/b.bin", "empty.txt"]), "Members were not skipped correctly"
+
+
+def test_iter_zip_members_bad_crc():
+    # Given
+    data = bytearray(build_zip({"a.txt": b"hello"}, zipfile.ZIP_STORED))
+    data[30 + len("a.txt")] ^= 0xFF
+
+    # Then
+    with pytest.raises(zipfile.BadZipFile, match=re.escape('Bad CRC-32 for zip member a.txt')):
+        for name, chunks in iter_zip_members([bytes(data)]):
+            b"".join(chunks)
+
+
+def test_extract_zip_stream(tmp_path):
+    # Given
+    data = build_zip(members, seekable=False)
+
+    # When
+    extracted = extract_zip_stream(chunked(data, 4096), tmp_path)
+
+    # Then
+    assert (len(extracted) == 3), "Wrong number of extracted files"
+    assert ((tmp_path / "dir" / "b.bin").read_bytes() == members["dir/b.bin"]), "Extracted content does not match"
+
+
+def test_extract_zip_stream_outside_directory(tmp_path):
+    # Given
+    data = build_zip({"../evil.txt": b"evil"})
+
+    # Then
+    with pytest.raises(zipfile.BadZipFile, match="would be extracted outside of"):
+        extract_zip_stream([data], tmp_path / "out")
+    assert (not (tmp_path / "evil.txt").exists()), "Member escaped the target directory"